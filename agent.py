@@ -1,36 +1,132 @@
+import time
+_import_started = time.perf_counter()  # for the startup report: every import below counts
 import os
+import sys
+import math
 import asyncio
-import pandas as pd
+import logging
+from collections import deque
 from datetime import datetime, timedelta
-from data_feed import fetch_ohlcv, fetch_order_book, fetch_heatmap, close_exchange
-from strategy_engine import calc_indicators, comprehensive_strategy_checks, align_higher_tf
+from data_feed import fetch_ohlcv_cached, fetch_order_book, fetch_heatmap, close_exchange, candle_cache
+from compute_pool import ComputeExecutor, analyze_market_data
+from stream_feed import StreamFeed
+from request_scheduler import PRIORITY_EVALUATION, PRIORITY_BACKGROUND
+from eval_scheduler import EvaluationScheduler
 from reasoning_layer import reasoning
-from output_module import trader_speak
-import uuid
+from strategy_engine import strategy_checks_batch, book_imbalance, trending_symbols
+from indicator_engine import IndicatorEngine
+from output_module import commentary_service
+from signal_tracking import SignalEntry, SignalStore, resolve_signals
+from signal_journal import SignalJournal, SIGNAL_JOURNAL_PATH
+from timeframe_builder import (BASE_TIMEFRAME, ROLLUP_TIMEFRAMES, ANALYSIS_COLUMNS, TimeframeBuilder,
+                               timeframe_builder)
+from metrics import (registry, timed, start_metrics_server, monitor_loop_lag, write_snapshots, startup_phase,
+                     record_startup, startup_report, resident_memory_bytes, METRICS_HOST, METRICS_PORT,
+                     METRICS_SNAPSHOT_SECS, SYMBOL_MEMORY_METRIC)
+from structured_log import configure_logging
+from virtual_clock import WallClock
+from market_tape import TapeRecorder
+from shard_coordinator import AsyncShardState, ShardWorker, open_shard_state, SHARD_STATE_URL
 import numpy as np
 
+log = logging.getLogger("agent")
+record_startup("imports", time.perf_counter() - _import_started)
+
 TOP_SYMBOLS = ["SOL/USDT", "ETH/USDT", "AVAX/USDT"]
+SYMBOLS = [sym for sym in os.getenv("AGENT_SYMBOLS", "").split(",") if sym] or None  # TOP_SYMBOLS when unset
 SIGNAL_COOLDOWN_MINS = 30
 STICKY_CONFIRMS = 3
+LONG_CONFIDENCE = 0.7   # confidence above this reads as LONG
+SHORT_CONFIDENCE = 0.3  # and below this as SHORT
 MIN_SIGNAL_HOLD_MINUTES = 120
-
-signal_log = []
-active_signals = {}
+# Push-based market data instead of REST polling (see stream_feed.py / replay_server.py)
+STREAMING_MODE = os.getenv("AGENT_STREAMING", "0") == "1"
+# Seed candles/order books over REST before streaming; disable for offline replay
+STREAM_SEED = os.getenv("AGENT_STREAM_SEED", "1") == "1"
+# Central candle-close-aligned scheduler instead of one polling loop per symbol
+SCHEDULED_MODE = os.getenv("AGENT_SCHEDULED", "0") == "1"
+SCHEDULE_TIMEFRAME = "5m"
+INTRA_CANDLE_REFRESH_SECS = float(os.getenv("AGENT_REFRESH_SECS", "15"))
+SCHEDULER_WORKERS = int(os.getenv("AGENT_SCHEDULER_WORKERS", "8"))
+# Worker processes for indicator/strategy computation (0 = run on the event loop)
+COMPUTE_WORKERS = int(os.getenv("AGENT_COMPUTE_WORKERS", "0"))
+COMPUTE_MAX_PENDING = int(os.getenv("AGENT_COMPUTE_MAX_PENDING", "32"))
+# Record every market data response for deterministic replay (see market_tape.py)
+RECORD_PATH = os.getenv("AGENT_RECORD_PATH")
+# Sharded deployment: this process analyses its share of the symbols (see shard_coordinator.py)
+SHARD_WORKER = os.getenv("AGENT_SHARD_WORKER")  # worker id; unset runs every symbol here
+SHARD_STATE = SHARD_STATE_URL
+SHARD_IDLE_SECS = 5  # how often a polling loop checks whether its symbol has come to this worker
+shard = None  # ShardWorker, opened by run() when sharded
+shard_state = None  # AsyncShardState: shared cooldowns, last signals and open signals
+compute_executor = None
+signal_journal = None  # opened by run(); see signal_journal.py
+SIGNAL_EVAL_INTERVAL_SECS = 300
+# 1m candles kept per symbol for outcome checks: SignalEntry's 120-minute hold plus one interval
+SIGNAL_EVAL_CANDLES = 130
+# Analysis reads the same 1m buffer; it must also cover the current hour (timeframe_builder.py)
+BASE_CANDLES = SIGNAL_EVAL_CANDLES
+seeded_symbols = set()  # symbols whose 5m/15m/1h history has been handed to the timeframe builder
+# Retention caps, so memory stays flat over long runs and grows only with the symbol count
+CLOSED_SIGNAL_RETENTION = int(os.getenv("AGENT_CLOSED_SIGNAL_RETENTION", "10000"))  # 0 keeps them all in memory
+WARMUP_MEMORY_CAP = int(os.getenv("AGENT_WARMUP_MEMORY_CAP", "600"))  # warmup analyses kept per symbol
+MEMORY_REPORT_SECS = float(os.getenv("AGENT_MEMORY_REPORT_SECS", "60"))  # 0 disables memory accounting
+
+signal_store = SignalStore(retention=CLOSED_SIGNAL_RETENTION or None)
 signal_cooldowns = {}
 cooldown_locks = {sym: asyncio.Lock() for sym in TOP_SYMBOLS}
 recent_signals = {sym: [] for sym in TOP_SYMBOLS}
 last_signal_type = {sym: None for sym in TOP_SYMBOLS}
 last_signal_time = {sym: None for sym in TOP_SYMBOLS}
 
-agent_start_time = datetime.utcnow()
+# Every time-dependent decision reads this clock; replay swaps in a virtual one
+clock = WallClock()
+agent_start_time = clock.now()  # reset by run()
 WARMUP_SECONDS = 300  # 5 minutes
-
-# NEW: Per-symbol memory of all warmup analyses (list of dicts)
-warmup_memory = {sym: [] for sym in TOP_SYMBOLS}
+# Warm start: rebuild the warmup analyses from the last WARMUP_BARS closed 1m
+# candles at startup instead of polling through WARMUP_SECONDS
+WARM_START = os.getenv("AGENT_WARM_START", "1") == "1"
+WARMUP_BARS = max(1, WARMUP_SECONDS // 60)
+warm_started = set()
+
+def secs_to_evals(seconds):
+    """Wall-clock window expressed as scheduled evaluations (scheduled mode)."""
+    return max(1, math.ceil(seconds / INTRA_CANDLE_REFRESH_SECS))
+
+# Scheduled mode counts warmup, hold and cooldown in evaluations, not seconds
+WARMUP_EVALS = secs_to_evals(WARMUP_SECONDS)
+MIN_SIGNAL_HOLD_EVALS = secs_to_evals(MIN_SIGNAL_HOLD_MINUTES * 60)
+SIGNAL_COOLDOWN_EVALS = secs_to_evals(SIGNAL_COOLDOWN_MINS * 60)
+evaluation_count = {sym: 0 for sym in TOP_SYMBOLS}
+last_signal_eval = {sym: None for sym in TOP_SYMBOLS}
+
+# NEW: Per-symbol memory of the latest warmup analyses (dicts), dropped after the review
+warmup_memory = {sym: deque(maxlen=WARMUP_MEMORY_CAP) for sym in TOP_SYMBOLS}
 warmup_reviewed = {sym: False for sym in TOP_SYMBOLS}
 
+def register_symbols(symbols):
+    """Per-symbol state for symbols outside TOP_SYMBOLS (benchmarks, other universes)."""
+    for sym in symbols:
+        cooldown_locks.setdefault(sym, asyncio.Lock())
+        recent_signals.setdefault(sym, [])
+        last_signal_type.setdefault(sym, None)
+        last_signal_time.setdefault(sym, None)
+        evaluation_count.setdefault(sym, 0)
+        last_signal_eval.setdefault(sym, None)
+        warmup_memory.setdefault(sym, deque(maxlen=WARMUP_MEMORY_CAP))
+        warmup_reviewed.setdefault(sym, False)
+
 def get_now():
-    return datetime.utcnow()
+    return clock.now()
+
+def owns(symbol):
+    return shard is None or shard.owns(symbol)
+
+async def claim_signal(symbol, signal_type):
+    """Across shards, the last-signal and hold rule is checked and updated atomically in the shared store."""
+    if shard_state is None:
+        return True
+    return await shard_state.claim_signal(symbol, signal_type, clock.time(), MIN_SIGNAL_HOLD_MINUTES * 60)
 
 def should_fire_signal(sig_list, new_signal, min_confirms=3):
     if len(sig_list) < min_confirms - 1:
@@ -39,6 +135,14 @@ def should_fire_signal(sig_list, new_signal, min_confirms=3):
 
 async def can_fire_signal(symbol, signal_type):
     async with cooldown_locks[symbol]:
+        if shard_state is not None:
+            return await shard_state.claim_cooldown(symbol, signal_type, clock.time(), SIGNAL_COOLDOWN_MINS * 60)
+        if SCHEDULED_MODE:
+            last_eval = signal_cooldowns.get((symbol, signal_type))
+            if last_eval is None or evaluation_count[symbol] - last_eval > SIGNAL_COOLDOWN_EVALS:
+                signal_cooldowns[(symbol, signal_type)] = evaluation_count[symbol]
+                return True
+            return False
         now = get_now()
         last_time = signal_cooldowns.get((symbol, signal_type))
         if last_time is None or (now - last_time) > timedelta(minutes=SIGNAL_COOLDOWN_MINS):
@@ -46,78 +150,44 @@ async def can_fire_signal(symbol, signal_type):
             return True
         return False
 
-class SignalEntry:
-    def __init__(self, symbol, signal_type, confidence, rationale, entry_price,
-                 entry_time=None, target_pct=0.02, stop_pct=0.01, hold_duration_mins=120, status="CONFIRMED"):
-        self.id = uuid.uuid4()
-        self.symbol = symbol
-        self.signal_type = signal_type
-        self.confidence = confidence
-        self.rationale = rationale
-        self.entry_price = entry_price
-        self.status = status  # "CONFIRMED"
-        self.entry_time = entry_time or datetime.utcnow()
-        self.target_price = (self.entry_price * (1 + target_pct) if signal_type == "LONG"
-                             else self.entry_price * (1 - target_pct)) if signal_type in ("LONG", "SHORT") else None
-        self.stop_price = (self.entry_price * (1 - stop_pct) if signal_type == "LONG"
-                           else self.entry_price * (1 + stop_pct)) if signal_type in ("LONG", "SHORT") else None
-        self.hold_duration = timedelta(minutes=hold_duration_mins)
-        self.exit_time = None
-        self.exit_price = None
-        self.outcome = None
-
-    def mark_exit(self, price, timestamp):
-        self.exit_price = price
-        self.exit_time = timestamp
-        if self.signal_type == "LONG":
-            if price >= self.target_price:
-                self.outcome = "TARGET_HIT"
-            elif price <= self.stop_price:
-                self.outcome = "STOP_HIT"
-            else:
-                self.outcome = "TIME_EXPIRED"
-        elif self.signal_type == "SHORT":
-            if price <= self.target_price:
-                self.outcome = "TARGET_HIT"
-            elif price >= self.stop_price:
-                self.outcome = "STOP_HIT"
-            else:
-                self.outcome = "TIME_EXPIRED"
-
-    def as_dict(self):
-        return {
-            "id": str(self.id),
-            "symbol": self.symbol,
-            "signal_type": self.signal_type,
-            "confidence": self.confidence,
-            "entry_price": self.entry_price,
-            "entry_time": self.entry_time,
-            "target_price": self.target_price,
-            "stop_price": self.stop_price,
-            "exit_price": self.exit_price,
-            "exit_time": self.exit_time,
-            "outcome": self.outcome,
-            "status": self.status,
-            "rationale": self.rationale,
-        }
+def in_warmup(symbol, now):
+    if symbol in warm_started:
+        return False
+    if SCHEDULED_MODE:
+        return evaluation_count[symbol] <= WARMUP_EVALS
+    return (now - agent_start_time).total_seconds() < WARMUP_SECONDS
+
+def signal_hold_expired(symbol, now):
+    if SCHEDULED_MODE:
+        last_eval = last_signal_eval[symbol]
+        return last_eval is None or evaluation_count[symbol] - last_eval >= MIN_SIGNAL_HOLD_EVALS
+    if last_signal_time[symbol]:
+        elapsed = (now - last_signal_time[symbol]).total_seconds() / 60.0
+        if elapsed < MIN_SIGNAL_HOLD_MINUTES:
+            return False
+    return True
 
 async def record_signal(symbol, signal_type, confidence, rationale, df, status="CONFIRMED"):
     entry_price = df.iloc[-1]['close']
-    signal = SignalEntry(symbol, signal_type, confidence, rationale, entry_price, status=status)
-    signal_log.append(signal)
-    if status == "CONFIRMED":
-        active_signals[signal.id] = signal
-    print(f"[Signal Recorded] {signal.symbol} {signal.signal_type} at price {entry_price:.2f}, conf {confidence:.2%}, status {status}")
+    signal = signal_store.add(SignalEntry(symbol, signal_type, confidence, rationale, entry_price,
+                                          entry_time=get_now(), status=status))
+    if signal_journal is not None:
+        signal_journal.record_created(signal)
+    if shard_state is not None:
+        await shard_state.put_active(signal)
+    log.info("Signal recorded: %s at price %.2f, conf %.2f%%, status %s", signal.signal_type, entry_price,
+             confidence * 100, status, extra={"symbol": signal.symbol, "signal_id": signal.id})
     return signal
 
-def export_signal_log_csv(filename="signal_log.csv"):
-    try:
-        rows = [s.as_dict() for s in signal_log if s.status == "CONFIRMED"]
-        df = pd.DataFrame(rows)
-        df.to_csv(filename, index=False)
-        print(f"[Export] Signal log saved to {filename}")
-    except Exception as e:
-        print(f"[Export ERROR] Failed to save signal log: {e}")
+def restore_signals():
+    """Replay the journal into signal_store: open signals plus the outcome aggregates."""
+    for state in signal_journal.signals():
+        if shard_state is not None and state.get("outcome") is None:
+            continue  # open signals come from the shared store, for the symbols this worker owns
+        signal_store.add(SignalEntry.from_dict(state))
+    if len(signal_store):
+        log.info("Restored %d signals (%d open) from %s", len(signal_store), len(signal_store.active),
+                 signal_journal.path)
 
 def review_majority_signal(warmup_log):
     """
@@ -140,147 +210,393 @@ def review_majority_signal(warmup_log):
     summary_reasons = list(dict.fromkeys(summary_reasons))  # unique reasons order-preserved
     return majority_signal, avg_conf, ratio, summary_reasons
 
+def signal_direction(confidence):
+    confidence = min(max(confidence, 0), 1)
+    if confidence > LONG_CONFIDENCE:
+        return "LONG"
+    if confidence < SHORT_CONFIDENCE:
+        return "SHORT"
+    return None
+
+async def process_market_data(symbol, ohlcv_1m, order_book, heatmap, history=None):
+    """
+    One analysis pass over already-fetched market data (shared by polling and streaming modes).
+    """
+    # Incremental indicators: 1m candles are rolled up into every timeframe, only forming/new bars are computed
+    with timed("analysis", symbol):
+        if compute_executor is not None:
+            df, checks_passed, reasons = await compute_executor.analyze(symbol, ohlcv_1m, order_book, heatmap, history)
+        else:
+            df, checks_passed, reasons = analyze_market_data(symbol, ohlcv_1m, order_book, heatmap, history)
+    seeded_symbols.add(symbol)
+
+    direction = signal_direction(checks_passed)
+
+    now = get_now()
+    evaluation_count[symbol] += 1
+    # ----------- WARMUP MEMORY PHASE ---------------
+    if in_warmup(symbol, now):
+        # Log all analyses into memory (not main log or CSV)
+        warmup_memory[symbol].append({
+            "timestamp": now,
+            "direction": direction,
+            "confidence": checks_passed,
+            "reasons": reasons[:],  # copy to avoid mutation,
+            "price": df.iloc[-1]["close"],
+        })
+        log.debug("Warmup analysis: direction=%s, conf=%.2f, len=%d", direction, checks_passed,
+                  len(warmup_memory[symbol]), extra={"symbol": symbol})
+        return
+
+    # At first run after warmup for this symbol: Review log and act
+    if not warmup_reviewed[symbol]:
+        majority_dir, maj_conf, ratio, reasons_major = review_majority_signal(warmup_memory[symbol])
+        strong = majority_dir in ["LONG", "SHORT"] and ratio >= 0.6  # require ≥60% majority
+        if strong and not await claim_signal(symbol, majority_dir):
+            log.info("Warmup consensus %s already signalled by another shard", majority_dir, extra={"symbol": symbol})
+        elif strong:
+            entry_price = df.iloc[-1]["close"]
+            atr = df.iloc[-1]["atr"] if "atr" in df.columns else 0
+            sl = entry_price - atr if majority_dir == "LONG" else entry_price + atr
+            tp = entry_price + 2 * atr if majority_dir == "LONG" else entry_price - 2 * atr
+
+            rationale = f"Final warmup review: {maj_conf:.2f} confidence, {int(ratio*100)}% persistence. Reasons: {', '.join(reasons_major)}"
+            rationale += f"\nSL: {sl:.2f}, TP: {tp:.2f}"
+
+            await record_signal(symbol, majority_dir, maj_conf, rationale, df)
+            last_signal_type[symbol] = majority_dir
+            last_signal_time[symbol] = now
+            last_signal_eval[symbol] = evaluation_count[symbol]
+
+            output = await commentary_service.speak(symbol, [majority_dir], rationale,
+                                                    indicators_dict=df.iloc[-1].to_dict(), confidence=maj_conf)
+            log.info("FINAL (warmup consensus) SIGNAL: %s\n%s", majority_dir, output, extra={"symbol": symbol})
+        else:
+            log.info("No strong consensus in warmup (%.2f, %s). Skipping entry.", ratio, majority_dir,
+                     extra={"symbol": symbol})
+        warmup_reviewed[symbol] = True  # Only do warmup review once!
+        warmup_memory[symbol].clear()
+        if shard_state is not None:
+            await shard_state.mark_reviewed(symbol)
+        return
+
+    # ----------- NORMAL POST-WARMUP SIGNAL LOGIC -----------
+    recent_signals[symbol].append(direction)
+    if len(recent_signals[symbol]) > STICKY_CONFIRMS:
+        recent_signals[symbol].pop(0)
+
+    if direction and should_fire_signal(recent_signals[symbol], direction, STICKY_CONFIRMS):
+        if (last_signal_type[symbol] != direction and signal_hold_expired(symbol, now)
+                and await claim_signal(symbol, direction) and await can_fire_signal(symbol, direction)):
+            entry_price = df.iloc[-1]["close"]
+            atr = df.iloc[-1]["atr"] if "atr" in df.columns else 0
+            sl = entry_price - atr if direction == "LONG" else entry_price + atr
+            tp = entry_price + 2 * atr if direction == "LONG" else entry_price - 2 * atr
+
+            await record_signal(symbol, direction, checks_passed, reasons, df)
+            last_signal_type[symbol] = direction
+            last_signal_time[symbol] = now
+            last_signal_eval[symbol] = evaluation_count[symbol]
+
+            with timed("reasoning", symbol):
+                if compute_executor is not None:
+                    rationale = await compute_executor.reasoning(symbol, df, checks_passed, reasons,
+                                                                 order_book, heatmap, now)
+                else:
+                    rationale = reasoning(symbol, df, checks_passed, reasons, order_book, heatmap, now=now)
+            rationale += f"\nSL: {sl:.2f}, TP: {tp:.2f}"
+            output = await commentary_service.speak(symbol, [direction], rationale,
+                                                    indicators_dict=df.iloc[-1].to_dict(), confidence=checks_passed)
+            log.info("FINAL SIGNAL: %s\n%s", direction, output, extra={"symbol": symbol})
+
+async def fetch_history(symbol):
+    """Higher-timeframe candles for a symbol's first analysis; afterwards they are rolled up from 1m."""
+    if symbol in seeded_symbols:
+        return None
+    candles = await asyncio.gather(*[fetch_ohlcv_cached(symbol, tf, 100, PRIORITY_BACKGROUND)
+                                     for tf in ROLLUP_TIMEFRAMES])
+    return dict(zip(ROLLUP_TIMEFRAMES, candles))
+
+async def fetch_market_data(symbol):
+    # One iteration's fetches run concurrently; request_scheduler paces them
+    ohlcv_1m, order_book, heatmap, history = await asyncio.gather(
+        fetch_ohlcv_cached(symbol, BASE_TIMEFRAME, BASE_CANDLES),
+        fetch_order_book(symbol),
+        fetch_heatmap(),
+        fetch_history(symbol),
+    )
+    if not ohlcv_1m or order_book is None:
+        return None
+    return ohlcv_1m, order_book, heatmap, history
+
+async def warm_start(symbols):
+    """
+    Fill the warmup memory from history: the strategy runs over the frame as it
+    stood after each of the last WARMUP_BARS closed 1m candles, for all symbols
+    in one batch, so each symbol's first live analysis is its warmup review.
+    """
+    fetched = await asyncio.gather(*[fetch_market_data(sym) for sym in symbols], return_exceptions=True)
+    # Workers seed their own builders on the first analysis; without them the seed is kept
+    builder = timeframe_builder if compute_executor is None else TimeframeBuilder(IndicatorEngine())
+    ready, rows, features = [], [], []
+    for sym, data in zip(symbols, fetched):
+        if data is None or isinstance(data, BaseException):
+            continue
+        ohlcv_1m, order_book, heatmap, history = data
+        # The last candle is still forming: its analysis is the first live one
+        seeded = builder.get(sym).seed(history, ohlcv_1m, keep=WARMUP_BARS + 1)[:-1]
+        if compute_executor is None:
+            seeded_symbols.add(sym)
+        if not len(seeded):
+            continue
+        ready.append((sym, [c[0] for c in ohlcv_1m[-len(seeded) - 1:-1]]))
+        rows.append(seeded)
+        features.append((book_imbalance(order_book), sym.split("/")[0].lower() in trending_symbols(heatmap)))
+    if not ready:
+        return
+
+    # (symbols, bars, 2 frame rows, columns), NaN-padded at the front
+    cube = np.full((len(rows), WARMUP_BARS, 2, len(ANALYSIS_COLUMNS)), np.nan)
+    for s, seeded in enumerate(rows):
+        cube[s, WARMUP_BARS - len(seeded):] = seeded
+    imbalance, trending = (np.repeat(np.array(f, dtype=float)[:, None], WARMUP_BARS, axis=1) for f in zip(*features))
+    confidence, reasons = strategy_checks_batch(
+        {name: cube[..., c] for c, name in enumerate(ANALYSIS_COLUMNS)}, imbalance, trending)
+
+    for s, (sym, timestamps) in enumerate(ready):
+        for k, ts in zip(range(WARMUP_BARS - len(timestamps), WARMUP_BARS), timestamps):
+            warmup_memory[sym].append({
+                "timestamp": datetime.utcfromtimestamp(ts / 1000 + 60),
+                "direction": signal_direction(confidence[s, k]),
+                "confidence": float(confidence[s, k]),
+                "reasons": reasons[s][k],
+                "price": cube[s, k, 1, ANALYSIS_COLUMNS.index("close")],
+            })
+        warm_started.add(sym)
+    log.info("Warm start: %d/%d symbols from their last %d closed 1m candles", len(ready), len(symbols),
+             WARMUP_BARS)
+
+async def adopt_symbols(symbols):
+    """Take over symbols from the shared store: last signal, warmup review and open signals."""
+    for sym, (signal_type, at) in (await shard_state.last_signals(symbols)).items():
+        last_signal_type[sym] = signal_type
+        last_signal_time[sym] = datetime.utcfromtimestamp(at)
+    for sym in await shard_state.reviewed(symbols):
+        warmup_reviewed[sym] = True
+        warm_started.add(sym)
+    for state in await shard_state.active_signals(symbols):
+        signal = SignalEntry.from_dict(state)
+        if signal.id in signal_store.active:
+            continue
+        signal_store.add(signal)
+        if not signal_journal.has(signal.id):
+            signal_journal.record_created(signal)  # journaled on another host
+
+async def rebalance_symbols(acquired, released):
+    """
+    Drop what this worker held for released symbols, then adopt (and warm
+    start) acquired ones. The analysis loops skip acquired symbols until this
+    returns (ShardWorker.publish), so none is reviewed before its warm start.
+    """
+    for sym in released:
+        for signal in signal_store.open_signals(sym):
+            signal_store.discard(signal)
+        recent_signals[sym].clear()
+        warmup_memory[sym].clear()
+        seeded_symbols.discard(sym)  # reseeded from fresh history if the symbol comes back
+        if compute_executor is None:
+            timeframe_builder.reset(sym)
+        candle_cache.clear(sym)
+    await adopt_symbols(acquired)
+    pending = [sym for sym in acquired if not warmup_reviewed[sym]]
+    if WARM_START and pending:
+        try:
+            await warm_start(pending)
+        except Exception:
+            log.exception("Warm start of %d acquired symbols failed", len(pending))
+
 async def analyze_symbol_continuous(symbol):
-    print(f"[{get_now():%H:%M:%S}] >>> Continuous analysis started for {symbol}...")
+    log.info("Continuous analysis started", extra={"symbol": symbol})
     while True:
+        if not owns(symbol):
+            await asyncio.sleep(SHARD_IDLE_SECS)
+            continue
         try:
-            ohlcv_5m = await fetch_ohlcv(symbol, "5m")
-            ohlcv_15m = await fetch_ohlcv(symbol, "15m")
-            order_book = await fetch_order_book(symbol)
-            heatmap = await fetch_heatmap()
-
-            if not ohlcv_5m or not ohlcv_15m or order_book is None:
-                print(f"[{get_now():%H:%M:%S}] {symbol} insufficient data; skipping analysis.")
+            with timed("iteration", symbol):
+                data = await fetch_market_data(symbol)
+                if data is not None:
+                    await process_market_data(symbol, *data)
+            if data is None:
+                log.warning("Insufficient data; skipping analysis", extra={"symbol": symbol})
                 await asyncio.sleep(2)
                 continue
-
-            df_5m = pd.DataFrame(ohlcv_5m, columns=["timestamp", "open", "high", "low", "close", "volume"])
-            df_5m["timestamp"] = pd.to_datetime(df_5m["timestamp"], unit="ms")
-            df_5m.set_index("timestamp", inplace=True)
-            df_5m = calc_indicators(df_5m, rsi_period=9)
-            df_5m["symbol"] = symbol
-
-            df_15m = pd.DataFrame(ohlcv_15m, columns=["timestamp", "open", "high", "low", "close", "volume"])
-            df_15m["timestamp"] = pd.to_datetime(df_15m["timestamp"], unit="ms")
-            df_15m.set_index("timestamp", inplace=True)
-            df_15m = calc_indicators(df_15m, rsi_period=9)
-            df_15m["symbol"] = symbol
-
-            df = align_higher_tf(df_5m, df_15m, "_15m")
-            checks_passed, reasons = comprehensive_strategy_checks(df, order_book, heatmap)
-
-            direction = None
-            confidence_norm = min(max(checks_passed, 0), 1)
-            if confidence_norm > 0.7:
-                direction = "LONG"
-            elif confidence_norm < 0.3:
-                direction = "SHORT"
-
-            now = get_now()
-            # ----------- WARMUP MEMORY PHASE ---------------
-            if (now - agent_start_time).total_seconds() < WARMUP_SECONDS:
-                # Log all analyses into memory (not main log or CSV)
-                warmup_memory[symbol].append({
-                    "timestamp": now,
-                    "direction": direction,
-                    "confidence": checks_passed,
-                    "reasons": reasons[:],  # copy to avoid mutation,
-                    "price": df.iloc[-1]["close"],
-                })
-                print(f"[{now:%H:%M:%S}] [WARMUP] {symbol}: direction={direction}, conf={checks_passed:.2f}, len={len(warmup_memory[symbol])}")
-                await asyncio.sleep(1)
-                continue
-
-            # At first run after warmup for this symbol: Review log and act
-            if not warmup_reviewed[symbol]:
-                majority_dir, maj_conf, ratio, reasons_major = review_majority_signal(warmup_memory[symbol])
-                if majority_dir in ["LONG", "SHORT"] and ratio >= 0.6:  # require ≥60% majority
-                    entry_price = df.iloc[-1]["close"]
-                    atr = df.iloc[-1]["atr"] if "atr" in df.columns else 0
-                    sl = entry_price - atr if majority_dir == "LONG" else entry_price + atr
-                    tp = entry_price + 2 * atr if majority_dir == "LONG" else entry_price - 2 * atr
-
-                    rationale = f"Final warmup review: {maj_conf:.2f} confidence, {int(ratio*100)}% persistence. Reasons: {', '.join(reasons_major)}"
-                    rationale += f"\nSL: {sl:.2f}, TP: {tp:.2f}"
-
-                    await record_signal(symbol, majority_dir, maj_conf, rationale, df)
-                    export_signal_log_csv()
-                    last_signal_type[symbol] = majority_dir
-                    last_signal_time[symbol] = now
-
-                    output = trader_speak(symbol, [majority_dir], rationale)
-                    print(f"\n[{now:%H:%M:%S}] [{symbol}] FINAL (warmup consensus) SIGNAL: {majority_dir}\n{output}\n")
-                else:
-                    print(f"\n[{now:%H:%M:%S}] [{symbol}] No strong consensus in warmup ({ratio:.2f}, {majority_dir}). Skipping entry.\n")
-                warmup_reviewed[symbol] = True  # Only do warmup review once!
-                await asyncio.sleep(1)
-                continue
-
-            # ----------- NORMAL POST-WARMUP SIGNAL LOGIC -----------
-            recent_signals[symbol].append(direction)
-            if len(recent_signals[symbol]) > STICKY_CONFIRMS:
-                recent_signals[symbol].pop(0)
-
-            signal_hold_expired = True
-            if last_signal_time[symbol]:
-                elapsed = (now - last_signal_time[symbol]).total_seconds() / 60.0
-                if elapsed < MIN_SIGNAL_HOLD_MINUTES:
-                    signal_hold_expired = False
-
-            if direction and should_fire_signal(recent_signals[symbol], direction, STICKY_CONFIRMS):
-                if last_signal_type[symbol] != direction and signal_hold_expired:
-                    entry_price = df.iloc[-1]["close"]
-                    atr = df.iloc[-1]["atr"] if "atr" in df.columns else 0
-                    sl = entry_price - atr if direction == "LONG" else entry_price + atr
-                    tp = entry_price + 2 * atr if direction == "LONG" else entry_price - 2 * atr
-
-                    await record_signal(symbol, direction, checks_passed, reasons, df)
-                    export_signal_log_csv()
-                    last_signal_type[symbol] = direction
-                    last_signal_time[symbol] = now
-
-                    rationale = reasoning(symbol, df, checks_passed, reasons, order_book, heatmap)
-                    rationale += f"\nSL: {sl:.2f}, TP: {tp:.2f}"
-                    output = trader_speak(symbol, [direction], rationale)
-                    print(f"\n[{now:%H:%M:%S}] [{symbol}] FINAL SIGNAL: {direction}\n{output}\n")
-
-        except Exception as e:
-            print(f"[{get_now():%H:%M:%S}] [ERROR] Analysis failed for {symbol}: {e}")
+        except Exception:
+            log.exception("Analysis failed", extra={"symbol": symbol})
 
         await asyncio.sleep(1)
 
+async def evaluate_symbol(symbol, reason="refresh"):
+    """Single scheduled evaluation (see eval_scheduler.EvaluationScheduler)."""
+    if not owns(symbol):
+        return
+    data = await fetch_market_data(symbol)
+    if data is None:
+        log.warning("Insufficient data; skipping %s evaluation", reason, extra={"symbol": symbol})
+        return
+    with timed("iteration", symbol):
+        await process_market_data(symbol, *data)
+
+async def analyze_symbol_streaming(symbol, feed):
+    log.info("Streaming analysis started", extra={"symbol": symbol})
+    while True:
+        await feed.wait(symbol)
+        if not owns(symbol):
+            continue
+        try:
+            ohlcv_1m = feed.ohlcv(symbol, BASE_TIMEFRAME)
+            order_book = feed.order_book(symbol)
+            if not ohlcv_1m or order_book is None:
+                continue  # not seeded yet, or the book is out of sequence after a depth gap
+            heatmap = await fetch_heatmap()
+            history = await fetch_history(symbol) if STREAM_SEED else None
+            await process_market_data(symbol, ohlcv_1m, order_book, heatmap, history)
+        except Exception:
+            log.exception("Streaming analysis failed", extra={"symbol": symbol})
+
+async def evaluate_symbol_signals(symbol, signals, now):
+    """One 1m candle fetch per symbol; every open signal on it is checked in one pass."""
+    candles = await fetch_ohlcv_cached(symbol, "1m", SIGNAL_EVAL_CANDLES, PRIORITY_EVALUATION)
+    if not candles:
+        return []
+    return resolve_signals(signals, candles, now)
+
 async def evaluate_signals():
     while True:
-        now = datetime.utcnow()
-        to_remove = []
-        for signal in list(active_signals.values()):
-            elapsed = now - signal.entry_time
-            if signal.outcome is not None or elapsed > signal.hold_duration:
-                latest_ohlcv = await fetch_ohlcv(signal.symbol, "1m")
-                if not latest_ohlcv or len(latest_ohlcv) == 0:
+        now = get_now()
+        by_symbol = signal_store.open_by_symbol()
+        results = await asyncio.gather(*[evaluate_symbol_signals(sym, sigs, now) for sym, sigs in by_symbol.items()],
+                                       return_exceptions=True)
+        for sym, result in zip(by_symbol, results):
+            if isinstance(result, Exception):
+                log.error("Signal evaluation failed: %s", result, extra={"symbol": sym})
+                continue
+            for signal in result:
+                if shard_state is not None and not await shard_state.close_active(signal.id):
+                    signal_store.discard(signal)  # resolved by the symbol's previous owner during a handover
                     continue
-                latest_price = latest_ohlcv[-1][4]
-                if signal.outcome is None:
-                    signal.mark_exit(latest_price, now)
-                    print(f"[Signal Evaluation] {signal.id} {signal.symbol} ended outcome: {signal.outcome} at {latest_price:.2f}")
-                if signal.outcome is not None:
-                    to_remove.append(signal.id)
-        for sid in to_remove:
-            active_signals.pop(sid, None)
-        await asyncio.sleep(300)
-
-async def run():
-    print(f"[{get_now():%H:%M:%S}] Agent started. Monitoring symbols: {', '.join(TOP_SYMBOLS)}")
-    evaluator_task = asyncio.create_task(evaluate_signals())
+                log.info("Signal %s ended outcome: %s at %.2f (%s)", signal.id, signal.outcome, signal.exit_price,
+                         f"{signal.exit_time:%H:%M}", extra={"symbol": signal.symbol})
+                signal_store.close(signal)
+                if signal_journal is not None:
+                    signal_journal.record_exit(signal)
+                stats = signal_store.stats(symbol=signal.symbol)
+                log.info("Signal stats: %d closed, hit %.0f%%, stop %.0f%%, avg R %.2f, %.0f min to exit",
+                         stats["closed"], stats["hit_rate"] * 100, stats["stop_rate"] * 100, stats["avg_r"],
+                         stats["avg_minutes_to_exit"], extra={"symbol": signal.symbol})
+        await asyncio.sleep(SIGNAL_EVAL_INTERVAL_SECS)
+
+async def account_memory(symbols):
+    """
+    Memory gauges every MEMORY_REPORT_SECS: per-symbol candle buffers (and the
+    compute pool's shared blocks), retained closed signals and resident memory.
+    Indicator buffers are reported by analyze_market_data, wherever it runs.
+    """
+    while True:
+        candles = candle_cache.nbytes_by_symbol()
+        shared = compute_executor.nbytes_by_symbol() if compute_executor is not None else {}
+        for sym in symbols:
+            registry.set(SYMBOL_MEMORY_METRIC, candles.get(sym, 0), symbol=sym, component="candles")
+            if compute_executor is not None:
+                registry.set(SYMBOL_MEMORY_METRIC, shared.get(sym, 0), symbol=sym, component="shared_candles")
+        registry.set("agent_closed_signals_bytes", signal_store.nbytes)
+        registry.set("agent_open_signals", len(signal_store.active))
+        rss = resident_memory_bytes()
+        if rss is not None:
+            registry.set("process_resident_memory_bytes", rss)
+        await asyncio.sleep(MEMORY_REPORT_SECS)
+
+async def run(symbols=None, journal_path=SIGNAL_JOURNAL_PATH):
+    global compute_executor, signal_journal, agent_start_time, shard, shard_state
+    symbols = symbols or TOP_SYMBOLS
+    register_symbols(symbols)
+    agent_start_time = get_now()
+    log.info("Agent started. Monitoring symbols: %s", ", ".join(symbols))
+    recorder = None
+    if RECORD_PATH:
+        if STREAMING_MODE:
+            log.warning("AGENT_RECORD_PATH is ignored in streaming mode (record the streams with stream_feed.py)")
+        else:
+            recorder = TapeRecorder(RECORD_PATH, symbols, SCHEDULED_MODE, clock, warm_start=WARM_START)
+            recorder.install(sys.modules[__name__])
+            log.info("Recording market data to %s", RECORD_PATH)
+    owned = symbols
+    if SHARD_WORKER:
+        with startup_phase("shard"):
+            shard_state = AsyncShardState(open_shard_state(SHARD_STATE))
+            shard = ShardWorker(SHARD_WORKER, symbols, shard_state, clock=clock.time)
+            owned, _ = await shard.rebalance()
+        log.info("Shard %s owns %d/%d symbols", SHARD_WORKER, len(owned), len(symbols))
+    with startup_phase("journal"):
+        signal_journal = SignalJournal(journal_path, clock=get_now)
+        restore_signals()
+        if shard is not None:
+            await adopt_symbols(owned)
+    if COMPUTE_WORKERS > 0:
+        with startup_phase("compute_pool"):
+            compute_executor = ComputeExecutor(COMPUTE_WORKERS, COMPUTE_MAX_PENDING, capacity=BASE_CANDLES)
+    if WARM_START and (STREAM_SEED or not STREAMING_MODE):
+        try:
+            with timed("warm_start"), startup_phase("warm_start"):
+                await warm_start([sym for sym in owned if not warmup_reviewed[sym]])
+        except Exception:
+            log.exception("Warm start failed; warming up from live analyses")
+    if shard is not None:
+        await shard.publish(owned, [])
+    background = [asyncio.create_task(evaluate_signals()), asyncio.create_task(monitor_loop_lag())]
+    if METRICS_SNAPSHOT_SECS > 0:
+        background.append(asyncio.create_task(write_snapshots()))
+    if MEMORY_REPORT_SECS > 0:
+        background.append(asyncio.create_task(account_memory(symbols)))
+    if shard is not None:
+        background.append(asyncio.create_task(shard.run(rebalance_symbols)))
+    metrics_server = None
+    if METRICS_PORT:
+        with startup_phase("metrics_server"):
+            metrics_server = await start_metrics_server()
+        log.info("Metrics on http://%s:%d/metrics", METRICS_HOST, METRICS_PORT)
+    log.info("Startup %s", startup_report(time.perf_counter() - _import_started))
+    feed = None
     try:
-        await asyncio.gather(*[asyncio.shield(analyze_symbol_continuous(sym)) for sym in TOP_SYMBOLS])
+        if STREAMING_MODE:
+            feed = await StreamFeed(symbols, (BASE_TIMEFRAME,), limit=BASE_CANDLES, seed=STREAM_SEED).start()
+            await asyncio.gather(*[asyncio.shield(analyze_symbol_streaming(sym, feed)) for sym in symbols])
+        elif SCHEDULED_MODE:
+            await EvaluationScheduler(symbols, evaluate_symbol, SCHEDULE_TIMEFRAME,
+                                      refresh_secs=INTRA_CANDLE_REFRESH_SECS,
+                                      workers=SCHEDULER_WORKERS, clock=clock.time).run()
+        else:
+            await asyncio.gather(*[asyncio.shield(analyze_symbol_continuous(sym)) for sym in symbols])
     except KeyboardInterrupt:
-        print("\nAgent stopped by user (KeyboardInterrupt). Saving signals...")
-        export_signal_log_csv()
+        log.info("Agent stopped by user (KeyboardInterrupt).")
     finally:
-        evaluator_task.cancel()
+        for task in background:
+            task.cancel()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+        if feed is not None:
+            await feed.stop()
+        if compute_executor is not None:
+            compute_executor.shutdown()
+        await commentary_service.close()
         await close_exchange()
-        print(f"[{get_now():%H:%M:%S}] Exchange connections closed. Goodbye.")
+        if recorder is not None:
+            recorder.close()
+        signal_journal.close()
+        if shard is not None:
+            await shard.leave()  # the other workers take the symbols over at their next heartbeat
+            await shard_state.close()
+        log.info("Exchange connections closed. Goodbye.")
 
 if __name__ == "__main__":
-    asyncio.run(run())
+    configure_logging()
+    asyncio.run(run(SYMBOLS))
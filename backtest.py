@@ -0,0 +1,353 @@
+import os
+import math
+import time
+import argparse
+import asyncio
+import numpy as np
+import pandas as pd
+from batch_indicators import calc_indicators_batch
+from strategy_engine import compiled_rules, TIMEFRAMES
+from eval_scheduler import TIMEFRAME_SECS
+from timeframe_builder import BASE_TIMEFRAME, MAIN_TIMEFRAME, rollup
+from agent import (STICKY_CONFIRMS, SIGNAL_COOLDOWN_MINS, MIN_SIGNAL_HOLD_MINUTES, WARMUP_SECONDS,
+                   LONG_CONFIDENCE, SHORT_CONFIDENCE)
+
+# Vectorised historical backtest of the agent's signal logic.
+#
+# The history is 1m candles, as the agent reads them. They are rolled up into
+# the 5m main timeframe and into 15m and 1h (timeframe_builder.rollup), and
+# indicators are computed once over the full history of every timeframe for
+# every symbol (batch_indicators). Each 5m bar then gets the suffixed
+# _1m/_15m/_1h columns as the live frame carries them: the 1m bar ending with
+# it, and the last 15m/1h bar closed by then (live, a 15m/1h bar still forming
+# is used instead, so those columns lag by up to one bar here). The strategy
+# rule table is evaluated over all of it at once for the per-bar confidence.
+# Order book and heatmap rules have no history and count as failed, as they do
+# live with a balanced book and a coin that is not trending; confidence stays on
+# the live scale, so the agent's cutoffs apply unchanged. The agent's rules are
+# then replayed with one evaluation per closed bar: LONG/SHORT thresholds, warmup
+# consensus, STICKY_CONFIRMS, direction flips, the minimum hold and the
+# per-direction cooldown. Only bars where a signal can fire are visited, by
+# binary search over candidate bars. Outcomes (target/stop/time) are resolved
+# in one pass over the next `hold` bars of highs and lows.
+
+# SignalEntry defaults
+TARGET_PCT = 0.02
+STOP_PCT = 0.01
+HOLD_MINUTES = 120
+WARMUP_MAJORITY = 0.6
+HISTORY_BARS = 100  # candles the agent fetches before its first evaluation
+
+LONG, SHORT = 1, -1
+SIDE_NAMES = {LONG: "LONG", SHORT: "SHORT"}
+
+
+def align_ohlcv(ohlcv_by_symbol):
+    """(symbols, timestamps, (S, T, 5) OHLCV cube) on the bars common to every symbol."""
+    arrays = {s: np.asarray(rows, dtype=float) for s, rows in ohlcv_by_symbol.items() if len(rows)}
+    symbols = list(arrays)
+    if not symbols:
+        return [], np.empty(0, dtype="int64"), np.empty((0, 0, 5))
+    times = arrays[symbols[0]][:, 0].astype("int64")
+    for sym in symbols[1:]:
+        times = np.intersect1d(times, arrays[sym][:, 0].astype("int64"), assume_unique=True)
+    cube = np.empty((len(symbols), len(times), 5))
+    for i, sym in enumerate(symbols):
+        rows = arrays[sym]
+        stamps = rows[:, 0].astype("int64")
+        order = np.argsort(stamps, kind="stable")
+        cube[i] = rows[order[np.searchsorted(stamps, times, sorter=order)], 1:6]
+    return symbols, times, cube
+
+
+def rollup_cube(times, cube, timeframe):
+    """Roll an aligned (S, T, 5) cube up into `timeframe` bars: (bar open times, (S, bars, 5) cube)."""
+    rolled = [rollup(np.column_stack([times, ohlcv]), timeframe) for ohlcv in cube]
+    if not rolled or not len(rolled[0]):
+        return np.empty(0, dtype="int64"), np.empty((len(cube), 0, 5))
+    return rolled[0][:, 0].astype("int64"), np.stack([rows[:, 1:] for rows in rolled])
+
+
+def _suffix(column):
+    return next((sfx for sfx, _ in TIMEFRAMES if sfx and column.endswith(sfx)), "")
+
+
+def analysis_columns(times, cube, timeframe=MAIN_TIMEFRAME, rsi_period=9, columns=None):
+    """
+    The rule table's columns for every `timeframe` bar of an aligned 1m (S, T, 5)
+    cube, with the other timeframes aligned as in the live analysis frame.
+    Returns (bar open times, (S, bars, 5) cube, {column: (S, bars) array}).
+    """
+    if len(times) > 1 and np.diff(times).min() != TIMEFRAME_SECS[BASE_TIMEFRAME] * 1000:
+        raise ValueError(f"The backtest reads {BASE_TIMEFRAME} candles")
+    columns = compiled_rules.columns if columns is None else columns
+    main_times, main_cube = rollup_cube(times, cube, timeframe)
+    closes_at = main_times + TIMEFRAME_SECS[timeframe] * 1000
+    out = {}
+    for sfx, tf in TIMEFRAMES:
+        names = [name for name in columns if _suffix(name) == sfx]
+        if not names:
+            continue
+        tf = tf if sfx else timeframe
+        if not sfx:
+            tf_times, tf_cube = main_times, main_cube
+        elif tf == BASE_TIMEFRAME:
+            tf_times, tf_cube = times, cube
+        else:
+            tf_times, tf_cube = rollup_cube(times, cube, tf)
+        base_names = [name[:len(name) - len(sfx)] for name in names]
+        indicators = calc_indicators_batch(tf_cube[..., 0], tf_cube[..., 1], tf_cube[..., 2], tf_cube[..., 3],
+                                           tf_cube[..., 4], tf_times, rsi_period, columns=base_names)
+        # The bar of this timeframe that closed last at (or with) each main bar's close
+        tf_ms = TIMEFRAME_SECS[tf] * 1000
+        pos = np.searchsorted(tf_times + tf_ms, closes_at, side="right") - 1
+        found = pos >= 0
+        for name, base in zip(names, base_names):
+            if base not in indicators:
+                continue
+            aligned = np.full(main_cube.shape[:2], np.nan)
+            aligned[:, found] = indicators[base][:, pos[found]]
+            out[name] = aligned
+    return main_times, main_cube, out
+
+
+def directions(confidence, long_threshold=LONG_CONFIDENCE, short_threshold=SHORT_CONFIDENCE):
+    conf = np.clip(confidence, 0, 1)
+    return np.where(conf > long_threshold, LONG, np.where(conf < short_threshold, SHORT, 0)).astype(np.int8)
+
+
+def _warmup_consensus(direction, confidence, start, stop):
+    """review_majority_signal over the warmup bars: (side, mean confidence, ratio)."""
+    window = direction[start:stop]
+    voted = window[window != 0]
+    if voted.size == 0:
+        return 0, 0.0, 0.0
+    longs, shorts = int((voted == LONG).sum()), int((voted == SHORT).sum())
+    if longs == shorts:
+        side = int(voted[0])  # Counter.most_common keeps first-seen order on ties
+    else:
+        side = LONG if longs > shorts else SHORT
+    count = max(longs, shorts)
+    return side, float(confidence[start:stop][window == side].mean()), count / voted.size
+
+
+def simulate_signals(direction, confidence, bar_secs, start=HISTORY_BARS, sticky_confirms=STICKY_CONFIRMS,
+                     hold_minutes=MIN_SIGNAL_HOLD_MINUTES, cooldown_minutes=SIGNAL_COOLDOWN_MINS,
+                     warmup_seconds=WARMUP_SECONDS):
+    """
+    Bars where agent.process_market_data would fire, for one symbol.
+    Returns a list of (bar, side, confidence).
+    """
+    n = len(direction)
+    warmup_bars = max(1, math.ceil(warmup_seconds / bar_secs))
+    review = start + warmup_bars
+    if review >= n:
+        return []
+    hold_bars = math.ceil(hold_minutes * 60 / bar_secs)
+    cooldown_bars = math.floor(cooldown_minutes * 60 / bar_secs) + 1  # cooldown is a strict ">"
+
+    fired = []
+    last_side, last_bar = 0, None
+    last_by_side = {}
+    side, conf, ratio = _warmup_consensus(direction, confidence, start, review)
+    if side and ratio >= WARMUP_MAJORITY:
+        fired.append((review, side, conf))
+        last_side, last_bar = side, review
+
+    # Sticky confirmation: the current and previous STICKY_CONFIRMS - 2 evaluations agree.
+    # recent_signals restarts after the review bar, so the first full window ends later.
+    sticky = direction != 0
+    for lag in range(1, max(sticky_confirms - 1, 1)):
+        sticky[lag:] &= direction[lag:] == direction[:-lag]
+        sticky[:lag] = False
+    first = review + max(sticky_confirms - 1, 1)
+    candidates = np.flatnonzero(sticky)
+    candidates = candidates[candidates >= first]
+    by_side = {s: candidates[direction[candidates] == s] for s in (LONG, SHORT)}
+
+    while True:
+        earliest = first if last_bar is None else max(first, last_bar + hold_bars)
+        best = None
+        for s, bars in by_side.items():
+            if s == last_side:
+                continue
+            lower = earliest
+            if s in last_by_side:
+                lower = max(lower, last_by_side[s] + cooldown_bars)
+            i = np.searchsorted(bars, lower)
+            if i < len(bars) and (best is None or bars[i] < best[0]):
+                best = (int(bars[i]), s)
+        if best is None:
+            return fired
+        bar, s = best
+        fired.append((bar, s, float(confidence[bar])))
+        last_side, last_bar = s, bar
+        last_by_side[s] = bar
+
+
+def resolve_outcomes(high, low, close, bars, sides, hold_bars, target_pct=TARGET_PCT, stop_pct=STOP_PCT):
+    """
+    Vectorised SignalEntry resolution for signals entered at close[bars].
+    Returns (target, stop, exit_bar, exit_price, outcome); outcome is None while a
+    signal's hold window runs past the end of the data. A bar touching both
+    levels counts as a stop.
+    """
+    bars = np.asarray(bars, dtype=int)
+    sides = np.asarray(sides, dtype=int)
+    entry = close[bars]
+    long = sides == LONG
+    target = np.where(long, entry * (1 + target_pct), entry * (1 - target_pct))
+    stop = np.where(long, entry * (1 - stop_pct), entry * (1 + stop_pct))
+
+    n = len(close)
+    window = bars[:, None] + np.arange(1, hold_bars + 1)
+    inside = window < n
+    window = np.minimum(window, n - 1)
+    hi, lo = high[window], low[window]
+    hit_target = np.where(long[:, None], hi >= target[:, None], lo <= target[:, None]) & inside
+    hit_stop = np.where(long[:, None], lo <= stop[:, None], hi >= stop[:, None]) & inside
+    first_target = np.where(hit_target.any(axis=1), hit_target.argmax(axis=1), hold_bars)
+    first_stop = np.where(hit_stop.any(axis=1), hit_stop.argmax(axis=1), hold_bars)
+
+    stopped = (first_stop <= first_target) & (first_stop < hold_bars)
+    targeted = ~stopped & (first_target < hold_bars)
+    expired = ~stopped & ~targeted & (bars + hold_bars < n)
+    exit_bar = np.where(stopped, bars + 1 + first_stop,
+                        np.where(targeted, bars + 1 + first_target, bars + hold_bars))
+    exit_price = np.where(stopped, stop, np.where(targeted, target, close[np.minimum(exit_bar, n - 1)]))
+    outcome = np.select([stopped, targeted, expired], ["STOP_HIT", "TARGET_HIT", "TIME_EXPIRED"], None)
+    return target, stop, exit_bar, exit_price, outcome
+
+
+def signal_outcomes(cube, confidence, direction, bar_secs, start=HISTORY_BARS, sticky_confirms=STICKY_CONFIRMS,
+                    hold_minutes=MIN_SIGNAL_HOLD_MINUTES, cooldown_minutes=SIGNAL_COOLDOWN_MINS,
+                    warmup_seconds=WARMUP_SECONDS, target_pct=TARGET_PCT, stop_pct=STOP_PCT,
+                    signal_hold_minutes=HOLD_MINUTES):
+    """
+    Simulated and resolved signals for each symbol of an (S, T, 5) cube that fires.
+    Yields (symbol index, bars, sides, confidences, entry, target, stop, exit_bar,
+    exit_price, outcome) as arrays.
+    """
+    hold_bars = math.ceil(signal_hold_minutes * 60 / bar_secs)
+    for i in range(len(cube)):
+        fired = simulate_signals(direction[i], confidence[i], bar_secs, start, sticky_confirms,
+                                 hold_minutes, cooldown_minutes, warmup_seconds)
+        if not fired:
+            continue
+        bars, sides, confs = (np.array(x) for x in zip(*fired))
+        high, low, close = cube[i, :, 1], cube[i, :, 2], cube[i, :, 3]
+        target, stop, exit_bar, exit_price, outcome = resolve_outcomes(
+            high, low, close, bars, sides, hold_bars, target_pct, stop_pct)
+        yield i, bars, sides, confs, close[bars], target, stop, exit_bar, exit_price, outcome
+
+
+def backtest(ohlcv_by_symbol, timeframe=MAIN_TIMEFRAME, rsi_period=9, start=HISTORY_BARS,
+             long_threshold=LONG_CONFIDENCE, short_threshold=SHORT_CONFIDENCE, sticky_confirms=STICKY_CONFIRMS,
+             hold_minutes=MIN_SIGNAL_HOLD_MINUTES, cooldown_minutes=SIGNAL_COOLDOWN_MINS,
+             warmup_seconds=WARMUP_SECONDS, target_pct=TARGET_PCT, stop_pct=STOP_PCT,
+             signal_hold_minutes=HOLD_MINUTES):
+    """
+    Backtest {symbol: ccxt 1m OHLCV list}, evaluating once per `timeframe`
+    bar. Returns one row per signal with the SignalEntry fields plus the
+    realised return.
+    """
+    bar_secs = TIMEFRAME_SECS[timeframe]
+    bar_ms = bar_secs * 1000
+    symbols, times, cube = align_ohlcv(ohlcv_by_symbol)
+    if not symbols:
+        return pd.DataFrame()
+    times, cube, columns = analysis_columns(times, cube, timeframe, rsi_period)
+    confidence = compiled_rules.score(columns)
+    direction = directions(confidence, long_threshold, short_threshold)
+
+    frames = []
+    for i, bars, sides, confs, entry, target, stop, exit_bar, exit_price, outcome in signal_outcomes(
+            cube, confidence, direction, bar_secs, start, sticky_confirms, hold_minutes, cooldown_minutes,
+            warmup_seconds, target_pct, stop_pct, signal_hold_minutes):
+        resolved = pd.notna(outcome)
+        exit_ms = times[np.minimum(exit_bar, len(times) - 1)] + bar_ms
+        frames.append(pd.DataFrame({
+            "symbol": symbols[i],
+            "signal_type": [SIDE_NAMES[s] for s in sides],
+            "confidence": confs,
+            "entry_price": entry,
+            "entry_time": pd.to_datetime(times[bars] + bar_ms, unit="ms"),
+            "target_price": target,
+            "stop_price": stop,
+            "exit_price": np.where(resolved, exit_price, np.nan),
+            "exit_time": pd.to_datetime(exit_ms, unit="ms").where(resolved),
+            "outcome": outcome,
+            "return_pct": np.where(resolved, sides * (exit_price - entry) / entry * 100, np.nan),
+        }))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize(trades):
+    """Per-symbol signal counts, outcome mix and returns."""
+    if trades.empty:
+        return pd.DataFrame()
+    closed = trades[trades["outcome"].notna()]
+    grouped = closed.groupby("symbol")
+    summary = pd.DataFrame({
+        "signals": trades.groupby("symbol").size(),
+        "target_hit": grouped["outcome"].apply(lambda o: (o == "TARGET_HIT").sum()),
+        "stop_hit": grouped["outcome"].apply(lambda o: (o == "STOP_HIT").sum()),
+        "time_expired": grouped["outcome"].apply(lambda o: (o == "TIME_EXPIRED").sum()),
+        "win_rate": grouped["return_pct"].apply(lambda r: (r > 0).mean()),
+        "avg_return_pct": grouped["return_pct"].mean(),
+        "total_return_pct": grouped["return_pct"].sum(),
+    })
+    return summary.fillna(0)
+
+
+def load_csv(path):
+    """ccxt-style OHLCV rows from a CSV with timestamp (ms), open, high, low, close, volume columns."""
+    return pd.read_csv(path, usecols=range(6)).to_numpy(dtype=float)
+
+
+async def fetch_history(symbols, timeframe, days):
+    from data_feed import fetch_ohlcv_history, close_exchange
+    since = int((time.time() - days * 86400) * 1000)
+    try:
+        results = await asyncio.gather(*[fetch_ohlcv_history(sym, timeframe, since) for sym in symbols])
+    finally:
+        await close_exchange()
+    return dict(zip(symbols, results))
+
+
+def load_history(symbols, timeframe, days, csv_dir=None, offline=False):
+    """{symbol: OHLCV rows} from CSV files, the candle store (offline) or the exchange."""
+    if csv_dir:
+        return {sym: load_csv(os.path.join(csv_dir, f"{sym.replace('/', '_')}_{timeframe}.csv"))
+                for sym in symbols}
+    if offline:
+        from candle_store import candle_store
+        since = int((time.time() - days * 86400) * 1000)
+        return {sym: candle_store.ohlcv(sym, timeframe, since) for sym in symbols}
+    return asyncio.run(fetch_history(symbols, timeframe, days))
+
+
+def add_history_arguments(parser):
+    parser.add_argument("--symbols", nargs="+", default=["SOL/USDT", "ETH/USDT", "AVAX/USDT"])
+    parser.add_argument("--timeframe", default=MAIN_TIMEFRAME, help="timeframe evaluated once per bar")
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--csv-dir", help=f"read <csv-dir>/<BASE>_<QUOTE>_{BASE_TIMEFRAME}.csv instead of fetching")
+    parser.add_argument("--offline", action="store_true", help="use only candles already in the candle store")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectorised backtest of the agent's signal logic")
+    add_history_arguments(parser)
+    parser.add_argument("--out", default="backtest_trades.csv")
+    args = parser.parse_args()
+
+    data = load_history(args.symbols, BASE_TIMEFRAME, args.days, args.csv_dir, args.offline)
+    started = time.perf_counter()
+    trades = backtest(data, args.timeframe)
+    elapsed = time.perf_counter() - started
+    print(f"[Backtest] {len(trades)} signals across {len(args.symbols)} symbols in {elapsed:.2f}s")
+    print(summarize(trades).to_string())
+    trades.to_csv(args.out, index=False)
+    print(f"[Backtest] Trades saved to {args.out}")
@@ -0,0 +1,374 @@
+import numpy as np
+import pandas as pd
+import talib
+from numpy.lib.stride_tricks import sliding_window_view
+from indicator_engine import INDICATOR_COLUMNS, OHLCV_COLUMNS, ICHIMOKU_DISPLACEMENT
+
+# Batch mode of strategy_engine.calc_indicators for a whole symbol universe.
+#
+# Inputs are aligned 2-D arrays shaped (symbols, bars). Windowed indicators are
+# computed with sliding-window views over the bar axis; recursive ones
+# (EMA/RSI/ATR/ADX/Supertrend) step along the bar axis once, with each step a
+# vector operation over every symbol. Values follow the same TA-Lib/pandas_ta
+# definitions as calc_indicators (checked row by row against it).
+
+
+def _full(shape):
+    return np.full(shape, np.nan)
+
+
+def _rolling(x, n):
+    """(S, T, n) window view; windows end at bars n-1..T-1."""
+    return sliding_window_view(x, n, axis=1)
+
+
+def _rolling_apply(x, n, fn):
+    out = _full(x.shape)
+    if x.shape[1] >= n:
+        out[:, n - 1:] = fn(_rolling(x, n), axis=-1)
+    return out
+
+
+def _sma(x, n):
+    return _rolling_apply(x, n, np.mean)
+
+
+def _rolling_max(x, n):
+    return _rolling_apply(x, n, np.max)
+
+
+def _rolling_min(x, n):
+    return _rolling_apply(x, n, np.min)
+
+
+def _rolling_sum(x, n):
+    return _rolling_apply(x, n, np.sum)
+
+
+def _wma(x, n):
+    weights = np.arange(1, n + 1, dtype=float)
+    return _rolling_apply(x, n, lambda w, axis: w @ weights / weights.sum())
+
+
+def _first_valid(x):
+    valid = ~np.isnan(x).any(axis=0)
+    return int(np.argmax(valid)) if valid.any() else x.shape[1]
+
+
+def _ema(x, n, start=None):
+    """TA-Lib EMA along bars; seeded with the SMA of `n` values ending at `start`."""
+    out = _full(x.shape)
+    first = _first_valid(x)
+    seed = first + n - 1 if start is None else start
+    if seed >= x.shape[1]:
+        return out
+    k = 2.0 / (n + 1)
+    prev = x[:, seed - n + 1:seed + 1].mean(axis=1)
+    out[:, seed] = prev
+    for t in range(seed + 1, x.shape[1]):
+        prev = (x[:, t] - prev) * k + prev
+        out[:, t] = prev
+    return out
+
+
+def _wilder_rsi(c, n):
+    out = _full(c.shape)
+    if c.shape[1] <= n:
+        return out
+    diff = np.diff(c, axis=1)
+    up, down = np.clip(diff, 0, None), np.clip(-diff, 0, None)
+    gain, loss = up[:, :n].mean(axis=1), down[:, :n].mean(axis=1)
+
+    def rsi(g, l):
+        total = g + l
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(np.abs(total) < 1e-8, 0.0, 100.0 * g / total)
+
+    out[:, n] = rsi(gain, loss)
+    for t in range(n + 1, c.shape[1]):
+        gain = (gain * (n - 1) + up[:, t - 1]) / n
+        loss = (loss * (n - 1) + down[:, t - 1]) / n
+        out[:, t] = rsi(gain, loss)
+    return out
+
+
+def _true_range(h, l, c):
+    tr = _full(c.shape)
+    prev = c[:, :-1]
+    tr[:, 1:] = np.maximum.reduce([h[:, 1:] - l[:, 1:], np.abs(h[:, 1:] - prev), np.abs(l[:, 1:] - prev)])
+    return tr
+
+
+def _atr(h, l, c, n):
+    tr = _true_range(h, l, c)
+    out = _full(c.shape)
+    if c.shape[1] <= n:
+        return out
+    prev = tr[:, 1:n + 1].mean(axis=1)
+    out[:, n] = prev
+    for t in range(n + 1, c.shape[1]):
+        prev = (prev * (n - 1) + tr[:, t]) / n
+        out[:, t] = prev
+    return out
+
+
+def _adx(h, l, c, n=14):
+    S, T = c.shape
+    out = _full(c.shape)
+    if T < 2 * n:
+        return out
+    diff_p = np.zeros(c.shape)
+    diff_m = np.zeros(c.shape)
+    diff_p[:, 1:] = h[:, 1:] - h[:, :-1]
+    diff_m[:, 1:] = l[:, :-1] - l[:, 1:]
+    minus_move = (diff_m > 0) & (diff_p < diff_m)
+    plus_move = ~minus_move & (diff_p > 0) & (diff_p > diff_m)
+    plus = np.where(plus_move, diff_p, 0.0)
+    minus = np.where(minus_move, diff_m, 0.0)
+    tr = _true_range(h, l, c)
+
+    plus_dm = plus[:, 1:n].sum(axis=1)
+    minus_dm = minus[:, 1:n].sum(axis=1)
+    tr_sum = tr[:, 1:n].sum(axis=1)
+    sum_dx = np.zeros(S)
+    adx = _full(S)
+    for t in range(n, T):
+        plus_dm = plus_dm - plus_dm / n + plus[:, t]
+        minus_dm = minus_dm - minus_dm / n + minus[:, t]
+        tr_sum = tr_sum - tr_sum / n + tr[:, t]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            plus_di = 100.0 * plus_dm / tr_sum
+            minus_di = 100.0 * minus_dm / tr_sum
+            di_sum = plus_di + minus_di
+            dx = 100.0 * np.abs(minus_di - plus_di) / di_sum
+        ok = (np.abs(tr_sum) >= 1e-8) & (np.abs(di_sum) >= 1e-8)
+        if t < 2 * n - 1:
+            sum_dx += np.where(ok, dx, 0.0)
+        elif t == 2 * n - 1:
+            sum_dx += np.where(ok, dx, 0.0)
+            adx = sum_dx / n
+            out[:, t] = adx
+        else:
+            adx = np.where(ok, (adx * (n - 1) + dx) / n, adx)
+            out[:, t] = adx
+    return out
+
+
+def _supertrend(h, l, c, length=7, multiplier=3.0):
+    S, T = c.shape
+    matr = multiplier * _atr(h, l, c, length)
+    hl2 = (h + l) / 2.0
+    lower, upper = hl2 - matr, hl2 + matr
+    trend = _full(c.shape)
+    direction = np.ones(S)
+    with np.errstate(invalid="ignore"):
+        for t in range(1, T):
+            up_break = c[:, t] > upper[:, t - 1]
+            down_break = ~up_break & (c[:, t] < lower[:, t - 1])
+            hold = ~up_break & ~down_break
+            direction = np.where(up_break, 1.0, np.where(down_break, -1.0, direction))
+            lower[:, t] = np.where(hold & (direction > 0) & (lower[:, t] < lower[:, t - 1]), lower[:, t - 1], lower[:, t])
+            upper[:, t] = np.where(hold & (direction < 0) & (upper[:, t] > upper[:, t - 1]), upper[:, t - 1], upper[:, t])
+            trend[:, t] = np.where(direction > 0, lower[:, t], upper[:, t])
+    return trend
+
+
+def _shift(x, k):
+    out = _full(x.shape)
+    if k < x.shape[1]:
+        out[:, k:] = x[:, :x.shape[1] - k]
+    return out
+
+
+def _midprice(h, l, n):
+    return (_rolling_max(h, n) + _rolling_min(l, n)) / 2.0
+
+
+def _rolling_nan(x, n, fn):
+    """pandas rolling semantics: NaN unless the whole window is valid."""
+    out = _rolling_apply(np.nan_to_num(x, nan=0.0), n, fn)
+    invalid = _rolling_apply(np.isnan(x).astype(float), n, np.max)
+    out[np.isnan(invalid) | (invalid > 0)] = np.nan
+    return out
+
+
+def _stochrsi_k(c, length, rsi_length=14, k=3):
+    rsi = _wilder_rsi(c, rsi_length)
+    lowest = _rolling_nan(rsi, length, np.min)
+    highest = _rolling_nan(rsi, length, np.max)
+    span = highest - lowest
+    span = np.where(span == 0, np.finfo(float).eps, span)
+    stoch = 100.0 * (rsi - lowest) / span
+    return _rolling_nan(stoch, k, np.mean)
+
+
+def _macd(c, fast=12, slow=26, signal=9):
+    S, T = c.shape
+    macd = _full(c.shape)
+    hist = _full(c.shape)
+    start = slow - 1
+    if T < start + signal:
+        return macd, hist
+    line = _ema(c, fast, start=start) - _ema(c, slow, start=start)
+    sig = _ema(line, signal, start=start + signal - 1)
+    valid = start + signal - 1
+    macd[:, valid:] = line[:, valid:]
+    hist[:, valid:] = line[:, valid:] - sig[:, valid:]
+    return macd, hist
+
+
+def _cci(h, l, c, n=20):
+    tp = (h + l + c) / 3.0
+    out = _full(c.shape)
+    if c.shape[1] < n:
+        return out
+    windows = _rolling(tp, n)
+    mean = windows.mean(axis=-1)
+    mean_dev = np.abs(windows - mean[..., None]).mean(axis=-1)
+    diff = tp[:, n - 1:] - mean
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[:, n - 1:] = np.where((diff != 0) & (mean_dev != 0), diff / (0.015 * mean_dev), 0.0)
+    return out
+
+
+def _obv(c, v):
+    signed = np.zeros(c.shape)
+    signed[:, 1:] = np.sign(np.diff(c, axis=1)) * v[:, 1:]
+    signed[:, 0] = v[:, 0]
+    return np.cumsum(signed, axis=1)
+
+
+def _vwap(h, l, c, v, timestamps):
+    pv = (h + l + c) / 3.0 * v
+    day = np.asarray(timestamps, dtype="int64") // 86_400_000
+    starts = np.r_[0, np.flatnonzero(np.diff(day)) + 1]
+    cum_pv, cum_v = np.cumsum(pv, axis=1), np.cumsum(v, axis=1)
+    # Subtract running totals carried over from previous days
+    seg = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(day)]))
+    base_pv = np.where(starts > 0, cum_pv[:, np.maximum(starts - 1, 0)], 0.0)[:, seg]
+    base_v = np.where(starts > 0, cum_v[:, np.maximum(starts - 1, 0)], 0.0)[:, seg]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (cum_pv - base_pv) / (cum_v - base_v)
+
+
+def _bbands(c, n=20, dev=2.0):
+    out = [_full(c.shape) for _ in range(3)]
+    if c.shape[1] < n:
+        return out
+    windows = _rolling(c, n)
+    mid = windows.mean(axis=-1)
+    std = windows.std(axis=-1)
+    out[0][:, n - 1:] = mid + dev * std
+    out[1][:, n - 1:] = mid
+    out[2][:, n - 1:] = mid - dev * std
+    return out
+
+
+def _patterns(o, h, l, c, fn):
+    # TA-Lib's pattern recognisers are C loops; one call per symbol row.
+    return np.vstack([fn(o[i], h[i], l[i], c[i]) for i in range(c.shape[0])]).astype(float)
+
+
+def calc_indicators_batch(opens, highs, lows, closes, volumes, timestamps, rsi_period=9, columns=None):
+    """
+    Vectorised calc_indicators over a (symbols, bars) universe.
+
+    All arrays share one bar axis; `timestamps` is the 1-D candle open time in ms.
+    `columns` optionally limits the indicators computed (OHLCV is always included).
+    Returns {column: (symbols, bars) float array} for OHLCV + indicator columns.
+    """
+    o, h, l, c, v = (np.asarray(a, dtype=float) for a in (opens, highs, lows, closes, volumes))
+    if c.ndim == 1:
+        o, h, l, c, v = (a[None, :] for a in (o, h, l, c, v))
+    want = set(INDICATOR_COLUMNS if columns is None else columns)
+    out = {"open": o, "high": h, "low": l, "close": c, "volume": v}
+    if "ema8" in want:
+        out["ema8"] = _ema(c, 8)
+    if "ema21" in want:
+        out["ema21"] = _ema(c, 21)
+    if "ema200" in want:
+        out["ema200"] = _ema(c, 200)
+    if "hma21" in want:
+        out["hma21"] = _wma(2.0 * _wma(c, 10) - _wma(c, 21), 4)
+    if "supertrend" in want:
+        out["supertrend"] = _supertrend(h, l, c)
+    if "ichimoku_a" in want:
+        out["ichimoku_a"] = _shift((_midprice(h, l, 9) + _midprice(h, l, 26)) / 2.0, ICHIMOKU_DISPLACEMENT)
+    if "ichimoku_b" in want:
+        out["ichimoku_b"] = _shift(_midprice(h, l, 52), ICHIMOKU_DISPLACEMENT)
+    if "choppiness" in want:
+        tr_sum = _rolling_nan(_true_range(h, l, c), 14, np.sum)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            chop = 100.0 * (np.log10(tr_sum) - np.log10(_rolling_max(h, 14) - _rolling_min(l, 14))) / np.log10(14)
+        out["choppiness"] = np.where(np.isfinite(chop), chop, np.nan)
+    if "rsi" in want:
+        out["rsi"] = _wilder_rsi(c, rsi_period)
+    if "stochrsi_k" in want:
+        out["stochrsi_k"] = _stochrsi_k(c, rsi_period)
+    if want & {"macd", "macdhist"}:
+        out["macd"], out["macdhist"] = _macd(c)
+    if "cci" in want:
+        out["cci"] = _cci(h, l, c)
+    if "obv" in want:
+        out["obv"] = _obv(c, v)
+    if "vwap" in want:
+        out["vwap"] = _vwap(h, l, c, v, timestamps)
+    if want & {"bb_upper", "bb_middle", "bb_lower"}:
+        out["bb_upper"], out["bb_middle"], out["bb_lower"] = _bbands(c)
+    if "atr" in want:
+        out["atr"] = _atr(h, l, c, 14)
+    if "adx" in want:
+        out["adx"] = _adx(h, l, c, 14)
+    if "engulfing" in want:
+        out["engulfing"] = _patterns(o, h, l, c, talib.CDLENGULFING)
+    if "hammer" in want:
+        out["hammer"] = _patterns(o, h, l, c, talib.CDLHAMMER)
+    return out
+
+
+class IndicatorMatrix:
+    """
+    Columnar indicator results for a symbol universe: one (symbols, bars)
+    array per column, with per-symbol views for comprehensive_strategy_checks.
+    """
+
+    def __init__(self, symbols, timestamps, columns):
+        self.symbols = list(symbols)
+        self.row = {sym: i for i, sym in enumerate(self.symbols)}
+        self.timestamps = np.asarray(timestamps, dtype="int64")
+        self.columns = columns
+
+    @classmethod
+    def from_ohlcv(cls, ohlcv_by_symbol, bars=None, rsi_period=9):
+        """Build from {symbol: ccxt OHLCV list}, aligned on the most recent common bars."""
+        symbols = [s for s, rows in ohlcv_by_symbol.items() if rows]
+        if not symbols:
+            return cls([], [], {})
+        common = set.intersection(*(set(r[0] for r in ohlcv_by_symbol[s]) for s in symbols))
+        times = np.array(sorted(common), dtype="int64")
+        if bars:
+            times = times[-bars:]
+        cube = np.empty((len(symbols), len(times), 5))
+        for i, sym in enumerate(symbols):
+            rows = {r[0]: r[1:6] for r in ohlcv_by_symbol[sym]}
+            cube[i] = [rows[t] for t in times]
+        columns = calc_indicators_batch(cube[..., 0], cube[..., 1], cube[..., 2], cube[..., 3],
+                                        cube[..., 4], times, rsi_period)
+        return cls(symbols, times, columns)
+
+    def column(self, name):
+        return self.columns[name]
+
+    def last(self, name):
+        """Latest value of a column for every symbol (1-D, in `symbols` order)."""
+        return self.columns[name][:, -1]
+
+    def frame(self, symbol, tail=None):
+        """DataFrame for one symbol in calc_indicators layout (last `tail` bars)."""
+        i = self.row[symbol]
+        sl = slice(-tail, None) if tail else slice(None)
+        index = pd.to_datetime(self.timestamps[sl], unit="ms")
+        index.name = "timestamp"
+        df = pd.DataFrame({col: self.columns[col][i, sl] for col in OHLCV_COLUMNS + INDICATOR_COLUMNS}, index=index)
+        df["symbol"] = symbol
+        return df
@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import platform
+import contextlib
+import statistics
+from datetime import datetime
+import pandas as pd
+from market_fixtures import (SyntheticExchange, synthetic_candles, synthetic_order_book, synthetic_heatmap,
+                             FIXTURE_NOW_MS)
+
+# Benchmarks for each stage of the analysis loop on deterministic synthetic data.
+#
+#   python benchmark.py                      # run, write benchmark_results.json
+#   python benchmark.py --save-baseline      # also store it as the baseline
+#   python benchmark.py --baseline base.json # flag stages slower than baseline * (1 + tolerance)
+#
+# Pipeline stages are timed in-process on fixed fixtures. The agent stage runs
+# fetch_market_data + process_market_data (one analyze_symbol_continuous
+# iteration, without its sleep) for every symbol concurrently against
+# SyntheticExchange, first cold (full fetches and timeframe seeding) and then
+# warm (one new 1m candle per iteration). The agent is inside its warmup window
+# throughout, so no signals fire and no LLM calls are made. With --shards, the
+# largest universe is also split across worker processes by the shard ring
+# (shard_coordinator.py) and the shards iterate side by side.
+
+DEFAULT_SYMBOL_COUNTS = (3, 50, 500)
+DEFAULT_OUT = "benchmark_results.json"
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.25
+AGENT_WARM_ITERATIONS = 5
+
+
+def benchmark_symbols(count):
+    return [f"SYN{i:04d}/USDT" for i in range(count)]
+
+
+def _summary(samples):
+    return {
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "max_ms": max(samples),
+        "runs": len(samples),
+    }
+
+
+def time_call(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e3)
+    return _summary(samples)
+
+
+def _frame(candles):
+    df = pd.DataFrame(candles, columns=["timestamp", "open", "high", "low", "close", "volume"])
+    df.index = pd.to_datetime(df.pop("timestamp"), unit="ms")
+    return df
+
+
+def pipeline_benchmarks(repeat, symbol="SYN0000/USDT"):
+    from strategy_engine import calc_indicators, align_higher_tf, comprehensive_strategy_checks
+    from reasoning_layer import reasoning
+    from output_module import build_prompt
+    from indicator_engine import IndicatorEngine
+    from timeframe_builder import TimeframeBuilder, ROLLUP_TIMEFRAMES
+
+    results = {}
+    order_book = synthetic_order_book(symbol)
+    heatmap = synthetic_heatmap([symbol])
+    for limit in (100, 1000):
+        frame = _frame(synthetic_candles(symbol, "5m", limit))
+        results[f"calc_indicators[{limit}]"] = time_call(lambda: calc_indicators(frame.copy()), repeat)
+
+    df_5m = calc_indicators(_frame(synthetic_candles(symbol, "5m", 1000)))
+    df_15m = calc_indicators(_frame(synthetic_candles(symbol, "15m", 1000)))
+    results["align_higher_tf[1000]"] = time_call(lambda: align_higher_tf(df_5m, df_15m, "_15m"), repeat)
+
+    builder = TimeframeBuilder(IndicatorEngine())
+    base = synthetic_candles(symbol, "1m", 130)
+    history = {tf: synthetic_candles(symbol, tf, 100) for tf in ROLLUP_TIMEFRAMES}
+    results["timeframe_builder.seed"] = time_call(
+        lambda: (builder.reset(symbol), builder.ingest(symbol, base, history)), repeat)
+    results["timeframe_builder.tick"] = time_call(lambda: builder.ingest(symbol, base[-2:]), repeat)
+
+    df = builder.ingest(symbol, base)
+    df["symbol"] = symbol
+    results["comprehensive_strategy_checks"] = time_call(
+        lambda: comprehensive_strategy_checks(df, order_book, heatmap), repeat)
+    confidence, reasons = comprehensive_strategy_checks(df, order_book, heatmap)
+    results["reasoning"] = time_call(
+        lambda: reasoning(symbol, df, confidence, reasons, order_book, heatmap), repeat)
+    rationale = reasoning(symbol, df, confidence, reasons, order_book, heatmap)
+    indicators = df.iloc[-1].to_dict()
+    results["trader_speak.build_prompt"] = time_call(
+        lambda: build_prompt(symbol, ["LONG"], rationale, indicators, order_book, heatmap, confidence), repeat)
+    return results
+
+
+async def _agent_iterations(symbols, warm_iterations):
+    import agent
+    import data_feed
+    from request_scheduler import WeightScheduler
+    from timeframe_builder import timeframe_builder
+
+    exchange = SyntheticExchange(FIXTURE_NOW_MS)
+    data_feed.exchange = exchange
+    data_feed.scheduler = WeightScheduler(weight_per_minute=10 ** 12)  # measure compute, not the rate limit
+    data_feed.CANDLE_STORE_ENABLED = False
+    data_feed.candle_cache.clear()
+    data_feed.heatmap_provider.data = synthetic_heatmap(symbols)
+    data_feed.heatmap_provider.fetched_at = time.monotonic()
+    data_feed.heatmap_provider.ttl = math.inf
+    timeframe_builder.reset()
+    agent.seeded_symbols.clear()
+    agent.register_symbols(symbols)
+
+    async def iteration(symbol):
+        data = await agent.fetch_market_data(symbol)
+        if data is None:
+            raise RuntimeError(f"no market data for {symbol}")
+        await agent.process_market_data(symbol, *data)
+
+    samples = []
+    for _ in range(warm_iterations + 1):
+        started = time.perf_counter()
+        await asyncio.gather(*[iteration(sym) for sym in symbols])
+        samples.append((time.perf_counter() - started) * 1e3)
+        exchange.advance(60)
+    return samples, exchange.requests
+
+
+def agent_benchmarks(symbol_counts, warm_iterations=AGENT_WARM_ITERATIONS):
+    results = {}
+    for count in symbol_counts:
+        symbols = benchmark_symbols(count)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            samples, requests = asyncio.run(_agent_iterations(symbols, warm_iterations))
+        results[f"agent_iteration_cold[{count}]"] = _summary(samples[:1])
+        warm = _summary(samples[1:])
+        warm["per_symbol_ms"] = warm["median_ms"] / count
+        warm["requests"] = requests
+        results[f"agent_iteration[{count}]"] = warm
+        print(f"[Benchmark] agent x{count}: cold {samples[0]:.0f} ms, warm {warm['median_ms']:.0f} ms/iteration")
+    return results
+
+
+def _shard_iterations(symbols):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        samples, _ = asyncio.run(_agent_iterations(symbols, AGENT_WARM_ITERATIONS))
+    return samples
+
+
+def shard_benchmarks(count, worker_counts):
+    from concurrent.futures import ProcessPoolExecutor
+    from shard_coordinator import HashRing
+
+    symbols = benchmark_symbols(count)
+    results = {}
+    first = None
+    for workers in worker_counts:
+        shares = list(HashRing([f"worker-{i}" for i in range(workers)]).assign(symbols).values())
+        with ProcessPoolExecutor(len(shares)) as pool:
+            samples = list(pool.map(_shard_iterations, shares))
+        # A sharded iteration is done when the slowest shard is
+        warm = [statistics.median(s[1:]) for s in samples]
+        stats = {"median_ms": max(warm), "min_ms": min(warm), "max_ms": max(warm), "runs": AGENT_WARM_ITERATIONS,
+                 "shares": sorted(len(share) for share in shares), "symbols_per_sec": count / max(warm) * 1e3}
+        first = first or (workers, stats["symbols_per_sec"])
+        results[f"agent_sharded[{count}x{workers}]"] = stats
+        print(f"[Benchmark] agent x{count} on {workers} shard(s): warm {stats['median_ms']:.0f} ms/iteration, "
+              f"{stats['symbols_per_sec']:.0f} symbols/s (x{stats['symbols_per_sec'] / first[1]:.2f} vs {first[0]})")
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """[(stage, baseline ms, current ms, ratio, regressed)] for stages present in both runs."""
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None or not base["median_ms"]:
+            continue
+        ratio = current["median_ms"] / base["median_ms"]
+        rows.append((name, base["median_ms"], current["median_ms"], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def run(symbol_counts=DEFAULT_SYMBOL_COUNTS, repeat=30, shards=()):
+    results = pipeline_benchmarks(repeat)
+    for name, stats in results.items():
+        print(f"[Benchmark] {name}: {stats['median_ms']:.3f} ms (min {stats['min_ms']:.3f})")
+    results.update(agent_benchmarks(symbol_counts))
+    if shards:
+        results.update(shard_benchmarks(max(symbol_counts), shards))
+    return {
+        "created": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on synthetic market data")
+    parser.add_argument("--symbols", nargs="+", type=int, default=list(DEFAULT_SYMBOL_COUNTS))
+    parser.add_argument("--repeat", type=int, default=30, help="runs per pipeline stage")
+    parser.add_argument("--shards", nargs="+", type=int, default=[],
+                        help="worker counts to split the largest universe across (e.g. 1 2 4)")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run to --baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown vs baseline before a stage counts as regressed")
+    args = parser.parse_args()
+
+    report = run(args.symbols, args.repeat, args.shards)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[Benchmark] Results saved to {args.out}")
+
+    regressed = []
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[Benchmark] Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        for name, base_ms, current_ms, ratio, slower in compare(report["results"], baseline, args.tolerance):
+            flag = "REGRESSION" if slower else "ok"
+            print(f"[Benchmark] {name:40s} {base_ms:10.3f} -> {current_ms:10.3f} ms  x{ratio:.2f}  {flag}")
+            if slower:
+                regressed.append(name)
+    if regressed:
+        print(f"[Benchmark] {len(regressed)} stage(s) slower than baseline by more than {args.tolerance:.0%}")
+        sys.exit(1)
@@ -0,0 +1,110 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Local columnar candle store.
+#
+# One directory per (symbol, timeframe) holding one raw little-endian file per
+# column (timestamp int64 ms, OHLCV float64). Closed candles are appended in
+# time order; the timestamp file is written last, so its length is the number
+# of committed rows and a torn append is trimmed on the next write. Reads are
+# memory-mapped, and a time range is located by binary search on the timestamp
+# column, so range reads are zero-copy NumPy views. Each series expects a single
+# writer; any number of processes may read.
+
+CANDLE_STORE_DIR = os.getenv("CANDLE_STORE_DIR", os.path.join("data", "candles"))
+
+STORE_COLUMNS = (
+    ("timestamp", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+)
+ROW_BYTES = 8  # every column is 8 bytes wide
+
+
+class CandleStore:
+    def __init__(self, root=CANDLE_STORE_DIR):
+        self.root = root
+        self._maps = {}
+
+    def _dir(self, symbol, timeframe):
+        return os.path.join(self.root, symbol.replace("/", "_").replace(":", "_"), timeframe)
+
+    def _path(self, symbol, timeframe, column):
+        return os.path.join(self._dir(symbol, timeframe), f"{column}.bin")
+
+    def count(self, symbol, timeframe):
+        try:
+            return os.path.getsize(self._path(symbol, timeframe, "timestamp")) // ROW_BYTES
+        except OSError:
+            return 0
+
+    def _columns(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        n = self.count(symbol, timeframe)
+        cached = self._maps.get(key)
+        if cached is not None and cached[0] == n:
+            return cached[1]
+        if n == 0:
+            columns = {name: np.empty(0, dtype=dtype) for name, dtype in STORE_COLUMNS}
+        else:
+            columns = {name: np.memmap(self._path(symbol, timeframe, name), dtype=dtype, mode="r", shape=(n,))
+                       for name, dtype in STORE_COLUMNS}
+        self._maps[key] = (n, columns)
+        return columns
+
+    def last_timestamp(self, symbol, timeframe):
+        stamps = self._columns(symbol, timeframe)["timestamp"]
+        return int(stamps[-1]) if len(stamps) else None
+
+    def append(self, symbol, timeframe, candles):
+        """Append closed ccxt-style candles newer than the last stored one. Returns rows written."""
+        rows = np.asarray(candles, dtype=float).reshape(-1, 6)
+        last = self.last_timestamp(symbol, timeframe)
+        if last is not None:
+            rows = rows[rows[:, 0] > last]
+        if not len(rows):
+            return 0
+        stamps, first = np.unique(rows[:, 0].astype("int64"), return_index=True)
+        rows = rows[first]
+        os.makedirs(self._dir(symbol, timeframe), exist_ok=True)
+        n = self.count(symbol, timeframe)
+        for i, (name, dtype) in reversed(list(enumerate(STORE_COLUMNS))):
+            data = stamps if name == "timestamp" else rows[:, i]
+            path = self._path(symbol, timeframe, name)
+            with open(path, "ab") as f:
+                if os.path.getsize(path) > n * ROW_BYTES:
+                    f.truncate(n * ROW_BYTES)  # drop a torn append
+                f.write(np.ascontiguousarray(data, dtype=dtype).tobytes())
+        return len(rows)
+
+    def read(self, symbol, timeframe, since=None, until=None):
+        """{column: view} for candles opened in [since, until) (ms); views share the mapped files."""
+        columns = self._columns(symbol, timeframe)
+        stamps = columns["timestamp"]
+        lo = 0 if since is None else int(np.searchsorted(stamps, since, side="left"))
+        hi = len(stamps) if until is None else int(np.searchsorted(stamps, until, side="left"))
+        return {name: col[lo:hi] for name, col in columns.items()}
+
+    def ohlcv(self, symbol, timeframe, since=None, until=None):
+        """(N, 6) float array in ccxt row order."""
+        cols = self.read(symbol, timeframe, since, until)
+        return np.column_stack([cols[name] for name, _ in STORE_COLUMNS]).astype(float, copy=False)
+
+    def tail(self, symbol, timeframe, limit):
+        columns = self._columns(symbol, timeframe)
+        start = max(len(columns["timestamp"]) - limit, 0)
+        return np.column_stack([columns[name][start:] for name, _ in STORE_COLUMNS]).astype(float, copy=False)
+
+    def frame(self, symbol, timeframe, since=None, until=None):
+        """OHLCV DataFrame indexed by candle open time, like IndicatorEngine frames."""
+        cols = self.read(symbol, timeframe, since, until)
+        index = pd.to_datetime(np.asarray(cols["timestamp"]), unit="ms")
+        index.name = "timestamp"
+        return pd.DataFrame({name: np.asarray(cols[name]) for name, _ in STORE_COLUMNS[1:]}, index=index)
+
+
+candle_store = CandleStore()
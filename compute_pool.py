@@ -0,0 +1,148 @@
+import os
+import zlib
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from timeframe_builder import timeframe_builder
+from strategy_engine import comprehensive_strategy_checks
+from reasoning_layer import reasoning
+from metrics import registry, timed, SYMBOL_MEMORY_METRIC
+
+# Runs indicator/strategy computation in worker processes so pandas/TA-Lib work
+# never blocks the event loop. Each symbol is pinned to one single-process
+# worker, so that worker's incremental indicator_engine keeps the symbol's
+# state between calls. 1m candles travel through per-symbol shared memory
+# blocks; only the small order book / heatmap dicts (and a symbol's one-off
+# higher-timeframe seed) are pickled.
+
+CANDLE_FIELDS = 6  # timestamp, open, high, low, close, volume
+
+
+def analyze_market_data(symbol, ohlcv_1m, order_book, heatmap, history=None, builder=timeframe_builder):
+    """
+    Multi-timeframe indicators from 1m candles and strategy checks for one
+    symbol. `history` seeds the 5m/15m/1h streams on a symbol's first call
+    (and reseeds a symbol whose analysis resumes after a gap, e.g. when it
+    returns to a shard worker). Returns (df, confidence, reasons).
+    """
+    if history is not None and builder.seeded(symbol):
+        builder.reset(symbol)
+    frames = builder.get(symbol)
+    with timed("indicators", symbol):
+        frames.update(ohlcv_1m, history)
+    registry.set(SYMBOL_MEMORY_METRIC, frames.nbytes, symbol=symbol, component="frames")
+    with timed("timeframe_merge", symbol):
+        df = frames.frame()
+    df["symbol"] = symbol
+    with timed("checks", symbol):
+        checks_passed, reasons = comprehensive_strategy_checks(df, order_book, heatmap)
+    return df, checks_passed, reasons
+
+
+# -- Worker side --
+
+_attached = {}
+
+
+def _attach(name):
+    shm = _attached.get(name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix" and multiprocessing.get_start_method() != "fork":
+            # Spawned workers get their own resource tracker, which would unlink
+            # the parent's block when the worker exits
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        _attached[name] = shm
+    return shm
+
+
+def _read_candles(ref):
+    name, capacity, count = ref
+    shm = _attach(name)
+    block = np.ndarray((capacity, CANDLE_FIELDS), dtype=np.float64, buffer=shm.buf)
+    return block[:count].copy()
+
+
+def _analyze_shared(symbol, ref_1m, order_book, heatmap, history):
+    with registry.capture() as observations:
+        df, checks_passed, reasons = analyze_market_data(symbol, _read_candles(ref_1m), order_book, heatmap, history)
+    # The caller only reads the latest rows (entry price, ATR, reasoning)
+    return df.tail(2), checks_passed, reasons, observations
+
+
+def _reasoning(symbol, df, checks_passed, reasons, order_book, heatmap, now=None):
+    return reasoning(symbol, df, checks_passed, reasons, order_book, heatmap, now=now)
+
+
+# -- Event-loop side --
+
+class _SharedCandles:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.shm = shared_memory.SharedMemory(create=True, size=capacity * CANDLE_FIELDS * 8)
+        self.block = np.ndarray((capacity, CANDLE_FIELDS), dtype=np.float64, buffer=self.shm.buf)
+
+    def write(self, ohlcv):
+        rows = ohlcv[-self.capacity:]
+        self.block[:len(rows)] = rows
+        return self.shm.name, self.capacity, len(rows)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ComputeExecutor:
+    """
+    workers: number of worker processes (symbols are hashed onto them).
+    max_pending: in-flight computations allowed before callers wait (backpressure).
+    capacity: candles per shared block (>= the fetch limit).
+    """
+
+    def __init__(self, workers=2, max_pending=32, capacity=1000):
+        self.pools = [ProcessPoolExecutor(max_workers=1) for _ in range(max(workers, 1))]
+        self.slots = asyncio.Semaphore(max_pending)
+        self.capacity = capacity
+        self.buffers = {}
+        self.locks = {}
+
+    def _pool(self, symbol):
+        return self.pools[zlib.crc32(symbol.encode()) % len(self.pools)]
+
+    def _share(self, symbol, timeframe, ohlcv):
+        key = (symbol, timeframe)
+        if key not in self.buffers:
+            self.buffers[key] = _SharedCandles(self.capacity)
+        return self.buffers[key].write(ohlcv)
+
+    async def analyze(self, symbol, ohlcv_1m, order_book, heatmap, history=None):
+        lock = self.locks.setdefault(symbol, asyncio.Lock())
+        async with self.slots, lock:  # the lock protects this symbol's shared block
+            ref_1m = self._share(symbol, "1m", ohlcv_1m)
+            loop = asyncio.get_running_loop()
+            df, checks_passed, reasons, observations = await loop.run_in_executor(
+                self._pool(symbol), _analyze_shared, symbol, ref_1m, order_book, heatmap, history)
+        registry.replay(observations)
+        return df, checks_passed, reasons
+
+    async def reasoning(self, symbol, df, checks_passed, reasons, order_book, heatmap, now=None):
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._pool(symbol), _reasoning, symbol, df, checks_passed, reasons, order_book, heatmap, now)
+
+    def nbytes_by_symbol(self):
+        usage = {}
+        for (symbol, _), buf in self.buffers.items():
+            usage[symbol] = usage.get(symbol, 0) + buf.block.nbytes
+        return usage
+
+    def shutdown(self):
+        for pool in self.pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+        for buf in self.buffers.values():
+            buf.close()
+        self.buffers.clear()
@@ -1,57 +1,390 @@
 import os
-import ccxt.async_support as ccxt
-import aiohttp
+import sys
+import json
+import time
+import tempfile
+import asyncio
+import logging
+from collections import deque
+import numpy as np
 from dotenv import load_dotenv
+from request_scheduler import scheduler, request_weight, PRIORITY_ANALYSIS, PRIORITY_BACKGROUND
+from candle_store import candle_store
+from metrics import registry, timed, startup_phase
 
 load_dotenv()
+log = logging.getLogger(__name__)
 
 BINANCE_API_KEY = os.getenv("BINANCE_API_KEY")
 BINANCE_API_SECRET = os.getenv("BINANCE_API_SECRET")
+HEATMAP_URL = "https://api.coingecko.com/api/v3/search/trending"
+HEATMAP_TTL_SECS = float(os.getenv("HEATMAP_TTL_SECS", "300"))
+HEATMAP_RETRY_SECS = float(os.getenv("HEATMAP_RETRY_SECS", "30"))  # after a failed fetch, unless Retry-After says otherwise
+# Persist closed candles to candle_store.py and read history through it
+CANDLE_STORE_ENABLED = os.getenv("CANDLE_STORE", "1") == "1"
+# Markets/metadata ccxt loads before the first request, kept on disk between runs
+MARKETS_SNAPSHOT_PATH = os.getenv("MARKETS_SNAPSHOT_PATH", "markets_snapshot.json")
+MARKETS_SNAPSHOT_TTL_SECS = float(os.getenv("MARKETS_SNAPSHOT_TTL_SECS", "86400"))  # 0 disables the snapshot
 
-exchange = ccxt.binance({
-    "apiKey": BINANCE_API_KEY,
-    "secret": BINANCE_API_SECRET,
-    "enableRateLimit": True,
-})
+# ccxt is imported and the client built on first use (get_exchange), so that
+# importing this module stays cheap. Tools may assign their own exchange.
+exchange = None
+_own_exchange = None
+_markets_loading = None
 
-async def fetch_ohlcv(symbol: str, timeframe: str = "1m", limit: int = 100):
-    print(f"[DataFeed] Fetching {timeframe} OHLCV for {symbol}...")
+def get_exchange():
+    global exchange, _own_exchange
+    if exchange is None:
+        with startup_phase("exchange_client"):
+            import ccxt.async_support as ccxt
+            exchange = _own_exchange = ccxt.binance({
+                "apiKey": BINANCE_API_KEY,
+                "secret": BINANCE_API_SECRET,
+                # Throttling is done by request_scheduler, which knows per-endpoint weights
+                "enableRateLimit": False,
+            })
+    return exchange
+
+def read_markets_snapshot(path=MARKETS_SNAPSHOT_PATH, ttl=MARKETS_SNAPSHOT_TTL_SECS):
+    """The saved {"markets", "currencies"} when younger than `ttl`, else None."""
+    if ttl <= 0 or not os.path.exists(path) or time.time() - os.path.getmtime(path) >= ttl:
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable markets snapshot %s: %s", path, e)
+        return None
+
+def write_markets_snapshot(markets, currencies, path=MARKETS_SNAPSHOT_PATH):
+    # A temp file of its own per process: shard workers on one host all save on a cold start
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"markets": markets, "currencies": currencies}, f, default=str)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+async def _load_markets(ex):
+    global _markets_loading
+    try:
+        with startup_phase("markets"):
+            snapshot = await asyncio.to_thread(read_markets_snapshot)
+            if snapshot is not None:
+                ex.set_markets(snapshot["markets"], snapshot.get("currencies"))
+                log.info("Loaded %d markets from %s", len(ex.markets), MARKETS_SNAPSHOT_PATH)
+                return
+            await ex.load_markets()
+        log.info("Loaded %d markets from the exchange", len(ex.markets))
+        if MARKETS_SNAPSHOT_TTL_SECS > 0:
+            try:
+                await asyncio.to_thread(write_markets_snapshot, ex.markets, ex.currencies)
+            except (OSError, TypeError, ValueError) as e:
+                log.warning("Markets snapshot to %s failed: %s", MARKETS_SNAPSHOT_PATH, e)
+    except Exception:
+        _markets_loading = None  # the next request tries again
+        raise
+
+async def _ready_exchange():
+    """The exchange, with the markets of the one built here loaded once (snapshot first)."""
+    global _markets_loading
+    ex = get_exchange()
+    if ex is _own_exchange and not ex.markets:
+        if _markets_loading is None:
+            _markets_loading = asyncio.ensure_future(_load_markets(ex))
+        await asyncio.shield(_markets_loading)
+    return ex
+
+def _rate_limited(error):
+    # Raised by ccxt only, so it is imported whenever one of these can occur
+    ccxt = sys.modules.get("ccxt")
+    return ccxt is not None and isinstance(error, (ccxt.RateLimitExceeded, ccxt.DDoSProtection))
+
+async def _scheduled(endpoint, size, priority, method, *args, **kwargs):
+    """Call the exchange's `method` (by name) once request_scheduler admits it."""
+    symbol = args[0] if args else None
+    with timed("fetch_wait", symbol, endpoint=endpoint):
+        await scheduler.acquire(request_weight(endpoint, size), priority)
+    ex = None
     try:
-        data = await exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
-        print(f"[DataFeed] Fetched {len(data)} OHLCV candles for {symbol}.")
+        ex = await _ready_exchange()
+        with timed("fetch", symbol, endpoint=endpoint):
+            return await getattr(ex, method)(*args, **kwargs)
+    except Exception as e:
+        if _rate_limited(e):
+            registry.inc("fetch_rate_limited_total", endpoint=endpoint)
+            headers = (ex.last_response_headers if ex is not None else None) or {}  # None: raised loading markets
+            scheduler.backoff(headers.get("Retry-After") or headers.get("retry-after"))
+        else:
+            registry.inc("fetch_errors_total", endpoint=endpoint, symbol=symbol)
+        raise
+    finally:
+        if ex is not None:
+            scheduler.observe(ex.last_response_headers)
+
+async def fetch_ohlcv(symbol: str, timeframe: str = "1m", limit: int = 100, priority: int = PRIORITY_ANALYSIS):
+    log.debug("Fetching OHLCV", extra={"symbol": symbol, "timeframe": timeframe})
+    try:
+        data = await _scheduled("klines", limit, priority, "fetch_ohlcv", symbol, timeframe=timeframe, limit=limit)
+        log.debug("Fetched %d OHLCV candles", len(data), extra={"symbol": symbol, "timeframe": timeframe})
         return data
     except Exception as e:
-        print(f"[DataFeed] Error fetching OHLCV for {symbol}: {e}")
+        log.warning("Error fetching OHLCV: %s", e, extra={"symbol": symbol, "timeframe": timeframe})
         return []
 
-async def fetch_order_book(symbol: str, limit: int = 100):
-    print(f"[DataFeed] Fetching order book for {symbol}...")
+def store_closed_candles(symbol, timeframe, candles, fetched_from=None):
+    """
+    Append the closed candles that extend the stored series. Returns False
+    (storing nothing) when they would leave a gap after the last stored candle,
+    unless they were fetched from `fetched_from` (ms) at or before it, in which
+    case the gap is the exchange's own.
+    """
+    if not CANDLE_STORE_ENABLED or not len(candles):
+        return True
+    ex = get_exchange()
+    tf_ms = ex.parse_timeframe(timeframe) * 1000
+    now = ex.milliseconds()
+    last = candle_store.last_timestamp(symbol, timeframe)
+    closed = [c for c in candles if c[0] + tf_ms <= now and (last is None or c[0] > last)]
+    if not closed:
+        return True
+    if last is not None and closed[0][0] > last + tf_ms and (fetched_from is None or fetched_from > last + tf_ms):
+        return False
+    candle_store.append(symbol, timeframe, closed)
+    return True
+
+async def fetch_ohlcv_history(symbol: str, timeframe: str, since: int, until: int = None,
+                              page: int = 1000, priority: int = PRIORITY_BACKGROUND):
+    """
+    Closed candles opened in [since, until) (ms; until defaults to now) as an
+    (N, 6) array. Candles already in the candle store are read from disk; only
+    the rest is paged from the exchange via ccxt `since`, and stored.
+    """
+    ex = get_exchange()
+    tf_ms = ex.parse_timeframe(timeframe) * 1000
+    until = until or ex.milliseconds()
+    stored = np.empty((0, 6))
+    if CANDLE_STORE_ENABLED:
+        stored = candle_store.ohlcv(symbol, timeframe, since, until)
+        if len(stored) and stored[0, 0] < since + tf_ms:
+            since = int(stored[-1, 0]) + tf_ms
+        else:
+            stored = np.empty((0, 6))
+    fetched_from = since
+    rows = []
+    while since < until and since + tf_ms <= ex.milliseconds():
+        batch = await _scheduled("klines", page, priority, "fetch_ohlcv",
+                                 symbol, timeframe=timeframe, since=since, limit=page)
+        if not batch:
+            break
+        rows.extend(c for c in batch if c[0] < until and c[0] + tf_ms <= ex.milliseconds())
+        if len(batch) < page:
+            break
+        since = batch[-1][0] + tf_ms
+    log.info("Fetched %d historical candles (%d from the candle store)", len(rows), len(stored),
+             extra={"symbol": symbol, "timeframe": timeframe})
+    store_closed_candles(symbol, timeframe, rows, fetched_from)
+    return np.concatenate([stored, np.asarray(rows, dtype=float).reshape(-1, 6)])
+
+class CandleCache:
+    """
+    Ring buffer of the most recent candles per (symbol, timeframe).
+
+    The first call fills the buffer from the candle store when it holds recent
+    enough candles, else with a full fetch; later calls only ask the exchange
+    for candles from the last held (still-forming) one onward, using ccxt's
+    `since`, and merge them in place. Closed candles are written to the store
+    as they arrive; a gap since the last stored candle is backfilled in the
+    background.
+    """
+
+    def __init__(self, limit=100, delta_limit=10):
+        self.limit = limit
+        self.delta_limit = delta_limit  # small page keeps request weight/payload minimal
+        self.buffers = {}
+        self.backfills = {}
+
+    def _seed_from_store(self, symbol, timeframe, limit):
+        if not CANDLE_STORE_ENABLED:
+            return None
+        rows = candle_store.tail(symbol, timeframe, limit)
+        if len(rows) < limit:
+            return None
+        ex = get_exchange()
+        tf_ms = ex.parse_timeframe(timeframe) * 1000
+        if ex.milliseconds() - rows[-1, 0] >= (self.delta_limit - 2) * tf_ms:
+            return None  # one delta page could not bridge the gap
+        return deque(([int(r[0])] + r[1:] for r in rows.tolist()), maxlen=limit)
+
+    def _persist(self, symbol, timeframe, candles):
+        key = (symbol, timeframe)
+        if store_closed_candles(symbol, timeframe, candles) or key in self.backfills:
+            return
+        since = candle_store.last_timestamp(symbol, timeframe) + get_exchange().parse_timeframe(timeframe) * 1000
+        task = asyncio.ensure_future(fetch_ohlcv_history(symbol, timeframe, since))
+        self.backfills[key] = task
+        task.add_done_callback(lambda _: self.backfills.pop(key, None))
+
+    async def fetch(self, symbol, timeframe="1m", limit=None, priority=PRIORITY_ANALYSIS):
+        limit = limit or self.limit
+        key = (symbol, timeframe)
+        buffer = self.buffers.get(key)
+        if buffer is None or buffer.maxlen != limit or len(buffer) == 0:
+            buffer = self._seed_from_store(symbol, timeframe, limit)
+            if buffer is None:
+                data = await fetch_ohlcv(symbol, timeframe, limit, priority)
+                if not data:
+                    return []
+                self.buffers[key] = deque(data, maxlen=limit)
+                self._persist(symbol, timeframe, data)
+                return list(self.buffers[key])
+            self.buffers[key] = buffer
+
+        since = buffer[-1][0]
+        try:
+            delta = await _scheduled("klines", self.delta_limit, priority, "fetch_ohlcv",
+                                     symbol, timeframe=timeframe, since=since, limit=self.delta_limit)
+        except Exception as e:
+            log.warning("Error fetching OHLCV delta: %s", e, extra={"symbol": symbol, "timeframe": timeframe})
+            return []
+        if len(delta) >= self.delta_limit:
+            # Fell too far behind for one page; start over with a full fetch.
+            del self.buffers[key]
+            return await self.fetch(symbol, timeframe, limit, priority)
+        self.merge(buffer, delta)
+        self._persist(symbol, timeframe, delta)
+        return list(buffer)
+
+    @staticmethod
+    def merge(buffer, candles):
+        for candle in candles:
+            if candle[0] == buffer[-1][0]:
+                buffer[-1] = candle  # forming candle updated (or closed)
+            elif candle[0] > buffer[-1][0]:
+                buffer.append(candle)
+
+    def nbytes_by_symbol(self):
+        """Approximate bytes held per symbol (candles are small Python lists)."""
+        usage = {}
+        for (symbol, _), buffer in self.buffers.items():
+            if buffer:
+                candle = buffer[-1]
+                per_candle = sys.getsizeof(candle) + sum(sys.getsizeof(x) for x in candle)
+                usage[symbol] = usage.get(symbol, 0) + sys.getsizeof(buffer) + len(buffer) * per_candle
+        return usage
+
+    def clear(self, symbol=None):
+        for key in list(self.buffers):
+            if symbol is None or key[0] == symbol:
+                del self.buffers[key]
+
+candle_cache = CandleCache()
+
+async def fetch_ohlcv_cached(symbol: str, timeframe: str = "1m", limit: int = 100, priority: int = PRIORITY_ANALYSIS):
+    return await candle_cache.fetch(symbol, timeframe, limit, priority)
+
+async def fetch_order_book(symbol: str, limit: int = 100, priority: int = PRIORITY_ANALYSIS):
+    log.debug("Fetching order book", extra={"symbol": symbol})
     try:
-        ob = await exchange.fetch_order_book(symbol, limit=limit)
-        print(f"[DataFeed] Order book fetched for {symbol}. Bids: {len(ob['bids'])}, Asks: {len(ob['asks'])}.")
+        ob = await _scheduled("depth", limit, priority, "fetch_order_book", symbol, limit=limit)
+        log.debug("Order book fetched: %d bids, %d asks", len(ob["bids"]), len(ob["asks"]),
+                  extra={"symbol": symbol})
         return ob
     except Exception as e:
-        print(f"[DataFeed] Error fetching order book for {symbol}: {e}")
+        log.warning("Error fetching order book: %s", e, extra={"symbol": symbol})
         return None
 
+class HeatmapProvider:
+    """
+    Process-wide CoinGecko trending cache.
+
+    One pooled session, a TTL on the last good response, a single in-flight
+    refresh shared by concurrent callers, and stale-while-revalidate: once any
+    data is held, callers get it immediately while an expired entry refreshes
+    in the background. The result carries a pre-built "trending_symbols"
+    frozenset (lower-case coin symbols) for O(1) membership checks. A failed
+    fetch is not retried before Retry-After (or min(ttl, HEATMAP_RETRY_SECS))
+    has passed; callers keep the last good data, or {} if there is none.
+    """
+
+    def __init__(self, url=HEATMAP_URL, ttl=HEATMAP_TTL_SECS, timeout=5, retry=HEATMAP_RETRY_SECS):
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.retry = retry
+        self.session = None
+        self.data = {}
+        self.fetched_at = None
+        self.retry_at = None
+        self._inflight = None
+
+    def _get_session(self):
+        import aiohttp
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self.session
+
+    def _retry_delay(self, error):
+        retry_after = (getattr(error, "headers", None) or {}).get("Retry-After")
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return min(self.ttl, self.retry)  # no header, or an HTTP date
+
+    async def _refresh(self):
+        log.debug("Fetching market heatmap from CoinGecko")
+        try:
+            with timed("fetch", endpoint="heatmap"):
+                async with self._get_session().get(self.url) as response:
+                    response.raise_for_status()
+                    result = await response.json()
+            result["trending_symbols"] = frozenset(
+                coin["item"]["symbol"].lower() for coin in result.get("coins", [])
+            )
+            self.data = result
+            self.fetched_at = time.monotonic()
+            self.retry_at = None
+            log.debug("Market heatmap fetched")
+        except Exception as e:
+            registry.inc("fetch_errors_total", endpoint="heatmap")
+            delay = self._retry_delay(e)
+            self.retry_at = time.monotonic() + delay
+            log.warning("Error fetching CoinGecko heatmap data: %s; retrying in %.0fs", e, delay)
+        finally:
+            self._inflight = None
+
+    async def get(self):
+        now = time.monotonic()
+        fresh = self.fetched_at is not None and now - self.fetched_at < self.ttl
+        if fresh or (self.retry_at is not None and now < self.retry_at):
+            return self.data
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh())
+        if self.fetched_at is None:
+            # Nothing cached yet: every caller waits on the same request
+            await asyncio.shield(self._inflight)
+        return self.data
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+
+heatmap_provider = HeatmapProvider()
+
 async def fetch_heatmap():
-    print("[DataFeed] Fetching market heatmap from CoinGecko...")
-    url = "https://api.coingecko.com/api/v3/search/trending"
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=5) as response:
-                response.raise_for_status()
-                result = await response.json()
-                print("[DataFeed] Market heatmap fetched successfully.")
-                return result
-    except Exception as e:
-        print(f"[DataFeed] Error fetching CoinGecko heatmap data: {e}")
-        return {}
+    return await heatmap_provider.get()
 
 async def close_exchange():
-    print("[DataFeed] Closing Binance exchange connection...")
+    if exchange is None:
+        await heatmap_provider.close()
+        return
+    log.info("Closing Binance exchange connection")
     try:
         await exchange.close()
-        print("[DataFeed] Binance exchange connection closed.")
+        log.info("Binance exchange connection closed")
     except Exception as e:
-        print(f"[DataFeed] Error closing exchange connection: {e}")
+        log.warning("Error closing exchange connection: %s", e)
+    await heatmap_provider.close()
@@ -0,0 +1,115 @@
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+
+# One scheduler for the whole symbol universe instead of a `while True` loop
+# per symbol. Evaluations fire right after each candle close (spread over a
+# short window so thousands of symbols don't hit the API in the same tick) and
+# then at a configurable intra-candle refresh rate, staggered per symbol.
+# A fixed pool of worker tasks runs the evaluations.
+
+log = logging.getLogger(__name__)
+
+TIMEFRAME_SECS = {"1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "4h": 14400}
+
+
+class EvaluationScheduler:
+    def __init__(self, symbols, evaluate, timeframe="5m", refresh_secs=15.0,
+                 close_delay_secs=1.0, close_spread_secs=5.0, workers=8, clock=time.time):
+        """
+        evaluate: coroutine function (symbol, reason) with reason "close" or "refresh".
+        timeframe: candle boundaries to align "close" evaluations to (higher
+            timeframes close on the same boundaries).
+        refresh_secs: intra-candle re-evaluation interval per symbol (0 disables).
+        """
+        self.symbols = list(symbols)
+        self.evaluate = evaluate
+        self.candle_secs = TIMEFRAME_SECS[timeframe]
+        self.refresh_secs = refresh_secs
+        self.close_delay_secs = close_delay_secs
+        self.close_spread_secs = close_spread_secs
+        self.workers = workers
+        self.clock = clock
+        self.queue = asyncio.Queue()
+        self.heap = []
+        self.seq = itertools.count()
+        self.index = {sym: i for i, sym in enumerate(self.symbols)}
+        self.generation = {sym: 0 for sym in self.symbols}
+        self.pending = set()
+        self.deferred_closes = set()  # closes that arrived while the symbol's evaluation was running
+        self.evaluations = 0
+        self.skipped = 0
+
+    def slot(self, symbol, width):
+        """Stable per-symbol offset in [0, width) spreading symbols evenly."""
+        if width <= 0 or not self.symbols:
+            return 0.0
+        return width * self.index[symbol] / len(self.symbols)
+
+    def next_close(self, now):
+        return (int(now // self.candle_secs) + 1) * self.candle_secs + self.close_delay_secs
+
+    def _push(self, due, symbol, reason):
+        heapq.heappush(self.heap, (due, next(self.seq), symbol, reason, self.generation[symbol]))
+
+    def _schedule_refresh(self, symbol, after):
+        if self.refresh_secs > 0:
+            self._push(after + self.refresh_secs, symbol, "refresh")
+
+    def _dispatch(self, symbol, reason, now):
+        if symbol in self.pending:
+            self.skipped += 1  # previous evaluation still queued/running: coalesce
+            if reason == "close":
+                self.deferred_closes.add(symbol)  # run it as soon as the current one finishes
+            # Keep a timer for the symbol: the one just popped (or voided by a close) was its last
+            self._schedule_refresh(symbol, now)
+            return
+        self.pending.add(symbol)
+        self.queue.put_nowait((symbol, reason))
+        # Any evaluation restarts the symbol's refresh timer
+        self.generation[symbol] += 1
+        self._schedule_refresh(symbol, now)
+
+    async def _worker(self):
+        while True:
+            symbol, reason = await self.queue.get()
+            try:
+                await self.evaluate(symbol, reason)
+            except Exception:
+                log.exception("Scheduled evaluation (%s) failed", reason, extra={"symbol": symbol})
+            finally:
+                self.evaluations += 1
+                self.pending.discard(symbol)
+                self.queue.task_done()
+                if symbol in self.deferred_closes:
+                    self.deferred_closes.discard(symbol)
+                    self._dispatch(symbol, "close", self.clock())
+
+    async def run(self):
+        now = self.clock()
+        for sym in self.symbols:
+            self._push(now + self.slot(sym, self.refresh_secs or self.close_spread_secs), sym, "refresh")
+        close_at = self.next_close(now)
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        log.info("Scheduler: %d symbols, %d workers, %ds candles, refresh every %ss", len(self.symbols),
+                 self.workers, self.candle_secs, self.refresh_secs)
+        try:
+            while True:
+                now = self.clock()
+                if now >= close_at:
+                    for sym in self.symbols:
+                        self.generation[sym] += 1  # supersede pending refreshes
+                        self._push(close_at + self.slot(sym, self.close_spread_secs), sym, "close")
+                    close_at += self.candle_secs
+                while self.heap and self.heap[0][0] <= now:
+                    _, _, sym, reason, generation = heapq.heappop(self.heap)
+                    if reason == "refresh" and generation != self.generation[sym]:
+                        continue
+                    self._dispatch(sym, reason, now)
+                wake_at = min(self.heap[0][0], close_at) if self.heap else close_at
+                await asyncio.sleep(max(wake_at - self.clock(), 0))
+        finally:
+            for w in workers:
+                w.cancel()
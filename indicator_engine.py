@@ -0,0 +1,749 @@
+import os
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+import talib
+
+# Incremental counterpart of strategy_engine.calc_indicators.
+#
+# Each (symbol, timeframe) stream keeps the state of every indicator through the
+# last *closed* candle. A tick on the still-forming candle is evaluated against
+# that committed state without mutating it (O(1) for the recursive indicators,
+# O(window) with a fixed window of at most 52 bars for the rolling ones), and
+# the state only advances once a newer candle shows up.
+#
+# Values follow the same TA-Lib / pandas_ta definitions calc_indicators uses
+# (EMA/MACD/RSI/ATR/ADX seeding included), so after N candles the engine gives
+# the row calc_indicators would give for a DataFrame holding those N candles.
+#
+# Closed rows live in a RingBuffer allocated once per stream, so a stream's
+# memory is fixed by its history length however long it runs. With
+# INDICATOR_FLOAT32=1 the buffers hold float32 (half the memory; the indicator
+# state itself stays float64, only stored rows are rounded).
+
+INDICATOR_COLUMNS = [
+    "ema8", "ema21", "ema200", "hma21", "supertrend", "ichimoku_a", "ichimoku_b",
+    "choppiness", "rsi", "stochrsi_k", "macd", "macdhist", "cci", "obv", "vwap",
+    "bb_upper", "bb_middle", "bb_lower", "atr", "adx", "engulfing", "hammer",
+]
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+FRAME_COLUMNS = OHLCV_COLUMNS + INDICATOR_COLUMNS
+
+# pandas_ta shifts the Senkou spans forward by kijun - 1 bars.
+ICHIMOKU_DISPLACEMENT = 25
+# Enough history for TA-Lib's candle pattern averaging windows.
+CANDLE_PATTERN_WINDOW = 32
+INDICATOR_DTYPE = np.float32 if os.getenv("INDICATOR_FLOAT32", "0") == "1" else np.float64
+
+nan = float("nan")
+
+
+def _is_zero(x):
+    # Same tolerance as TA-Lib's TA_IS_ZERO
+    return -1e-8 < x < 1e-8
+
+
+class _Window:
+    """Last `size - 1` committed values, so the forming value completes the window."""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=max(size - 1, 0))
+        self.total = 0.0
+        self.high = nan
+        self.low = nan
+
+    def push(self, x):
+        if self.size > 1:
+            self.values.append(x)
+            self.total = sum(self.values)
+            self.high = max(self.values)
+            self.low = min(self.values)
+
+    def full(self):
+        return len(self.values) == self.size - 1
+
+    def sum(self, x):
+        return self.total + x if self.full() else nan
+
+    def max(self, x):
+        return max(self.high, x) if self.full() or self.size == 1 else nan
+
+    def min(self, x):
+        return min(self.low, x) if self.full() or self.size == 1 else nan
+
+
+class _NanWindow(_Window):
+    """Rolling window over a series with leading NaNs (pandas rolling semantics)."""
+
+    def push(self, x):
+        if self.size > 1:
+            self.values.append(x)
+            if any(math.isnan(v) for v in self.values):
+                self.total = self.high = self.low = nan
+            else:
+                self.total = sum(self.values)
+                self.high = max(self.values)
+                self.low = min(self.values)
+
+    def sum(self, x):
+        return nan if math.isnan(x) else super().sum(x)
+
+    def max(self, x):
+        return nan if math.isnan(x) or math.isnan(self.high) and self.size > 1 else super().max(x)
+
+    def min(self, x):
+        return nan if math.isnan(x) or math.isnan(self.low) and self.size > 1 else super().min(x)
+
+
+class _EMA:
+    """TA-Lib EMA: seeded with the SMA of the first `period` values."""
+
+    def __init__(self, period):
+        self.period = period
+        self.k = 2.0 / (period + 1)
+        self.count = 0
+        self.total = 0.0
+        self.prev = nan
+
+    def _next(self, x):
+        if math.isnan(self.prev):
+            count, total = self.count + 1, self.total + x
+            value = total / self.period if count == self.period else nan
+            return value, (count, total, value)
+        value = (x - self.prev) * self.k + self.prev
+        return value, (self.count, self.total, value)
+
+    def value(self, x):
+        return self._next(x)[0]
+
+    def push(self, x):
+        value, (self.count, self.total, self.prev) = self._next(x)
+        return value
+
+
+class _WMA:
+    """Linearly weighted moving average, NaN until `period` valid values."""
+
+    def __init__(self, period):
+        self.period = period
+        self.denom = period * (period + 1) / 2.0
+        self.values = deque(maxlen=period - 1)
+        self.weighted = 0.0
+
+    def value(self, x):
+        if math.isnan(x) or len(self.values) < self.period - 1:
+            return nan
+        return (self.weighted + self.period * x) / self.denom
+
+    def push(self, x):
+        if math.isnan(x):
+            self.values.clear()
+            return
+        if self.period > 1:
+            self.values.append(x)
+            # Weights of the committed values once the next one is appended: 1..period-1
+            self.weighted = sum(w * v for w, v in enumerate(self.values, start=self.period - len(self.values)))
+
+
+class _RSI:
+    """TA-Lib RSI (Wilder smoothing, seeded with the mean of the first `period` moves)."""
+
+    def __init__(self, period):
+        self.period = period
+        self.prev_close = nan
+        self.count = 0
+        self.gain = 0.0
+        self.loss = 0.0
+
+    def _next(self, close):
+        if math.isnan(self.prev_close):
+            return nan, (close, 0, 0.0, 0.0)
+        diff = close - self.prev_close
+        up, down = (diff, 0.0) if diff >= 0 else (0.0, -diff)
+        n = self.period
+        count = self.count + 1
+        if count < n:
+            return nan, (close, count, self.gain + up, self.loss + down)
+        if count == n:
+            gain, loss = (self.gain + up) / n, (self.loss + down) / n
+        else:
+            gain = (self.gain * (n - 1) + up) / n
+            loss = (self.loss * (n - 1) + down) / n
+        total = gain + loss
+        value = 100.0 * gain / total if not _is_zero(total) else 0.0
+        return value, (close, count, gain, loss)
+
+    def value(self, close):
+        return self._next(close)[0]
+
+    def push(self, close):
+        value, (self.prev_close, self.count, self.gain, self.loss) = self._next(close)
+        return value
+
+
+def _true_range(high, low, prev_close):
+    if math.isnan(prev_close):
+        return nan
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+class _ATR:
+    """TA-Lib ATR: SMA of the first `period` true ranges, then Wilder smoothing."""
+
+    def __init__(self, period):
+        self.period = period
+        self.prev_close = nan
+        self.count = 0
+        self.total = 0.0
+        self.prev = nan
+
+    def _next(self, high, low, close):
+        tr = _true_range(high, low, self.prev_close)
+        if math.isnan(tr):
+            return nan, (close, 0, 0.0, nan)
+        n = self.period
+        if math.isnan(self.prev):
+            count, total = self.count + 1, self.total + tr
+            value = total / n if count == n else nan
+            return value, (close, count, total, value)
+        value = (self.prev * (n - 1) + tr) / n
+        return value, (close, self.count, self.total, value)
+
+    def value(self, high, low, close):
+        return self._next(high, low, close)[0]
+
+    def push(self, high, low, close):
+        value, (self.prev_close, self.count, self.total, self.prev) = self._next(high, low, close)
+        return value
+
+
+class _MACD:
+    """TA-Lib MACD: both EMAs are seeded on the bar where the slow EMA becomes valid."""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast, self.slow = fast, slow
+        self.k_fast = 2.0 / (fast + 1)
+        self.k_slow = 2.0 / (slow + 1)
+        self.closes = deque(maxlen=slow - 1)
+        self.fast_ema = nan
+        self.slow_ema = nan
+        self.signal = _EMA(signal)
+
+    def _lines(self, close):
+        if math.isnan(self.slow_ema):
+            if len(self.closes) < self.slow - 1:
+                return nan, nan
+            window = list(self.closes) + [close]
+            return sum(window[-self.fast:]) / self.fast, sum(window) / self.slow
+        return ((close - self.fast_ema) * self.k_fast + self.fast_ema,
+                (close - self.slow_ema) * self.k_slow + self.slow_ema)
+
+    def value(self, close):
+        fast, slow = self._lines(close)
+        if math.isnan(slow):
+            return nan, nan
+        line = fast - slow
+        signal = self.signal.value(line)
+        if math.isnan(signal):
+            return nan, nan
+        return line, line - signal
+
+    def push(self, close):
+        value = self.value(close)
+        fast, slow = self._lines(close)
+        if math.isnan(slow):
+            self.closes.append(close)
+        else:
+            self.fast_ema, self.slow_ema = fast, slow
+            self.signal.push(fast - slow)
+        return value
+
+
+class _ADX:
+    """TA-Lib ADX with its Wilder-smoothed directional movement and seeding."""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.count = 0
+        self.prev = None  # (high, low, close)
+        self.plus_dm = 0.0
+        self.minus_dm = 0.0
+        self.tr = 0.0
+        self.sum_dx = 0.0
+        self.adx = nan
+
+    def _next(self, high, low, close):
+        n = self.period
+        if self.prev is None:
+            return nan, (0, (high, low, close), 0.0, 0.0, 0.0, 0.0, nan)
+        prev_high, prev_low, prev_close = self.prev
+        count = self.count + 1
+        diff_p, diff_m = high - prev_high, prev_low - low
+        plus_dm, minus_dm, tr_sum = self.plus_dm, self.minus_dm, self.tr
+        if count >= n:
+            plus_dm -= plus_dm / n
+            minus_dm -= minus_dm / n
+        if diff_m > 0 and diff_p < diff_m:
+            minus_dm += diff_m
+        elif diff_p > 0 and diff_p > diff_m:
+            plus_dm += diff_p
+        tr = _true_range(high, low, prev_close)
+        tr_sum = tr_sum - tr_sum / n + tr if count >= n else tr_sum + tr
+        sum_dx, adx, value = self.sum_dx, self.adx, nan
+        if count >= n:
+            dx = nan
+            if not _is_zero(tr_sum):
+                minus_di = 100.0 * minus_dm / tr_sum
+                plus_di = 100.0 * plus_dm / tr_sum
+                di_sum = minus_di + plus_di
+                if not _is_zero(di_sum):
+                    dx = 100.0 * abs(minus_di - plus_di) / di_sum
+            if count < 2 * n - 1:
+                if not math.isnan(dx):
+                    sum_dx += dx
+            elif count == 2 * n - 1:
+                if not math.isnan(dx):
+                    sum_dx += dx
+                adx = value = sum_dx / n
+            else:
+                if not math.isnan(dx):
+                    adx = (adx * (n - 1) + dx) / n
+                value = adx
+        return value, (count, (high, low, close), plus_dm, minus_dm, tr_sum, sum_dx, adx)
+
+    def value(self, high, low, close):
+        return self._next(high, low, close)[0]
+
+    def push(self, high, low, close):
+        value, state = self._next(high, low, close)
+        (self.count, self.prev, self.plus_dm, self.minus_dm,
+         self.tr, self.sum_dx, self.adx) = state
+        return value
+
+
+class _Supertrend:
+    """pandas_ta supertrend(length=7, multiplier=3) trend line."""
+
+    def __init__(self, length=7, multiplier=3.0):
+        self.multiplier = multiplier
+        self.atr = _ATR(length)
+        self.count = 0
+        self.direction = 1
+        self.lower = nan
+        self.upper = nan
+
+    def _next(self, high, low, close, atr):
+        hl2 = (high + low) / 2.0
+        lower = hl2 - self.multiplier * atr
+        upper = hl2 + self.multiplier * atr
+        if self.count == 0:
+            return nan, (1, lower, upper)
+        if close > self.upper:
+            direction = 1
+        elif close < self.lower:
+            direction = -1
+        else:
+            direction = self.direction
+            if direction > 0 and lower < self.lower:
+                lower = self.lower
+            if direction < 0 and upper > self.upper:
+                upper = self.upper
+        return (lower if direction > 0 else upper), (direction, lower, upper)
+
+    def value(self, high, low, close):
+        return self._next(high, low, close, self.atr.value(high, low, close))[0]
+
+    def push(self, high, low, close):
+        value, (self.direction, self.lower, self.upper) = self._next(
+            high, low, close, self.atr.push(high, low, close))
+        self.count += 1
+        return value
+
+
+class _Ichimoku:
+    """pandas_ta ichimoku Senkou spans A and B (displaced, no look-ahead)."""
+
+    def __init__(self, tenkan=9, kijun=26, senkou=52, displacement=ICHIMOKU_DISPLACEMENT):
+        self.windows = [(_Window(tenkan), _Window(tenkan)),
+                        (_Window(kijun), _Window(kijun)),
+                        (_Window(senkou), _Window(senkou))]
+        self.spans = deque([(nan, nan)] * displacement, maxlen=displacement)
+
+    def _raw(self, high, low):
+        mids = [(hw.max(high) + lw.min(low)) / 2.0 for hw, lw in self.windows]
+        return (mids[0] + mids[1]) / 2.0, mids[2]
+
+    def value(self, high, low):
+        if not self.spans.maxlen:
+            return self._raw(high, low)
+        return self.spans[0]
+
+    def push(self, high, low):
+        value = self.value(high, low)
+        if self.spans.maxlen:
+            self.spans.append(self._raw(high, low))
+        for hw, lw in self.windows:
+            hw.push(high)
+            lw.push(low)
+        return value
+
+
+class _Choppiness:
+    """pandas_ta chop(length=14, atr_length=1): log10 ratio of summed TR to range."""
+
+    def __init__(self, length=14):
+        self.length = length
+        self.highs = _Window(length)
+        self.lows = _Window(length)
+        self.trs = _NanWindow(length)
+        self.prev_close = nan
+
+    def value(self, high, low, close):
+        tr_sum = self.trs.sum(_true_range(high, low, self.prev_close))
+        diff = self.highs.max(high) - self.lows.min(low)
+        if math.isnan(tr_sum) or math.isnan(diff) or tr_sum <= 0 or diff <= 0:
+            return nan
+        return 100.0 * (math.log10(tr_sum) - math.log10(diff)) / math.log10(self.length)
+
+    def push(self, high, low, close):
+        value = self.value(high, low, close)
+        self.trs.push(_true_range(high, low, self.prev_close))
+        self.highs.push(high)
+        self.lows.push(low)
+        self.prev_close = close
+        return value
+
+
+class _StochRSI:
+    """pandas_ta stochrsi(length, rsi_length=14, k=3) %K line."""
+
+    def __init__(self, length, rsi_length=14, k=3):
+        self.rsi = _RSI(rsi_length)
+        self.highs = _NanWindow(length)
+        self.lows = _NanWindow(length)
+        self.stochs = _NanWindow(k)
+        self.k = k
+
+    def _stoch(self, close):
+        rsi = self.rsi.value(close)
+        lowest, highest = self.lows.min(rsi), self.highs.max(rsi)
+        span = highest - lowest
+        if span == 0:
+            span = np.finfo(float).eps
+        return rsi, 100.0 * (rsi - lowest) / span
+
+    def value(self, close):
+        return self.stochs.sum(self._stoch(close)[1]) / self.k
+
+    def push(self, close):
+        value = self.value(close)
+        rsi, stoch = self._stoch(close)
+        self.rsi.push(close)
+        self.highs.push(rsi)
+        self.lows.push(rsi)
+        self.stochs.push(stoch)
+        return value
+
+
+class _VWAP:
+    """pandas_ta vwap anchored to the calendar day (UTC)."""
+
+    def __init__(self):
+        self.day = None
+        self.pv = 0.0
+        self.volume = 0.0
+
+    def _next(self, ts, high, low, close, volume):
+        day = ts // 86_400_000
+        pv, vol = (self.pv, self.volume) if day == self.day else (0.0, 0.0)
+        pv += (high + low + close) / 3.0 * volume
+        vol += volume
+        return (pv / vol if vol else nan), (day, pv, vol)
+
+    def value(self, ts, high, low, close, volume):
+        return self._next(ts, high, low, close, volume)[0]
+
+    def push(self, ts, high, low, close, volume):
+        value, (self.day, self.pv, self.volume) = self._next(ts, high, low, close, volume)
+        return value
+
+
+class RingBuffer:
+    """
+    Fixed number of float rows (plus an int64 timestamp each), preallocated;
+    appending to a full buffer overwrites the oldest row.
+    """
+
+    def __init__(self, capacity, width, dtype=INDICATOR_DTYPE):
+        self.maxlen = capacity
+        self.values = np.full((capacity, width), nan, dtype=dtype)
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _slot(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("ring buffer index out of range")
+        return (self.start + i) % self.maxlen
+
+    def __getitem__(self, i):
+        return self.values[self._slot(i)]
+
+    def timestamp(self, i):
+        return int(self.timestamps[self._slot(i)])
+
+    def append(self, values, timestamp=0):
+        if self.count < self.maxlen:
+            slot = (self.start + self.count) % self.maxlen
+            self.count += 1
+        else:
+            slot = self.start
+            self.start = (self.start + 1) % self.maxlen
+        self.values[slot] = values
+        self.timestamps[slot] = timestamp
+
+    def clear(self):
+        self.start = self.count = 0
+
+    def _copy(self, source, out, last):
+        n = self.count if last is None else min(last, self.count)
+        first = (self.start + self.count - n) % self.maxlen
+        head = min(n, self.maxlen - first)
+        out[:head] = source[first:first + head]
+        out[head:n] = source[:n - head]
+        return n
+
+    def copy_into(self, out, last=None):
+        """The last `last` rows (all by default) oldest first into out[:n]. Returns n."""
+        return self._copy(self.values, out, last)
+
+    def copy_timestamps(self, out, last=None):
+        return self._copy(self.timestamps, out, last)
+
+    def ordered(self):
+        """(timestamps, values) copies, oldest first."""
+        timestamps = np.empty(self.count, dtype=np.int64)
+        values = np.empty((self.count, self.values.shape[1]), dtype=self.values.dtype)
+        self.copy_timestamps(timestamps)
+        self.copy_into(values)
+        return timestamps, values
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.timestamps.nbytes
+
+
+class IncrementalIndicators:
+    """
+    Indicator state for one symbol/timeframe stream.
+
+    Feed it ccxt-style candles ([timestamp_ms, open, high, low, close, volume]) in
+    time order; repeated timestamps replace the forming candle, a newer timestamp
+    closes it. `frame()` returns the same columns calc_indicators produces.
+    """
+
+    def __init__(self, rsi_period=9, history=100, dtype=INDICATOR_DTYPE):
+        self.history = history
+        self.rows = RingBuffer(max(history - 1, 1), len(FRAME_COLUMNS), dtype)  # closed rows, FRAME_COLUMNS
+        self.forming = None
+        self.forming_row = None
+        self.bars_closed = 0
+
+        self.ema8, self.ema21, self.ema200 = _EMA(8), _EMA(21), _EMA(200)
+        self.wma_half, self.wma_full, self.hma = _WMA(10), _WMA(21), _WMA(4)
+        self.supertrend = _Supertrend()
+        self.ichimoku = _Ichimoku()
+        self.chop = _Choppiness()
+        self.rsi = _RSI(rsi_period)
+        self.stochrsi = _StochRSI(rsi_period)
+        self.macd = _MACD()
+        self.cci_window = _Window(20)
+        self.bb_window = _Window(20)
+        self.bb_sq_window = _Window(20)
+        self.atr = _ATR(14)
+        self.adx = _ADX(14)
+        self.obv = nan
+        self.prev_close = nan
+        self.vwap = _VWAP()
+        self.candles = deque(maxlen=CANDLE_PATTERN_WINDOW - 1)
+
+    # -- Per-bar evaluation --
+
+    def _hma_input(self, close):
+        return 2.0 * self.wma_half.value(close) - self.wma_full.value(close)
+
+    def _cci(self, tp):
+        if not self.cci_window.full():
+            return nan
+        window = list(self.cci_window.values) + [tp]
+        mean = sum(window) / len(window)
+        mean_dev = sum(abs(x - mean) for x in window) / len(window)
+        diff = tp - mean
+        return diff / (0.015 * mean_dev) if diff != 0 and mean_dev != 0 else 0.0
+
+    def _bbands(self, close):
+        total = self.bb_window.sum(close)
+        if math.isnan(total):
+            return nan, nan, nan
+        n = self.bb_window.size
+        mean = total / n
+        var = self.bb_sq_window.sum(close * close) / n - mean * mean
+        std = math.sqrt(var) if var > 0 else 0.0
+        return mean + 2.0 * std, mean, mean - 2.0 * std
+
+    def _patterns(self, o, h, l, c):
+        bars = np.array(list(self.candles) + [(o, h, l, c)], dtype=float)
+        args = (bars[:, 0], bars[:, 1], bars[:, 2], bars[:, 3])
+        return int(talib.CDLENGULFING(*args)[-1]), int(talib.CDLHAMMER(*args)[-1])
+
+    def _obv(self, close, volume):
+        if math.isnan(self.obv):
+            return volume
+        if close > self.prev_close:
+            return self.obv + volume
+        if close < self.prev_close:
+            return self.obv - volume
+        return self.obv
+
+    def _row(self, candle):
+        ts, o, h, l, c, v = candle
+        macd, macdhist = self.macd.value(c)
+        bb_upper, bb_middle, bb_lower = self._bbands(c)
+        ichimoku_a, ichimoku_b = self.ichimoku.value(h, l)
+        engulfing, hammer = self._patterns(o, h, l, c)
+        return {
+            "timestamp": ts, "open": o, "high": h, "low": l, "close": c, "volume": v,
+            "ema8": self.ema8.value(c),
+            "ema21": self.ema21.value(c),
+            "ema200": self.ema200.value(c),
+            "hma21": self.hma.value(self._hma_input(c)),
+            "supertrend": self.supertrend.value(h, l, c),
+            "ichimoku_a": ichimoku_a,
+            "ichimoku_b": ichimoku_b,
+            "choppiness": self.chop.value(h, l, c),
+            "rsi": self.rsi.value(c),
+            "stochrsi_k": self.stochrsi.value(c),
+            "macd": macd,
+            "macdhist": macdhist,
+            "cci": self._cci((h + l + c) / 3.0),
+            "obv": self._obv(c, v),
+            "vwap": self.vwap.value(ts, h, l, c, v),
+            "bb_upper": bb_upper,
+            "bb_middle": bb_middle,
+            "bb_lower": bb_lower,
+            "atr": self.atr.value(h, l, c),
+            "adx": self.adx.value(h, l, c),
+            "engulfing": engulfing,
+            "hammer": hammer,
+        }
+
+    def _commit(self, candle, row):
+        ts, o, h, l, c, v = candle
+        hma_input = self._hma_input(c)
+        self.ema8.push(c)
+        self.ema21.push(c)
+        self.ema200.push(c)
+        self.wma_half.push(c)
+        self.wma_full.push(c)
+        self.hma.push(hma_input)
+        self.supertrend.push(h, l, c)
+        self.ichimoku.push(h, l)
+        self.chop.push(h, l, c)
+        self.rsi.push(c)
+        self.stochrsi.push(c)
+        self.macd.push(c)
+        self.cci_window.push((h + l + c) / 3.0)
+        self.bb_window.push(c)
+        self.bb_sq_window.push(c * c)
+        self.atr.push(h, l, c)
+        self.adx.push(h, l, c)
+        self.obv = row["obv"]
+        self.prev_close = c
+        self.vwap.push(ts, h, l, c, v)
+        self.candles.append((o, h, l, c))
+        self.rows.append([row[col] for col in FRAME_COLUMNS], ts)
+        self.bars_closed += 1
+
+    # -- Public API --
+
+    def update(self, candle):
+        """Apply one candle (tick or new bar). Returns the forming row, or None if stale."""
+        candle = (int(candle[0]),) + tuple(float(x) for x in candle[1:6])
+        if self.forming is not None:
+            if candle[0] < self.forming[0]:
+                return None
+            if candle[0] > self.forming[0]:
+                self._commit(self.forming, self.forming_row)
+        self.forming = candle
+        self.forming_row = self._row(candle)
+        return self.forming_row
+
+    def ingest(self, ohlcv):
+        """Apply every candle of an OHLCV batch at or after the forming candle."""
+        start = self.forming[0] if self.forming is not None else None
+        for candle in ohlcv:
+            if start is None or candle[0] >= start:
+                self.update(candle)
+        return self.forming_row
+
+    def copy_into(self, values, timestamps):
+        """Closed rows plus the forming row into the given buffers, oldest first. Returns the row count."""
+        n = self.rows.copy_into(values)
+        self.rows.copy_timestamps(timestamps)
+        if self.forming_row is not None:
+            values[n] = [self.forming_row[col] for col in FRAME_COLUMNS]
+            timestamps[n] = self.forming[0]
+            n += 1
+        return n
+
+    def frame(self):
+        """Closed rows plus the forming row, indexed by candle open time."""
+        size = len(self.rows) + 1
+        values = np.empty((size, len(FRAME_COLUMNS)), dtype=self.rows.values.dtype)
+        timestamps = np.empty(size, dtype=np.int64)
+        n = self.copy_into(values, timestamps)
+        index = pd.to_datetime(timestamps[:n], unit="ms")
+        index.name = "timestamp"
+        return pd.DataFrame(values[:n], index=index, columns=FRAME_COLUMNS, copy=False)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the stored rows."""
+        return self.rows.nbytes
+
+
+class IndicatorEngine:
+    """Keeps one IncrementalIndicators per (symbol, timeframe)."""
+
+    def __init__(self, rsi_period=9, history=100, dtype=INDICATOR_DTYPE):
+        self.rsi_period = rsi_period
+        self.history = history
+        self.dtype = dtype
+        self.streams = {}
+
+    def stream(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        if key not in self.streams:
+            self.streams[key] = IncrementalIndicators(self.rsi_period, self.history, self.dtype)
+        return self.streams[key]
+
+    def ingest(self, symbol, timeframe, ohlcv):
+        """Update a stream from a fetch_ohlcv batch and return its indicator frame."""
+        stream = self.stream(symbol, timeframe)
+        stream.ingest(ohlcv)
+        return stream.frame()
+
+    def reset(self, symbol=None, timeframe=None):
+        for key in list(self.streams):
+            if (symbol is None or key[0] == symbol) and (timeframe is None or key[1] == timeframe):
+                del self.streams[key]
+
+
+indicator_engine = IndicatorEngine()
@@ -0,0 +1,111 @@
+import zlib
+import numpy as np
+from eval_scheduler import TIMEFRAME_SECS
+from timeframe_builder import rollup
+
+# Deterministic synthetic market data for benchmarks and offline runs.
+#
+# Prices are a closed-form function of (symbol, minute): a few slow sine
+# cycles plus hashed per-minute noise, so any candle range can be generated
+# on its own, vectorised, and always comes out the same. Higher timeframes are
+# rolled up from the 1m candles, as the exchange does.
+
+MINUTE_MS = 60_000
+FIXTURE_NOW_MS = 1_700_003_100_000  # 5 minutes into an hour
+
+
+def _seed(symbol):
+    return zlib.crc32(symbol.encode()) % 10_000
+
+
+def _noise(minutes, seed, salt):
+    x = np.sin(minutes * 12.9898 + seed * 78.233 + salt * 37.719) * 43758.5453
+    return x - np.floor(x)  # uniform in [0, 1)
+
+
+def _close(minutes, seed):
+    base = 10.0 + seed % 500
+    return base * (1 + 0.03 * np.sin(minutes / 720.0 + seed) + 0.01 * np.sin(minutes / 97.0 + seed)
+                   + 0.004 * (_noise(minutes, seed, 1) - 0.5))
+
+
+def synthetic_candles(symbol, timeframe="1m", limit=100, now_ms=FIXTURE_NOW_MS, since=None):
+    """ccxt-style candles up to and including the one forming at `now_ms` (partial, as from the exchange)."""
+    tf_ms = TIMEFRAME_SECS[timeframe] * 1000
+    last_open = now_ms - now_ms % tf_ms
+    if since is None:
+        first_open = last_open - (limit - 1) * tf_ms
+    else:
+        first_open = since - since % tf_ms
+        last_open = min(last_open, first_open + (limit - 1) * tf_ms)
+    if last_open < first_open:
+        return []
+    last_minute = min(last_open + tf_ms - MINUTE_MS, now_ms - now_ms % MINUTE_MS)
+    minutes = np.arange(first_open // MINUTE_MS, last_minute // MINUTE_MS + 1, dtype=float)
+    seed = _seed(symbol)
+    close = _close(minutes, seed)
+    prev = _close(minutes - 1, seed)
+    spread = close * 0.001 * (0.2 + _noise(minutes, seed, 2))
+    rows = np.column_stack([
+        minutes * MINUTE_MS, prev,
+        np.maximum(prev, close) + spread, np.minimum(prev, close) - spread,
+        close, 1.0 + 99.0 * _noise(minutes, seed, 3),
+    ])
+    if timeframe != "1m":
+        rows = rollup(rows, timeframe)
+    return [[int(r[0])] + r[1:] for r in rows.tolist()]
+
+
+def synthetic_order_book(symbol, price=None, levels=100, now_ms=FIXTURE_NOW_MS):
+    """ccxt-style order book around `price` (the symbol's last synthetic close by default)."""
+    if price is None:
+        price = synthetic_candles(symbol, "1m", 1, now_ms)[-1][4]
+    seed = _seed(symbol)
+    steps = np.arange(1, levels + 1, dtype=float)
+    tick = price * 1e-4
+    bid_qty = 0.5 + 10.0 * _noise(steps, seed, 4)
+    ask_qty = 0.5 + 10.0 * _noise(steps, seed, 5)
+    return {
+        "bids": np.column_stack([price - steps * tick, bid_qty]).tolist(),
+        "asks": np.column_stack([price + steps * tick, ask_qty]).tolist(),
+        "nonce": int(now_ms),
+    }
+
+
+def synthetic_heatmap(symbols=()):
+    """CoinGecko-shaped trending payload listing every other symbol's base coin."""
+    coins = [{"item": {"symbol": sym.split("/")[0]}} for sym in list(symbols)[::2]]
+    return {"coins": coins, "trending_symbols": frozenset(c["item"]["symbol"].lower() for c in coins)}
+
+
+class SyntheticExchange:
+    """
+    The slice of the ccxt exchange API data_feed uses, answering from the
+    synthetic generator at a virtual clock (advance it with `advance`).
+    """
+
+    def __init__(self, now_ms=FIXTURE_NOW_MS):
+        self.now_ms = now_ms
+        self.last_response_headers = {}
+        self.requests = 0
+
+    def milliseconds(self):
+        return self.now_ms
+
+    def advance(self, seconds):
+        self.now_ms += int(seconds * 1000)
+
+    @staticmethod
+    def parse_timeframe(timeframe):
+        return TIMEFRAME_SECS[timeframe]
+
+    async def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=100):
+        self.requests += 1
+        return synthetic_candles(symbol, timeframe, limit, self.now_ms, since)
+
+    async def fetch_order_book(self, symbol, limit=100):
+        self.requests += 1
+        return synthetic_order_book(symbol, levels=limit, now_ms=self.now_ms)
+
+    async def close(self):
+        pass
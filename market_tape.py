@@ -0,0 +1,273 @@
+import os
+import sys
+import time
+import gzip
+import json
+import asyncio
+import argparse
+from bisect import bisect_right
+from collections import deque
+from datetime import timedelta
+import numpy as np
+from request_scheduler import PRIORITY_ANALYSIS
+from signal_journal import SignalJournal
+from virtual_clock import VirtualClockLoop
+
+# Record a live agent session's market data and replay it on a virtual clock.
+#
+#   AGENT_RECORD_PATH=session.jsonl.gz python agent.py     # live, recording
+#   python market_tape.py session.jsonl.gz --expect signal_journal.db
+#
+# The recorder wraps the agent's fetch_ohlcv_cached / fetch_order_book /
+# fetch_heatmap and writes one JSON line per response with the time it
+# arrived. Candles are delta-encoded against the previous response for the same
+# (symbol, timeframe, limit, priority); order books are kept as what the
+# strategy reads from them (best level and total volume per side); the
+# heatmap is written only when it changes.
+#
+# The player answers the nth call for a key with the nth recorded response,
+# first sleeping until the time it arrived live. It runs the unchanged agent
+# (polling or scheduled mode, warm start on or off, as recorded) on
+# VirtualClockLoop, so warmup, hold, cooldown and signal resolution see the
+# recorded times while every sleep is skipped. Commentary is off and analysis runs inline. Signals
+# match the live session's except that entry times omit the live compute time.
+
+REPLAY_GRACE_SECS = 5  # keep running past the last response so its analysis finishes
+SIGNAL_LOG_FIELDS = ("symbol", "signal_type", "confidence", "entry_price", "target_price", "stop_price",
+                     "exit_price", "outcome", "status")
+
+
+def _open(path, mode):
+    return gzip.open(path, mode, encoding="utf-8") if path.endswith(".gz") else open(path, mode, encoding="utf-8")
+
+
+def _book_side(levels):
+    if not levels:
+        return None
+    # Same summation as strategy_engine.book_imbalance, so replayed imbalances are bit-identical
+    return [levels[0][0], float(np.asarray(levels, dtype=float)[:, 1].sum())]
+
+
+class TapeRecorder:
+    def __init__(self, path, symbols, scheduled, clock, warm_start=False):
+        self.path = path
+        self.clock = clock
+        self.file = _open(path, "wt")
+        self.candles = {}
+        self.heatmap = None
+        self._write({"k": "session", "symbols": list(symbols), "scheduled": scheduled, "warm_start": warm_start})
+
+    def _write(self, entry):
+        entry["t"] = int(self.clock.time() * 1000)
+        self.file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def ohlcv(self, symbol, timeframe, limit, priority, candles):
+        key = (symbol, timeframe, limit, priority)
+        previous = self.candles.get(key, {})
+        delta = [c for c in candles if previous.get(c[0]) != list(c)]
+        self.candles[key] = {c[0]: list(c) for c in candles}
+        self._write({"k": "ohlcv", "s": symbol, "tf": timeframe, "n": limit, "p": priority,
+                     "len": len(candles), "c": delta})
+
+    def order_book(self, symbol, order_book):
+        entry = {"k": "book", "s": symbol}
+        if order_book is not None:
+            entry["b"] = _book_side(order_book.get("bids"))
+            entry["a"] = _book_side(order_book.get("asks"))
+            if order_book.get("imbalance") is not None:
+                entry["i"] = order_book["imbalance"]
+        self._write(entry)
+
+    def heatmap_data(self, heatmap):
+        if heatmap is self.heatmap:
+            return
+        self.heatmap = heatmap
+        self._write({"k": "heatmap", "d": {k: v for k, v in (heatmap or {}).items() if k != "trending_symbols"}})
+
+    def install(self, module):
+        """Wrap `module`'s fetch functions (the agent's) so every response is recorded."""
+        fetch_ohlcv_cached, fetch_order_book, fetch_heatmap = (
+            module.fetch_ohlcv_cached, module.fetch_order_book, module.fetch_heatmap)
+
+        async def ohlcv(symbol, timeframe="1m", limit=100, priority=PRIORITY_ANALYSIS):
+            candles = await fetch_ohlcv_cached(symbol, timeframe, limit, priority)
+            self.ohlcv(symbol, timeframe, limit, priority, candles)
+            return candles
+
+        async def order_book(symbol, *args, **kwargs):
+            book = await fetch_order_book(symbol, *args, **kwargs)
+            self.order_book(symbol, book)
+            return book
+
+        async def heatmap():
+            data = await fetch_heatmap()
+            self.heatmap_data(data)
+            return data
+
+        module.fetch_ohlcv_cached, module.fetch_order_book, module.fetch_heatmap = ohlcv, order_book, heatmap
+
+    def close(self):
+        self.file.close()
+
+
+class TapePlayer:
+    def __init__(self, entries, clock=None):
+        header = entries[0]
+        if header.get("k") != "session":
+            raise ValueError("Not a market tape: missing session header")
+        self.symbols = header["symbols"]
+        self.scheduled = header["scheduled"]
+        self.warm_start = header.get("warm_start", False)
+        self.start = header["t"] / 1000
+        self.end = entries[-1]["t"] / 1000
+        self.clock = clock
+        self.calls = {}
+        self.candles = {}
+        self.heatmap_times, self.heatmaps = [], []
+        for entry in entries[1:]:
+            kind = entry["k"]
+            if kind == "heatmap":
+                data = entry["d"]
+                data["trending_symbols"] = frozenset(c["item"]["symbol"].lower() for c in data.get("coins", []))
+                self.heatmap_times.append(entry["t"])
+                self.heatmaps.append(data)
+                continue
+            key = (kind, entry["s"], entry["tf"], entry["n"], entry["p"]) if kind == "ohlcv" else (kind, entry["s"])
+            self.calls.setdefault(key, deque()).append(entry)
+
+    async def _next(self, key):
+        """The key's next recorded response once the clock reaches its time (None when used up)."""
+        calls = self.calls.get(key)
+        if not calls:
+            return None
+        entry = calls.popleft()
+        delay = entry["t"] / 1000 - self.clock.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return entry
+
+    async def fetch_ohlcv_cached(self, symbol, timeframe="1m", limit=100, priority=PRIORITY_ANALYSIS):
+        key = ("ohlcv", symbol, timeframe, limit, priority)
+        entry = await self._next(key)
+        if entry is None:
+            return []
+        held = self.candles.get(key, {})
+        for candle in entry["c"]:
+            held[candle[0]] = candle
+        candles = [held[ts] for ts in sorted(held)[-entry["len"]:]] if entry["len"] else []
+        self.candles[key] = {c[0]: c for c in candles}
+        return [list(c) for c in candles]
+
+    async def fetch_order_book(self, symbol, *args, **kwargs):
+        entry = await self._next(("book", symbol))
+        if entry is None or "b" not in entry:
+            return None
+        book = {"bids": [entry["b"]] if entry["b"] else [], "asks": [entry["a"]] if entry["a"] else []}
+        if "i" in entry:
+            book["imbalance"] = entry["i"]
+        return book
+
+    async def fetch_heatmap(self):
+        if not self.heatmaps:
+            return {}
+        i = bisect_right(self.heatmap_times, self.clock.time() * 1000)
+        return self.heatmaps[max(i - 1, 0)]
+
+    def install(self, module):
+        module.fetch_ohlcv_cached = self.fetch_ohlcv_cached
+        module.fetch_order_book = self.fetch_order_book
+        module.fetch_heatmap = self.fetch_heatmap
+
+
+async def _replay(player, journal_path):
+    import agent
+    from output_module import CommentaryService
+
+    agent.clock = player.clock
+    agent.STREAMING_MODE = False
+    agent.SCHEDULED_MODE = player.scheduled
+    agent.WARM_START = player.warm_start
+    agent.COMPUTE_WORKERS = 0
+    agent.METRICS_PORT = 0
+    agent.METRICS_SNAPSHOT_SECS = 0
+    agent.RECORD_PATH = None
+    agent.commentary_service = CommentaryService(enabled=False)
+    player.install(agent)
+
+    run = asyncio.ensure_future(agent.run(player.symbols, journal_path))
+    await asyncio.sleep(max(player.end - player.clock.time(), 0) + REPLAY_GRACE_SECS)
+    run.cancel()
+    await asyncio.gather(run, return_exceptions=True)
+    # Symbol loops are shielded from run()'s cancellation
+    others = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in others:
+        task.cancel()
+    await asyncio.gather(*others, return_exceptions=True)
+
+
+def replay(path, journal_path):
+    """Replay a recorded session into a fresh journal at `journal_path`."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(journal_path + suffix):
+            os.remove(journal_path + suffix)
+    with _open(path, "rt") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    loop = VirtualClockLoop(entries[0]["t"] / 1000)
+    player = TapePlayer(entries, loop.clock)
+    try:
+        loop.run_until_complete(_replay(player, journal_path))
+    finally:
+        loop.close()
+    return player
+
+
+def compare_signals(expected, actual, time_tolerance=timedelta(seconds=2)):
+    """Differences between two journals' signal lists (each symbol's in creation order), as text lines."""
+    # Symbols analysed at the same moment may record their signals in either order
+    expected = sorted(expected, key=lambda s: s.get("symbol"))
+    actual = sorted(actual, key=lambda s: s.get("symbol"))
+    diffs = []
+    if len(expected) != len(actual):
+        diffs.append(f"{len(expected)} signals expected, {len(actual)} replayed")
+    for i, (want, got) in enumerate(zip(expected, actual)):
+        fields = [f for f in SIGNAL_LOG_FIELDS if want.get(f) != got.get(f)]
+        for field in ("entry_time", "exit_time"):
+            a, b = want.get(field), got.get(field)
+            if (a is None) != (b is None) or (a is not None and abs(a - b) > time_tolerance):
+                fields.append(field)
+        if fields:
+            diffs.append(f"#{i} {want.get('symbol')} {want.get('signal_type')}: "
+                         + ", ".join(f"{f} {want.get(f)} != {got.get(f)}" for f in fields))
+    return diffs
+
+
+if __name__ == "__main__":
+    from structured_log import configure_logging
+
+    parser = argparse.ArgumentParser(description="Replay a recorded agent session on a virtual clock")
+    parser.add_argument("tape")
+    parser.add_argument("--journal", default="replay_journal.db", help="replayed signals (recreated)")
+    parser.add_argument("--out", default="replay_signal_log.csv")
+    parser.add_argument("--expect", help="live session's signal journal to compare against")
+    parser.add_argument("--time-tolerance", type=float, default=2.0,
+                        help="allowed entry/exit time difference in seconds (live compute time)")
+    args = parser.parse_args()
+
+    configure_logging(level=os.getenv("LOG_LEVEL", "WARNING"))
+    started = time.perf_counter()
+    player = replay(args.tape, args.journal)
+    elapsed = time.perf_counter() - started
+    journal = SignalJournal(args.journal)
+    count = journal.export(args.out, None)
+    print(f"[Replay] {player.end - player.start:.0f}s of {len(player.symbols)} symbols in {elapsed:.1f}s: "
+          f"{count} signals saved to {args.out}")
+    if args.expect:
+        live = SignalJournal(args.expect)
+        diffs = compare_signals(live.signals(), journal.signals(), timedelta(seconds=args.time_tolerance))
+        live.close()
+        for line in diffs:
+            print(f"[Replay] {line}")
+        print(f"[Replay] {'MATCH' if not diffs else f'{len(diffs)} difference(s)'} with {args.expect}")
+    journal.close()
+    if args.expect and diffs:
+        sys.exit(1)
@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# In-process metrics: per-stage latency histograms, counters and gauges.
+#
+# Recording is a dict lookup and a bisect over fixed buckets, cheap enough for
+# every fetch and every analysis pass. Series are keyed by metric name plus
+# labels (stage, symbol, endpoint, ...). They are exposed in Prometheus text
+# format on a local HTTP endpoint, as JSON on the same server, and as a JSON
+# snapshot file written periodically. Worker processes record into a capture
+# list that the parent replays into its own registry (see compute_pool.py).
+# Startup phases (imports, journal, exchange client, markets, ...) are timed
+# once each with startup_phase() and reported together by startup_report().
+
+log = logging.getLogger(__name__)
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # 0 disables the endpoint
+METRICS_SNAPSHOT_PATH = os.getenv("METRICS_SNAPSHOT_PATH", "metrics_snapshot.json")
+METRICS_SNAPSHOT_SECS = float(os.getenv("METRICS_SNAPSHOT_SECS", "60"))  # 0 disables snapshots
+LOOP_LAG_INTERVAL_SECS = 0.5
+
+# Seconds; an implicit +Inf bucket follows
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_METRIC = "agent_stage_seconds"
+STARTUP_METRIC = "agent_startup_seconds"
+SYMBOL_MEMORY_METRIC = "agent_symbol_memory_bytes"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bucket bound holding the q-quantile (None when empty or beyond the last bound)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self._capture = None
+
+    def observe(self, name, value, **labels):
+        if self._capture is not None:
+            self._capture.append(("observe", name, value, labels))
+            return
+        key = _key(name, labels)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = Histogram()
+        hist.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        if self._capture is not None:
+            self._capture.append(("inc", name, value, labels))
+            return
+        key = _key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        if self._capture is not None:
+            self._capture.append(("set", name, value, labels))
+            return
+        self.gauges[_key(name, labels)] = value
+
+    def timed(self, stage, symbol=None, **labels):
+        """Context manager recording the block's wall time under agent_stage_seconds{stage=...}."""
+        return _Timer(self, STAGE_METRIC, dict(labels, stage=stage, symbol=symbol))
+
+    @contextmanager
+    def capture(self):
+        """Collect observations instead of recording them (worker processes); see replay()."""
+        previous, self._capture = self._capture, []
+        try:
+            yield self._capture
+        finally:
+            self._capture = previous
+
+    def replay(self, records):
+        for kind, name, value, labels in records or ():
+            getattr(self, kind)(name, value, **labels)
+
+    # -- Exposition --
+
+    def prometheus(self):
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for (name, labels), value in sorted(self.gauges.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for (name, labels), hist in sorted(self.histograms.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), hist.counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_label_text(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(labels)} {hist.sum}")
+            lines.append(f"{name}_count{_label_text(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        def entry(name, labels, **values):
+            return dict({"name": name, "labels": dict(labels)}, **values)
+        return {
+            "time": time.time(),
+            "counters": [entry(n, l, value=v) for (n, l), v in self.counters.items()],
+            "gauges": [entry(n, l, value=v) for (n, l), v in self.gauges.items()],
+            "histograms": [entry(n, l, count=h.count, sum=h.sum, mean=h.sum / h.count if h.count else None,
+                                 p50=h.quantile(0.5), p99=h.quantile(0.99),
+                                 buckets=dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], h.counts)))
+                           for (n, l), h in self.histograms.items()],
+        }
+
+    def write_snapshot(self, path=METRICS_SNAPSHOT_PATH):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+        self.gauges.clear()
+
+
+registry = Registry()
+timed = registry.timed
+
+
+# -- Startup --
+
+startup_phases = {}  # phase -> seconds, in the order phases finished
+
+
+def record_startup(phase, seconds, registry=registry):
+    startup_phases[phase] = startup_phases.get(phase, 0.0) + seconds
+    registry.set(STARTUP_METRIC, startup_phases[phase], phase=phase)
+
+
+@contextmanager
+def startup_phase(phase):
+    """Time one startup phase into agent_startup_seconds{phase=...}. Phases may nest."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_startup(phase, time.perf_counter() - started)
+
+
+def startup_report(total):
+    """One-line breakdown of the startup phases recorded so far."""
+    phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in startup_phases.items())
+    return f"{total:.2f}s ({phases})" if phases else f"{total:.2f}s"
+
+
+def resident_memory_bytes():
+    """The process's resident set size (peak size where /proc is missing; None on Windows)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+# -- Background tasks --
+
+async def monitor_loop_lag(interval=LOOP_LAG_INTERVAL_SECS, registry=registry):
+    """Record how late the event loop wakes a sleeping task (time the loop spent blocked)."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - started - interval, 0.0)
+        registry.observe("event_loop_lag_seconds", lag)
+        registry.set("event_loop_lag_last_seconds", lag)
+
+
+async def write_snapshots(path=METRICS_SNAPSHOT_PATH, interval=METRICS_SNAPSHOT_SECS, registry=registry):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(registry.write_snapshot, path)
+        except OSError as e:
+            registry.inc("metrics_snapshot_errors_total")
+            log.warning("Metrics snapshot to %s failed: %s", path, e)
+
+
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT, registry=registry):
+    """Serve /metrics (Prometheus text) and /metrics.json. Returns the runner (call .cleanup() to stop)."""
+    from aiohttp import web
+
+    async def prometheus(request):
+        return web.Response(text=registry.prometheus(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def as_json(request):
+        return web.json_response(registry.snapshot())
+
+    app = web.Application()
+    app.router.add_get("/metrics", prometheus)
+    app.router.add_get("/metrics.json", as_json)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,215 @@
+import numpy as np
+
+# L2 order book kept in NumPy arrays.
+#
+# Each side stores its price levels sorted best-first (bids are keyed by
+# -price), so top of book is index 0 and a level update is a binary search
+# plus one contiguous shift. Bid/ask volume sums for the whole side and for a
+# few configured depths are maintained on every update, which makes
+# imbalance O(1); cumulative depth for slippage estimates is rebuilt lazily
+# after a change.
+
+DEFAULT_DEPTHS = (5, 20, 100)
+RESUM_EVERY = 10000  # recompute running sums from scratch to shed float drift
+
+
+class BookSide:
+    def __init__(self, bids, depths=DEFAULT_DEPTHS, capacity=1024):
+        self.sign = -1.0 if bids else 1.0
+        self.keys = np.empty(capacity)
+        self.qtys = np.empty(capacity)
+        self.n = 0
+        self.depths = tuple(sorted(depths))
+        self.depth_qty = {d: 0.0 for d in self.depths}
+        self.total_qty = 0.0
+        self._cum = None
+        self._updates = 0
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def prices(self):
+        return self.sign * self.keys[:self.n]
+
+    def _resum(self):
+        qtys = self.qtys[:self.n]
+        self.total_qty = float(qtys.sum())
+        for d in self.depths:
+            self.depth_qty[d] = float(qtys[:d].sum())
+
+    def load(self, levels):
+        rows = np.asarray(levels, dtype=float).reshape(-1, 2) if len(levels) else np.empty((0, 2))
+        rows = rows[rows[:, 1] > 0]
+        keys, first = np.unique(self.sign * rows[:, 0], return_index=True)
+        if len(keys) > len(self.keys):
+            self.keys = np.empty(2 * len(keys))
+            self.qtys = np.empty(2 * len(keys))
+        self.n = len(keys)
+        self.keys[:self.n] = keys
+        self.qtys[:self.n] = rows[first, 1]
+        self._resum()
+        self._cum = None
+
+    def set(self, price, qty):
+        """Set one level's quantity (0 removes it), keeping the running sums current."""
+        key = self.sign * price
+        n = self.n
+        keys, qtys = self.keys, self.qtys
+        i = int(np.searchsorted(keys[:n], key))
+        if i < n and keys[i] == key:
+            old = qtys[i]
+            if qty == 0:
+                keys[i:n - 1] = keys[i + 1:n]
+                qtys[i:n - 1] = qtys[i + 1:n]
+                self.n = n = n - 1
+                self.total_qty -= old
+                for d in self.depths:
+                    if i < d:
+                        self.depth_qty[d] -= old
+                        if d <= n:
+                            self.depth_qty[d] += qtys[d - 1]  # next level moves into the top d
+            else:
+                qtys[i] = qty
+                self.total_qty += qty - old
+                for d in self.depths:
+                    if i < d:
+                        self.depth_qty[d] += qty - old
+        elif qty > 0:
+            if n == len(keys):
+                self.keys = keys = np.concatenate([keys, np.empty(len(keys))])
+                self.qtys = qtys = np.concatenate([qtys, np.empty(len(qtys))])
+            keys[i + 1:n + 1] = keys[i:n]
+            qtys[i + 1:n + 1] = qtys[i:n]
+            keys[i] = key
+            qtys[i] = qty
+            self.n = n = n + 1
+            self.total_qty += qty
+            for d in self.depths:
+                if i < d:
+                    self.depth_qty[d] += qty
+                    if n > d:
+                        self.depth_qty[d] -= qtys[d]  # level pushed out of the top d
+        else:
+            return
+        self._cum = None
+        self._updates += 1
+        if self._updates % RESUM_EVERY == 0:
+            self._resum()
+
+    def best(self):
+        if not self.n:
+            return None
+        return float(self.sign * self.keys[0]), float(self.qtys[0])
+
+    def volume(self, depth=None):
+        """Total quantity over the best `depth` levels (all levels when None)."""
+        if depth is None or depth >= self.n:
+            return self.total_qty
+        if depth in self.depth_qty:
+            return self.depth_qty[depth]
+        return float(self.qtys[:depth].sum())
+
+    def levels(self, limit=None):
+        n = self.n if limit is None else min(limit, self.n)
+        return np.column_stack([self.sign * self.keys[:n], self.qtys[:n]])
+
+    def fill(self, qty):
+        """Walk the side for a market order of `qty`: (average price, filled quantity)."""
+        if not self.n or qty <= 0:
+            return None, 0.0
+        if self._cum is None:
+            prices = self.prices
+            self._cum = (np.cumsum(self.qtys[:self.n]), np.cumsum(prices * self.qtys[:self.n]), prices)
+        cum_qty, cum_notional, prices = self._cum
+        j = int(np.searchsorted(cum_qty, qty))
+        if j >= self.n:
+            return cum_notional[-1] / cum_qty[-1], float(cum_qty[-1])
+        before_qty = cum_qty[j - 1] if j else 0.0
+        before_notional = cum_notional[j - 1] if j else 0.0
+        return (before_notional + (qty - before_qty) * prices[j]) / qty, float(qty)
+
+
+class OrderBook:
+    """
+    Order book kept in sync from a REST snapshot plus depth diffs.
+
+    Follows Binance's procedure: drop diffs older than the snapshot, require
+    each diff's first update id to continue the previous one, and ask for a new
+    snapshot on a gap. Without a snapshot (offline replay) the first diff is
+    taken as the starting point.
+    """
+
+    def __init__(self, depths=DEFAULT_DEPTHS):
+        self.bids = BookSide(True, depths)
+        self.asks = BookSide(False, depths)
+        self.last_update_id = None
+        self.needs_snapshot = True
+
+    def load_snapshot(self, snapshot):
+        self.bids.load([level[:2] for level in snapshot.get("bids", [])])
+        self.asks.load([level[:2] for level in snapshot.get("asks", [])])
+        self.last_update_id = snapshot.get("nonce")
+        self.needs_snapshot = False
+
+    def apply_diff(self, event):
+        """Returns False when a sequence gap means a fresh snapshot is needed."""
+        first_id, final_id = event["U"], event["u"]
+        if self.last_update_id is not None:
+            if final_id <= self.last_update_id:
+                return True  # already covered by the snapshot
+            if first_id > self.last_update_id + 1:
+                self.needs_snapshot = True
+                return False
+        for side, levels in ((self.bids, event.get("b", [])), (self.asks, event.get("a", []))):
+            for price, qty in levels:
+                side.set(float(price), float(qty))
+        self.last_update_id = final_id
+        return True
+
+    # -- Metrics --
+
+    def best_bid(self):
+        return self.bids.best()
+
+    def best_ask(self):
+        return self.asks.best()
+
+    def mid(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    def spread_bps(self):
+        mid = self.mid()
+        if not mid:
+            return None
+        return (self.asks.best()[0] - self.bids.best()[0]) / mid * 1e4
+
+    def imbalance(self, depth=None):
+        """(bid - ask) / (bid + ask) volume over the best `depth` levels per side."""
+        bid, ask = self.bids.volume(depth), self.asks.volume(depth)
+        total = bid + ask
+        return float((bid - ask) / total) if total > 0 else 0.0
+
+    def slippage(self, side, qty):
+        """
+        Market order estimate: side "buy" walks the asks, "sell" the bids.
+        Returns (average price, slippage in bps vs mid, filled quantity).
+        """
+        levels = self.asks if side == "buy" else self.bids
+        price, filled = levels.fill(qty)
+        mid = self.mid()
+        if price is None or not mid:
+            return price, None, filled
+        return price, abs(price - mid) / mid * 1e4, filled
+
+    def snapshot(self, limit=100):
+        """ccxt-style {'bids': [[price, qty], ...], 'asks': [...]} view plus the imbalance over it."""
+        return {
+            "bids": self.bids.levels(limit).tolist(),
+            "asks": self.asks.levels(limit).tolist(),
+            "nonce": self.last_update_id,
+            "imbalance": self.imbalance(limit),
+        }
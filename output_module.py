@@ -1,16 +1,42 @@
 import os
-from huggingface_hub import InferenceClient
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from metrics import registry, timed, startup_phase
 
-# Initialize the client once globally (adjust provider/api_key as needed)
-client = InferenceClient(
-    provider="novita",  # Change provider as required
-    api_key=os.environ.get("HF_API_KEY")
-)
+log = logging.getLogger(__name__)
 
-def trader_speak(symbol, signals, rationale, indicators_dict=None, order_book=None, heatmap=None,
-                 confidence=None, sl=None, tp=None):
-    print(f"[AI] Generating AI commentary for {symbol} via Hugging Face InferenceClient...")
+LLM_MODEL = "meta-llama/Llama-3.1-8B-Instruct"
+LLM_TIMEOUT_SECS = float(os.environ.get("LLM_TIMEOUT_SECS", "20"))
+# Point at an OpenAI-compatible endpoint instead of the provider (e.g. stub_inference_server.py)
+HF_BASE_URL = os.environ.get("HF_BASE_URL")
+
+# One client for the process, built on the first LLM call (huggingface_hub is slow to import)
+client = None
+_client_lock = threading.Lock()
 
+def get_client():
+    global client
+    with _client_lock:
+        if client is None:
+            with startup_phase("llm_client"):
+                from huggingface_hub import InferenceClient
+                # Adjust provider/api_key as needed
+                if HF_BASE_URL:
+                    client = InferenceClient(base_url=HF_BASE_URL, api_key=os.environ.get("HF_API_KEY"),
+                                             timeout=LLM_TIMEOUT_SECS)
+                else:
+                    client = InferenceClient(
+                        provider="novita",  # Change provider as required
+                        api_key=os.environ.get("HF_API_KEY"),
+                        timeout=LLM_TIMEOUT_SECS,
+                    )
+    return client
+
+def build_prompt(symbol, signals, rationale, indicators_dict=None, order_book=None, heatmap=None,
+                 confidence=None, sl=None, tp=None):
     sig_text = ', '.join(signals) if signals else 'No active signals'
 
     # Build multi-timeframe indicator summary (example)
@@ -52,17 +78,172 @@ def trader_speak(symbol, signals, rationale, indicators_dict=None, order_book=No
         f"Model rationale & reasonings:\n{rationale}\n"
         "Please provide a concise, factual, expert trading idea in 1-2 sentences suitable for terminal output. Do not speculate or exaggerate. Warn if data is inconclusive."
     )
+    return prompt
+
+def complete_prompt(prompt):
+    """Blocking LLM call; raises on failure."""
+    completion = get_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    if hasattr(completion.choices[0], "message"):
+        return completion.choices[0].message.content.strip()
+    return completion.choices[0].text.strip()
 
+def trader_speak(symbol, signals, rationale, indicators_dict=None, order_book=None, heatmap=None,
+                 confidence=None, sl=None, tp=None):
+    log.debug("Generating AI commentary via Hugging Face InferenceClient", extra={"symbol": symbol})
+    prompt = build_prompt(symbol, signals, rationale, indicators_dict, order_book, heatmap, confidence, sl, tp)
     try:
-        completion = client.chat.completions.create(
-            model="meta-llama/Llama-3.1-8B-Instruct",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        if hasattr(completion.choices[0], "message"):
-            text = completion.choices[0].message.content.strip()
-        else:
-            text = completion.choices[0].text.strip()
-        return text
+        with timed("llm_call", symbol):
+            return complete_prompt(prompt)
     except Exception as e:
-        print(f"[AI ERROR] Failed to generate commentary: {e}")
+        log.warning("Failed to generate commentary: %s", e, extra={"symbol": symbol})
         return "No AI commentary available due to error."
+
+def _number(value):
+    """float(value), or None when it is missing, not numeric or NaN."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if value != value else value
+
+def _bucket(value, width):
+    value = _number(value)
+    return None if value is None else int(value // width)
+
+def prompt_fingerprint(symbol, signals, indicators_dict=None, confidence=None):
+    """
+    Cache key for near-identical prompts: symbol, direction and coarse indicator
+    state (RSI in 10-point buckets, EMA21 vs EMA200 per timeframe, confidence in 10% steps).
+    """
+    state = []
+    if indicators_dict:
+        for tf_suffix in ("", "_1m", "_15m", "_1h"):
+            ema21 = _number(indicators_dict.get(f"ema21{tf_suffix}"))
+            ema200 = _number(indicators_dict.get(f"ema200{tf_suffix}"))
+            trend = None if ema21 is None or ema200 is None else ema21 > ema200
+            state.append((_bucket(indicators_dict.get(f"rsi{tf_suffix}"), 10), trend))
+    return (symbol, tuple(signals or ()), tuple(state), _bucket(confidence, 0.1))
+
+class CommentaryService:
+    """
+    Non-blocking trader_speak for the event loop.
+
+    Requests go through a bounded queue to a small pool of workers that run the
+    blocking LLM call in threads. Each request has a deadline; when it passes
+    (or the queue is full, or the call fails) the caller gets the fallback text
+    instead, typically the reasoning() rationale. Completed answers are cached
+    by prompt_fingerprint for `cache_ttl_secs`, and identical in-flight
+    requests share one call. When disabled, every caller gets the fallback.
+    """
+
+    def __init__(self, workers=2, queue_size=32, deadline_secs=8.0, cache_ttl_secs=900, cache_size=256,
+                 enabled=True):
+        self.enabled = enabled
+        self.workers = workers
+        self.queue_size = queue_size
+        self.deadline_secs = deadline_secs
+        self.cache_ttl_secs = cache_ttl_secs
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.inflight = {}
+        self.queue = None
+        self._tasks = []
+        self.hits = self.misses = self.fallbacks = 0
+
+    def _cache_get(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        expires, text = entry
+        if expires < time.monotonic():
+            del self.cache[key]
+            return None
+        self.cache.move_to_end(key)
+        return text
+
+    def _cache_put(self, key, text):
+        self.cache[key] = (time.monotonic() + self.cache_ttl_secs, text)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _ensure_workers(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            key, prompt, deadline, fut = await self.queue.get()
+            try:
+                if time.monotonic() > deadline:
+                    continue  # every caller has already fallen back
+                with timed("llm_call", key[0]):
+                    text = await asyncio.to_thread(complete_prompt, prompt)
+                self._cache_put(key, text)
+                if not fut.done():
+                    fut.set_result(text)
+            except Exception as e:
+                registry.inc("commentary_errors_total", symbol=key[0])
+                log.warning("Failed to generate commentary: %s", e, extra={"symbol": key[0]})
+            finally:
+                if not fut.done():
+                    fut.set_result(None)
+                self.inflight.pop(key, None)
+                self.queue.task_done()
+
+    async def speak(self, symbol, signals, rationale, fallback=None, indicators_dict=None, order_book=None,
+                    heatmap=None, confidence=None, sl=None, tp=None):
+        fallback = rationale if fallback is None else fallback
+        if not self.enabled:
+            return fallback
+        key = prompt_fingerprint(symbol, signals, indicators_dict, confidence)
+        cached = self._cache_get(key)
+        if cached is not None:
+            self.hits += 1
+            registry.inc("commentary_cache_hits_total", symbol=symbol)
+            return cached
+        self.misses += 1
+        self._ensure_workers()
+        fut = self.inflight.get(key)
+        if fut is None:
+            log.debug("Queueing AI commentary", extra={"symbol": symbol})
+            with timed("build_prompt", symbol):
+                prompt = build_prompt(symbol, signals, rationale, indicators_dict, order_book, heatmap,
+                                      confidence, sl, tp)
+            fut = asyncio.get_running_loop().create_future()
+            try:
+                self.queue.put_nowait((key, prompt, time.monotonic() + self.deadline_secs, fut))
+            except asyncio.QueueFull:
+                log.warning("Commentary queue full; using rationale", extra={"symbol": symbol})
+                self.fallbacks += 1
+                registry.inc("commentary_fallbacks_total", symbol=symbol, reason="queue_full")
+                return fallback
+            self.inflight[key] = fut
+        try:
+            text = await asyncio.wait_for(asyncio.shield(fut), self.deadline_secs)
+        except asyncio.TimeoutError:
+            log.warning("Commentary missed its %gs deadline; using rationale", self.deadline_secs,
+                        extra={"symbol": symbol})
+            text = None
+        if text is None:
+            self.fallbacks += 1
+            registry.inc("commentary_fallbacks_total", symbol=symbol, reason="no_answer")
+            return fallback
+        return text
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self.queue = None
+
+commentary_service = CommentaryService(
+    workers=int(os.environ.get("LLM_WORKERS", "2")),
+    deadline_secs=float(os.environ.get("LLM_DEADLINE_SECS", "8")),
+    cache_ttl_secs=float(os.environ.get("LLM_CACHE_TTL_SECS", "900")),
+    enabled=os.environ.get("LLM_ENABLED", "1") == "1",
+)
@@ -1,11 +1,12 @@
 from datetime import datetime
 import numpy as np
+from strategy_engine import trending_symbols
 
-def reasoning(symbol, df, checked, reasons, order_book, heatmap, news_headlines=None, context={}):
+def reasoning(symbol, df, checked, reasons, order_book, heatmap, news_headlines=None, context={}, now=None):
     """
     Market-Structure-Aware, Multi-Timeframe Advanced Reasoning Layer for AI Signal Explanations
     """
-    now_str = datetime.utcnow().strftime("%H:%M:%S")
+    now_str = (now or datetime.utcnow()).strftime("%H:%M:%S")
     last = df.iloc[-1]
     base = symbol.split('/')[0].lower()
 
@@ -16,8 +17,7 @@ def reasoning(symbol, df, checked, reasons, order_book, heatmap, news_headlines=
         headline_info = f"\n[!] Market news: {recent_news}"
 
     # --- Heatmap context (trendiness/risk-on-off) ---
-    trending_coins = [coin['item']['symbol'].lower() for coin in heatmap.get('coins', [])] if heatmap else []
-    trending_status = "Trending on heatmap" if base in trending_coins else "Not trending (risk-off)"
+    trending_status = "Trending on heatmap" if base in trending_symbols(heatmap) else "Not trending (risk-off)"
 
     # --- Helper for missing values ---
     def get_col(d, name, default=np.nan):
@@ -0,0 +1,55 @@
+import json
+import asyncio
+import argparse
+from aiohttp import web
+
+# Local stand-in for the Binance combined-stream WebSocket endpoint.
+# Replays a JSONL recording made by stream_feed.py (one {"ts", "msg"} per line),
+# keeping the original message spacing divided by --speed.
+
+
+def load_recording(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def make_app(records, speed=1.0, loop_forever=False):
+    async def stream(request):
+        wanted = set(filter(None, request.query.get("streams", "").split("/")))
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        print(f"[Replay] Client connected for {len(wanted) or 'all'} streams")
+        while True:
+            prev_ts = None
+            for record in records:
+                msg = record["msg"]
+                if wanted and msg.get("stream") not in wanted:
+                    continue
+                if prev_ts is not None and speed > 0:
+                    await asyncio.sleep(max(record["ts"] - prev_ts, 0) / 1000.0 / speed)
+                prev_ts = record["ts"]
+                if ws.closed:
+                    return ws
+                await ws.send_str(json.dumps(msg))
+            if not loop_forever:
+                break
+        print("[Replay] Recording finished")
+        await ws.close()
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/stream", stream)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded Binance streams over WebSocket")
+    parser.add_argument("recording")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier (0 = as fast as possible)")
+    parser.add_argument("--loop", action="store_true", help="restart the recording when it ends")
+    args = parser.parse_args()
+    records = load_recording(args.recording)
+    print(f"[Replay] Serving {len(records)} messages on ws://{args.host}:{args.port}/stream")
+    web.run_app(make_app(records, args.speed, args.loop), host=args.host, port=args.port, print=None)
@@ -0,0 +1,130 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+
+# Central Binance REST budget shared by every symbol task.
+#
+# Binance meters each IP by request *weight* per minute (spot: 6000). Every
+# REST call waits here for enough weight tokens; waiters are served by
+# priority, then FIFO. The bucket is re-synced from the X-MBX-USED-WEIGHT-1M
+# response header and pauses entirely after a 429/418.
+
+log = logging.getLogger(__name__)
+
+BINANCE_WEIGHT_PER_MINUTE = int(os.getenv("BINANCE_WEIGHT_PER_MINUTE", "6000"))
+WEIGHT_SAFETY_MARGIN = float(os.getenv("BINANCE_WEIGHT_SAFETY_MARGIN", "0.8"))
+DEFAULT_BACKOFF_SECS = 60
+
+# Lower value = served first
+PRIORITY_EVALUATION = 0  # outcome checks for open signals
+PRIORITY_ANALYSIS = 10   # routine per-symbol polling
+PRIORITY_BACKGROUND = 20  # backfills, snapshots, metadata
+
+
+def depth_weight(limit):
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+# Spot REST weights (https://developers.binance.com/docs/binance-spot-api-docs/rest-api)
+ENDPOINT_WEIGHTS = {
+    "klines": lambda limit=None: 2,
+    "depth": lambda limit=100: depth_weight(limit or 100),
+    "ticker_price": lambda limit=None: 2,
+    "exchange_info": lambda limit=None: 20,
+}
+
+
+def request_weight(endpoint, limit=None):
+    return ENDPOINT_WEIGHTS.get(endpoint, lambda limit=None: 1)(limit)
+
+
+class WeightScheduler:
+    """Priority token bucket over Binance request weight."""
+
+    def __init__(self, weight_per_minute=BINANCE_WEIGHT_PER_MINUTE, safety_margin=WEIGHT_SAFETY_MARGIN):
+        self.capacity = weight_per_minute * safety_margin
+        self.refill_per_sec = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waiters = []
+        self.seq = itertools.count()
+        self.used_weight = 0
+        self._wakeup = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_sec)
+        self.updated = now
+        return now
+
+    def _grant(self):
+        """Hand tokens to queued waiters in priority order; returns seconds until the next grant."""
+        now = self._refill()
+        while self.waiters:
+            if now < self.paused_until:
+                return self.paused_until - now
+            priority, seq, weight, fut = self.waiters[0]
+            if fut.done():
+                heapq.heappop(self.waiters)
+                continue
+            if self.tokens < weight:
+                return (weight - self.tokens) / self.refill_per_sec
+            heapq.heappop(self.waiters)
+            self.tokens -= weight
+            fut.set_result(None)
+        return None
+
+    async def _dispatch(self):
+        try:
+            while True:
+                delay = self._grant()
+                if delay is None:
+                    return
+                await asyncio.sleep(delay)
+        finally:
+            self._wakeup = None
+
+    async def acquire(self, weight, priority=PRIORITY_ANALYSIS):
+        weight = min(weight, self.capacity)
+        self._refill()
+        if not self.waiters and self.tokens >= weight and time.monotonic() >= self.paused_until:
+            self.tokens -= weight
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.seq), weight, fut))
+        if self._wakeup is None:
+            self._wakeup = asyncio.ensure_future(self._dispatch())
+        await fut
+
+    def observe(self, headers):
+        """Re-sync with the server's view of the weight used in the current minute."""
+        if not headers:
+            return
+        used = headers.get("x-mbx-used-weight-1m") or headers.get("X-MBX-USED-WEIGHT-1M")
+        if used is None:
+            return
+        self.used_weight = int(used)
+        self._refill()
+        self.tokens = min(self.tokens, max(self.capacity - self.used_weight, 0))
+
+    def backoff(self, retry_after=None):
+        """Stop issuing requests after a 429/418 until Retry-After has passed."""
+        delay = float(retry_after) if retry_after else DEFAULT_BACKOFF_SECS
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        self.tokens = 0.0
+        log.warning("Rate limited by exchange; pausing requests for %.0fs", delay)
+        if self.waiters and self._wakeup is None:
+            self._wakeup = asyncio.ensure_future(self._dispatch())
+
+
+scheduler = WeightScheduler()
@@ -0,0 +1,461 @@
+import os
+import sys
+import json
+import time
+import bisect
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import argparse
+import subprocess
+from functools import partial
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Horizontal sharding of the symbol universe across agent processes and hosts.
+#
+#   python shard_coordinator.py --workers 4                    # 4 local workers
+#   AGENT_SHARD_WORKER=host-a AGENT_SHARD_STATE=redis://cache:6379/0 python agent.py
+#
+# Every worker heartbeats into a shared store and places the live workers on a
+# consistent-hash ring; it analyses the symbols the ring gives it. When a
+# worker stops heartbeating for SHARD_WORKER_TTL_SECS (or leaves), its symbols
+# move to the next workers on the ring and only those move. The store also
+# holds what used to live in the agent's per-process dicts: signal cooldowns,
+# each symbol's last signal, open signals and whether its warmup was reviewed.
+# A signal fires only after an atomic claim in the store, so the cooldown and
+# last-signal/hold rules hold even while two workers briefly both own a symbol
+# during a handover; an open signal is resolved by whichever owner removes it
+# from the store first. The new owner of a symbol re-confirms its direction
+# from scratch (sticky confirms stay local), which is never looser. A worker
+# stops analysing a released symbol at once but starts on an acquired one only
+# after it has adopted its state and warm started it. The agent talks to the
+# store through AsyncShardState, so a busy SQLite lock or a slow Redis round
+# trip waits on a thread of its own instead of stalling the event loop.
+#
+# SQLite (sqlite:///path or a plain path) serves workers on one host; Redis
+# (redis://..., needs the redis package) serves workers on several. The
+# coordinator CLI starts the local workers, registers them up front so the
+# first assignment is already the final one, and makes a worker that exits
+# leave the ring at once instead of after the TTL.
+
+log = logging.getLogger(__name__)
+
+SHARD_STATE_URL = os.getenv("AGENT_SHARD_STATE", "sqlite:///shard_state.db")
+SHARD_HEARTBEAT_SECS = float(os.getenv("AGENT_SHARD_HEARTBEAT_SECS", "5"))
+SHARD_WORKER_TTL_SECS = float(os.getenv("AGENT_SHARD_WORKER_TTL_SECS", "20"))
+SHARD_REPLICAS = 256  # points per worker on the ring; keeps the shares within about 10% of even
+SQLITE_BUSY_TIMEOUT_SECS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shard_workers (
+    worker TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS signal_cooldowns (
+    symbol TEXT NOT NULL,
+    signal_type TEXT NOT NULL,
+    at REAL NOT NULL,
+    PRIMARY KEY (symbol, signal_type)
+);
+CREATE TABLE IF NOT EXISTS last_signal_type (
+    symbol TEXT PRIMARY KEY,
+    signal_type TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS active_signals (
+    signal_id TEXT PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS active_signals_by_symbol ON active_signals (symbol);
+CREATE TABLE IF NOT EXISTS warmup_reviewed (
+    symbol TEXT PRIMARY KEY
+);
+"""
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing: a key belongs to the first worker point clockwise from its hash."""
+
+    def __init__(self, members=(), replicas=SHARD_REPLICAS):
+        points = sorted((_hash(f"{member}#{i}"), member) for member in members for i in range(replicas))
+        self.hashes = [h for h, _ in points]
+        self.points = [member for _, member in points]
+
+    def owner(self, key):
+        if not self.hashes:
+            return None
+        return self.points[bisect.bisect_right(self.hashes, _hash(key)) % len(self.hashes)]
+
+    def assign(self, keys):
+        shares = {}
+        for key in keys:
+            shares.setdefault(self.owner(key), []).append(key)
+        return shares
+
+
+# -- Claim rules (the agent's can_fire_signal and last-signal/hold checks) --
+
+def _cooldown_over(last_at, now, window):
+    return last_at is None or now - last_at > window
+
+
+def _signal_allowed(last, signal_type, now, hold):
+    return last is None or (last[0] != signal_type and now - last[1] >= hold)
+
+
+def _signal_payload(signal):
+    payload = signal.as_dict()
+    payload["hold_minutes"] = signal.hold_duration.total_seconds() / 60
+    return json.dumps(payload, default=str)
+
+
+def _signal_state(payload):
+    state = json.loads(payload)
+    for field in ("entry_time", "exit_time"):
+        if isinstance(state.get(field), str):
+            state[field] = datetime.fromisoformat(state[field])
+    return state
+
+
+class SqliteShardState:
+    """Shared shard state in one SQLite file (WAL), for workers on the same host."""
+
+    def __init__(self, path="shard_state.db"):
+        self.path = path
+        # Opened on the caller's thread, used from AsyncShardState's; that thread serialises every call
+        self.conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_SECS, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so read-check-write is atomic across processes
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def heartbeat(self, worker, now):
+        self.conn.execute("INSERT OR REPLACE INTO shard_workers VALUES (?, ?)", (worker, now))
+
+    def leave(self, worker):
+        self.conn.execute("DELETE FROM shard_workers WHERE worker = ?", (worker,))
+
+    def members(self, now, ttl=SHARD_WORKER_TTL_SECS):
+        rows = self.conn.execute("SELECT worker FROM shard_workers WHERE heartbeat >= ? ORDER BY worker",
+                                 (now - ttl,))
+        return [worker for worker, in rows]
+
+    def claim_cooldown(self, symbol, signal_type, now, window):
+        """Start the (symbol, signal_type) cooldown unless one started within `window` seconds."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT at FROM signal_cooldowns WHERE symbol = ? AND signal_type = ?",
+                               (symbol, signal_type)).fetchone()
+            if not _cooldown_over(row[0] if row else None, now, window):
+                return False
+            conn.execute("INSERT OR REPLACE INTO signal_cooldowns VALUES (?, ?, ?)", (symbol, signal_type, now))
+            return True
+
+    def claim_signal(self, symbol, signal_type, now, hold):
+        """Make `signal_type` the symbol's last signal unless it already is, or the last is under `hold` seconds old."""
+        with self._transaction() as conn:
+            last = conn.execute("SELECT signal_type, at FROM last_signal_type WHERE symbol = ?", (symbol,)).fetchone()
+            if not _signal_allowed(last, signal_type, now, hold):
+                return False
+            conn.execute("INSERT OR REPLACE INTO last_signal_type VALUES (?, ?, ?)", (symbol, signal_type, now))
+            return True
+
+    def last_signals(self, symbols):
+        """{symbol: (signal_type, epoch seconds)} for the symbols that have signalled."""
+        wanted = set(symbols)
+        return {symbol: (signal_type, at) for symbol, signal_type, at
+                in self.conn.execute("SELECT symbol, signal_type, at FROM last_signal_type") if symbol in wanted}
+
+    def put_active(self, signal):
+        self.conn.execute("INSERT OR REPLACE INTO active_signals VALUES (?, ?, ?)",
+                          (str(signal.id), signal.symbol, _signal_payload(signal)))
+
+    def close_active(self, signal_id):
+        """Remove an open signal; True only for the one caller that removed it."""
+        return self.conn.execute("DELETE FROM active_signals WHERE signal_id = ?", (str(signal_id),)).rowcount == 1
+
+    def active_signals(self, symbols):
+        """Open signals on `symbols` as journal-style states, in creation order."""
+        wanted = set(symbols)
+        return [_signal_state(payload) for symbol, payload
+                in self.conn.execute("SELECT symbol, payload FROM active_signals ORDER BY rowid") if symbol in wanted]
+
+    def mark_reviewed(self, symbol):
+        self.conn.execute("INSERT OR IGNORE INTO warmup_reviewed VALUES (?)", (symbol,))
+
+    def reviewed(self, symbols):
+        wanted = set(symbols)
+        return {symbol for symbol, in self.conn.execute("SELECT symbol FROM warmup_reviewed") if symbol in wanted}
+
+    def close(self):
+        self.conn.close()
+
+
+class RedisShardState:
+    """The same state in Redis, for workers on several hosts (optional `redis` package)."""
+
+    PREFIX = "agent:"
+
+    def __init__(self, url):
+        import redis
+
+        self.url = url
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def _key(self, name):
+        return self.PREFIX + name
+
+    def _claim(self, name, field, allowed, value):
+        key = self._key(name)
+
+        def attempt(pipe):
+            # WATCH/MULTI: the write is dropped and retried if another worker changed the hash meanwhile
+            current = pipe.hget(key, field)
+            if not allowed(json.loads(current) if current is not None else None):
+                return False
+            pipe.multi()
+            pipe.hset(key, field, json.dumps(value))
+            return True
+
+        return self.redis.transaction(attempt, key, value_from_callable=True)
+
+    def heartbeat(self, worker, now):
+        self.redis.zadd(self._key("shard_workers"), {worker: now})
+
+    def leave(self, worker):
+        self.redis.zrem(self._key("shard_workers"), worker)
+
+    def members(self, now, ttl=SHARD_WORKER_TTL_SECS):
+        return sorted(self.redis.zrangebyscore(self._key("shard_workers"), now - ttl, "+inf"))
+
+    def claim_cooldown(self, symbol, signal_type, now, window):
+        return self._claim("signal_cooldowns", f"{symbol}|{signal_type}",
+                           lambda last_at: _cooldown_over(last_at, now, window), now)
+
+    def claim_signal(self, symbol, signal_type, now, hold):
+        return self._claim("last_signal_type", symbol,
+                           lambda last: _signal_allowed(last, signal_type, now, hold), [signal_type, now])
+
+    def last_signals(self, symbols):
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        values = self.redis.hmget(self._key("last_signal_type"), symbols)
+        return {symbol: tuple(json.loads(value)) for symbol, value in zip(symbols, values) if value is not None}
+
+    def put_active(self, signal):
+        # Creation order survives in the sorted set's scores
+        payload = _signal_payload(signal)
+        with self.redis.pipeline() as pipe:
+            pipe.hset(self._key("active_signals"), str(signal.id), payload)
+            pipe.zadd(self._key("active_order"), {str(signal.id): signal.entry_time.timestamp()})
+            pipe.execute()
+
+    def close_active(self, signal_id):
+        with self.redis.pipeline() as pipe:
+            pipe.hdel(self._key("active_signals"), str(signal_id))
+            pipe.zrem(self._key("active_order"), str(signal_id))
+            removed, _ = pipe.execute()
+        return removed == 1
+
+    def active_signals(self, symbols):
+        wanted = set(symbols)
+        ids = self.redis.zrange(self._key("active_order"), 0, -1)
+        payloads = self.redis.hmget(self._key("active_signals"), ids) if ids else []
+        states = [_signal_state(payload) for payload in payloads if payload is not None]
+        return [state for state in states if state["symbol"] in wanted]
+
+    def mark_reviewed(self, symbol):
+        self.redis.sadd(self._key("warmup_reviewed"), symbol)
+
+    def reviewed(self, symbols):
+        symbols = list(symbols)
+        if not symbols:
+            return set()
+        flags = self.redis.smismember(self._key("warmup_reviewed"), symbols)
+        return {symbol for symbol, flag in zip(symbols, flags) if flag}
+
+    def close(self):
+        self.redis.close()
+
+
+def open_shard_state(url=SHARD_STATE_URL):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisShardState(url)
+    return SqliteShardState(url[len("sqlite:///"):] if url.startswith("sqlite:///") else url)
+
+
+class AsyncShardState:
+    """
+    Awaitable view of a Sqlite/RedisShardState: `await state.claim_signal(...)`
+    and so on. Every call runs on one dedicated thread, in the order it was
+    made, so the store's blocking calls never hold up the event loop.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shard-state")
+
+    def _call(self, method, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, partial(method, *args))
+
+    def __getattr__(self, name):
+        method = getattr(self.state, name)
+
+        async def call(*args):
+            return await self._call(method, *args)
+        return call
+
+    async def close(self):
+        try:
+            await self._call(self.state.close)
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+class ShardWorker:
+    """One worker's membership: heartbeats and the share of `symbols` the ring gives it (state is an AsyncShardState)."""
+
+    def __init__(self, worker_id, symbols, state, heartbeat_secs=SHARD_HEARTBEAT_SECS,
+                 ttl_secs=SHARD_WORKER_TTL_SECS, clock=time.time):
+        self.worker_id = worker_id
+        self.symbols = list(symbols)
+        self.state = state
+        self.heartbeat_secs = heartbeat_secs
+        self.ttl_secs = ttl_secs
+        self.clock = clock
+        self.members = ()
+        self.ring = HashRing()
+        self.share = set()  # what the ring gives this worker
+        self.owned = set()  # what it analyses: the share, once acquired symbols are handed over
+
+    def owns(self, symbol):
+        return symbol in self.owned
+
+    async def rebalance(self):
+        """
+        Heartbeat and recompute this worker's share from the live workers.
+        Returns (acquired, released) against the symbols it owns; `owned`
+        itself only changes through publish().
+        """
+        now = self.clock()
+        await self.state.heartbeat(self.worker_id, now)
+        members = tuple(await self.state.members(now, self.ttl_secs))
+        if members != self.members:
+            log.info("Shard members: %s", ", ".join(members), extra={"worker": self.worker_id})
+            self.members, self.ring = members, HashRing(members)
+            self.share = {sym for sym in self.symbols if self.ring.owner(sym) == self.worker_id}
+        return sorted(self.share - self.owned), sorted(self.owned - self.share)
+
+    async def publish(self, acquired, released, on_change=None):
+        """Stop owning released symbols at once; own acquired ones only after on_change(acquired, released) returns."""
+        self.owned.difference_update(released)
+        if on_change is not None:
+            await on_change(acquired, released)
+        self.owned.update(acquired)
+
+    async def run(self, on_change):
+        """Rebalance every heartbeat and hand the symbols that moved to on_change before publishing them."""
+        while True:
+            await asyncio.sleep(self.heartbeat_secs)
+            try:
+                acquired, released = await self.rebalance()
+            except Exception as e:
+                # Keep the current share; if this lasts past the TTL the others take it over
+                log.warning("Shard heartbeat failed: %s", e, extra={"worker": self.worker_id})
+                continue
+            if not (acquired or released):
+                continue
+            try:
+                await self.publish(acquired, released, on_change)
+            except Exception:
+                # The acquired symbols stay unowned and are handed over again at the next heartbeat
+                log.exception("Shard handover failed", extra={"worker": self.worker_id})
+                continue
+            log.info("Shard rebalanced: +%d -%d symbols, %d owned", len(acquired), len(released),
+                     len(self.owned), extra={"worker": self.worker_id})
+
+    async def leave(self):
+        self.owned = set()
+        await self.state.leave(self.worker_id)
+
+
+# -- Local coordinator --
+
+def _spawn(worker, index, symbols, args):
+    env = dict(os.environ, AGENT_SHARD_WORKER=worker, AGENT_SHARD_STATE=args.state,
+               AGENT_SYMBOLS=",".join(symbols), METRICS_SNAPSHOT_PATH=f"metrics_snapshot.{worker}.json",
+               METRICS_PORT=str(args.metrics_port + index if args.metrics_port else 0))
+    return subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent.py")],
+                            env=env)
+
+
+def coordinate(symbols, args):
+    state = open_shard_state(args.state)
+    workers = [f"{args.prefix}{i}" for i in range(args.workers)]
+    for worker in workers:
+        # Registered before they start, so no worker briefly takes the whole universe
+        state.heartbeat(worker, time.time())
+    for worker, share in sorted(HashRing(workers).assign(symbols).items()):
+        print(f"[Coordinator] {worker}: {len(share)} symbols")
+    processes = {worker: _spawn(worker, i, symbols, args) for i, worker in enumerate(workers)}
+    try:
+        while processes:
+            time.sleep(1)
+            for worker, process in list(processes.items()):
+                code = process.poll()
+                if code is None:
+                    continue
+                state.leave(worker)
+                alive = [w for w in processes if w != worker]
+                moved = HashRing(alive).assign(HashRing(alive + [worker]).assign(symbols).get(worker, []))
+                print(f"[Coordinator] {worker} exited with code {code}; its symbols move to "
+                      + (", ".join(f"{w} (+{len(s)})" for w, s in sorted(moved.items())) or "no one"))
+                if args.restart:
+                    state.heartbeat(worker, time.time())
+                    processes[worker] = _spawn(worker, workers.index(worker), symbols, args)
+                    print(f"[Coordinator] {worker} restarted")
+                else:
+                    del processes[worker]
+    except KeyboardInterrupt:
+        print("[Coordinator] Stopping workers")
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for worker, process in processes.items():
+            process.wait()
+            state.leave(worker)
+        state.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the agent as local shard workers over one symbol universe")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--symbols", nargs="+", help="symbol universe (default: the agent's TOP_SYMBOLS)")
+    parser.add_argument("--state", default=SHARD_STATE_URL, help="sqlite:///path or redis://host:port/db")
+    parser.add_argument("--prefix", default="worker-", help="worker id prefix")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="first worker's metrics port, the others count up from it (0 disables)")
+    parser.add_argument("--restart", action="store_true", help="restart workers that exit")
+    args = parser.parse_args()
+    if args.symbols is None:
+        from agent import TOP_SYMBOLS
+        args.symbols = TOP_SYMBOLS
+    coordinate(args.symbols, args)
@@ -0,0 +1,115 @@
+import os
+import json
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+import pandas as pd
+from metrics import timed
+
+# Append-only signal journal (SQLite in WAL mode).
+#
+# Every signal creation and every exit is one INSERT into `signal_events`, so
+# the cost of recording stays constant however long the agent runs, and a
+# crash can at worst lose the event being written. The current state of a
+# signal is its "created" payload with later events folded over it. Exporting
+# to CSV/Parquet (one row per signal) is an offline step:
+#   python signal_journal.py --out signal_log.csv
+
+SIGNAL_JOURNAL_PATH = os.getenv("SIGNAL_JOURNAL_PATH", "signal_journal.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signal_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    signal_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS signal_events_by_id ON signal_events (signal_id, seq);
+"""
+
+EXIT_FIELDS = ("exit_price", "exit_time", "outcome")
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+class SignalJournal:
+    def __init__(self, path=SIGNAL_JOURNAL_PATH, clock=datetime.utcnow):
+        self.path = path
+        self.clock = clock  # recorded_at timestamps
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(SCHEMA)
+
+    def _append(self, signal_id, event, payload):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO signal_events (signal_id, event, recorded_at, payload) VALUES (?, ?, ?, ?)",
+                (str(signal_id), event, self.clock().isoformat(), json.dumps(payload, default=str)))
+
+    def record_created(self, signal):
+        payload = signal.as_dict()
+        payload["hold_minutes"] = signal.hold_duration / timedelta(minutes=1)
+        with timed("journal_write", signal.symbol):
+            self._append(signal.id, "created", payload)
+
+    def record_exit(self, signal):
+        with timed("journal_write", signal.symbol):
+            self._append(signal.id, "exit", {field: getattr(signal, field) for field in EXIT_FIELDS})
+
+    def has(self, signal_id):
+        return self.conn.execute("SELECT 1 FROM signal_events WHERE signal_id = ? LIMIT 1",
+                                 (str(signal_id),)).fetchone() is not None
+
+    def _fold(self, rows):
+        signals = {}
+        for signal_id, event, payload in rows:
+            state = json.loads(payload)
+            if event == "created":
+                signals[signal_id] = state
+            elif signal_id in signals:
+                signals[signal_id].update(state)
+        for state in signals.values():
+            for field in ("entry_time", "exit_time"):
+                state[field] = _parse_time(state.get(field))
+        return list(signals.values())
+
+    def signals(self):
+        """Every journaled signal's current state, in creation order."""
+        return self._fold(self.conn.execute(
+            "SELECT signal_id, event, payload FROM signal_events ORDER BY seq"))
+
+    def open_signals(self):
+        """Signals without an exit event (what active_signals held)."""
+        return self._fold(self.conn.execute(
+            "SELECT signal_id, event, payload FROM signal_events WHERE signal_id NOT IN "
+            "(SELECT signal_id FROM signal_events WHERE event = 'exit') ORDER BY seq"))
+
+    def export(self, path, statuses=("CONFIRMED",)):
+        """Compact the journal into one row per signal (CSV, or Parquet by extension)."""
+        with timed("journal_export"):
+            rows = [s for s in self.signals() if statuses is None or s.get("status", "CONFIRMED") in statuses]
+            df = pd.DataFrame(rows).drop(columns=["hold_minutes"], errors="ignore")
+            if path.endswith(".parquet"):
+                df.to_parquet(path, index=False)
+            else:
+                df.to_csv(path, index=False)
+        return len(df)
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the signal journal")
+    parser.add_argument("--journal", default=SIGNAL_JOURNAL_PATH)
+    parser.add_argument("--out", default="signal_log.csv", help=".csv or .parquet")
+    parser.add_argument("--all-statuses", action="store_true", help="include non-CONFIRMED signals")
+    args = parser.parse_args()
+    journal = SignalJournal(args.journal)
+    count = journal.export(args.out, None if args.all_statuses else ("CONFIRMED",))
+    journal.close()
+    print(f"[Export] {count} signals saved to {args.out}")
@@ -1,26 +1,39 @@
 import uuid
+import numpy as np
+import pandas as pd
 from datetime import datetime, timedelta
 
+EPOCH = datetime(1970, 1, 1)
+MS = timedelta(milliseconds=1)
+
+def to_ms(dt):
+    return (dt - EPOCH) // MS
+
+def from_ms(ms):
+    return EPOCH + int(ms) * MS
+
+OUTCOMES = ("TARGET_HIT", "STOP_HIT", "TIME_EXPIRED")
+SIDES = ("LONG", "SHORT")
+CONFIDENCE_BUCKETS = 10  # 0.0-0.1, ..., 0.9-1.0
+
 class SignalEntry:
+    __slots__ = ("id", "symbol", "signal_type", "confidence", "rationale", "entry_price", "status",
+                 "entry_time", "target_price", "stop_price", "hold_duration", "exit_time", "exit_price", "outcome")
+
     def __init__(self, symbol, signal_type, confidence, rationale, entry_price,
-                 entry_time=None, target_pct=0.02, stop_pct=0.01, hold_duration_mins=120):
+                 entry_time=None, target_pct=0.02, stop_pct=0.01, hold_duration_mins=120, status="CONFIRMED"):
         self.id = uuid.uuid4()
         self.symbol = symbol
         self.signal_type = signal_type
         self.confidence = confidence
         self.rationale = rationale
         self.entry_price = entry_price
+        self.status = status  # "CONFIRMED"
         self.entry_time = entry_time or datetime.utcnow()
-        self.target_price = (
-            self.entry_price * (1 + target_pct)
-            if signal_type == "LONG"
-            else self.entry_price * (1 - target_pct)
-        )
-        self.stop_price = (
-            self.entry_price * (1 - stop_pct)
-            if signal_type == "LONG"
-            else self.entry_price * (1 + stop_pct)
-        )
+        self.target_price = (self.entry_price * (1 + target_pct) if signal_type == "LONG"
+                             else self.entry_price * (1 - target_pct)) if signal_type in SIDES else None
+        self.stop_price = (self.entry_price * (1 - stop_pct) if signal_type == "LONG"
+                           else self.entry_price * (1 + stop_pct)) if signal_type in SIDES else None
         self.hold_duration = timedelta(minutes=hold_duration_mins)
         self.exit_time = None
         self.exit_price = None
@@ -36,7 +49,7 @@ class SignalEntry:
                 self.outcome = "STOP_HIT"
             else:
                 self.outcome = "TIME_EXPIRED"
-        else:
+        elif self.signal_type == "SHORT":
             if price <= self.target_price:
                 self.outcome = "TARGET_HIT"
             elif price >= self.stop_price:
@@ -44,6 +57,14 @@ class SignalEntry:
             else:
                 self.outcome = "TIME_EXPIRED"
 
+    @property
+    def r_multiple(self):
+        """Realised return in units of the initial risk (entry to stop)."""
+        if self.exit_price is None or self.stop_price is None or self.stop_price == self.entry_price:
+            return None
+        return (self.exit_price - self.entry_price) / abs(self.entry_price - self.stop_price) * (
+            1 if self.signal_type == "LONG" else -1)
+
     def as_dict(self):
         return {
             "id": str(self.id),
@@ -57,5 +78,232 @@ class SignalEntry:
             "exit_price": self.exit_price,
             "exit_time": self.exit_time,
             "outcome": self.outcome,
+            "status": self.status,
             "rationale": self.rationale,
         }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Rebuild a signal from its journaled as_dict() state."""
+        signal = cls(state["symbol"], state["signal_type"], state["confidence"], state["rationale"],
+                     state["entry_price"], entry_time=state["entry_time"],
+                     hold_duration_mins=state.get("hold_minutes", 120), status=state.get("status", "CONFIRMED"))
+        signal.id = uuid.UUID(state["id"])
+        signal.target_price = state["target_price"]
+        signal.stop_price = state["stop_price"]
+        signal.exit_price = state.get("exit_price")
+        signal.exit_time = state.get("exit_time")
+        signal.outcome = state.get("outcome")
+        return signal
+
+class SignalStats:
+    """Running outcome aggregates for one group of closed signals."""
+    __slots__ = ("closed", "targets", "stops", "expired", "wins", "sum_r", "sum_exit_secs")
+
+    def __init__(self):
+        self.closed = self.targets = self.stops = self.expired = self.wins = 0
+        self.sum_r = self.sum_exit_secs = 0.0
+
+    def add(self, signal):
+        self.closed += 1
+        self.targets += signal.outcome == "TARGET_HIT"
+        self.stops += signal.outcome == "STOP_HIT"
+        self.expired += signal.outcome == "TIME_EXPIRED"
+        r = signal.r_multiple or 0.0
+        self.wins += r > 0
+        self.sum_r += r
+        self.sum_exit_secs += (signal.exit_time - signal.entry_time).total_seconds()
+
+    def as_dict(self):
+        n = self.closed or 1
+        return {
+            "closed": self.closed,
+            "hit_rate": self.targets / n,
+            "stop_rate": self.stops / n,
+            "expired_rate": self.expired / n,
+            "win_rate": self.wins / n,
+            "avg_r": self.sum_r / n,
+            "avg_minutes_to_exit": self.sum_exit_secs / n / 60,
+        }
+
+# One row per closed signal; rationale text stays in the signal journal
+CLOSED_DTYPE = np.dtype([
+    ("symbol", "i4"), ("side", "i1"), ("outcome", "i1"), ("confidence", "f4"),
+    ("entry_price", "f8"), ("target_price", "f8"), ("stop_price", "f8"), ("exit_price", "f8"),
+    ("entry_ms", "i8"), ("exit_ms", "i8"),
+])
+
+def confidence_bucket(confidence):
+    return min(max(int(confidence * CONFIDENCE_BUCKETS), 0), CONFIDENCE_BUCKETS - 1)
+
+class SignalStore:
+    """
+    Signals for the agent: open signals as SignalEntry objects indexed by id
+    and by symbol; closed ones compacted into a growable structured array
+    (about 60 bytes each), or a fixed ring of the last `retention` of them.
+    Outcome aggregates per symbol, direction and confidence bucket are
+    updated as each signal closes, so stats() never rescans history and
+    covers signals the ring has dropped.
+    """
+
+    def __init__(self, capacity=1024, retention=None):
+        self.active = {}
+        self.by_symbol = {}
+        self.symbols = {}
+        self.retention = retention
+        self.closed = np.zeros(retention or capacity, dtype=CLOSED_DTYPE)
+        self.closed_count = 0
+        self.closed_start = 0  # oldest row once the ring has wrapped
+        self.created = 0
+        self.groups = {}
+
+    def __len__(self):
+        return len(self.active) + self.closed_count
+
+    def _symbol_code(self, symbol):
+        return self.symbols.setdefault(symbol, len(self.symbols))
+
+    def add(self, signal):
+        self.created += 1
+        self._symbol_code(signal.symbol)
+        if signal.status == "CONFIRMED" and signal.outcome is None:
+            self.active[signal.id] = signal
+            self.by_symbol.setdefault(signal.symbol, {})[signal.id] = signal
+        elif signal.outcome is not None:
+            self._compact(signal)
+        return signal
+
+    def open_signals(self, symbol):
+        return list(self.by_symbol.get(symbol, {}).values())
+
+    def open_by_symbol(self):
+        return {sym: list(sigs.values()) for sym, sigs in self.by_symbol.items() if sigs}
+
+    def close(self, signal):
+        """Move a signal that has been through mark_exit out of the open set and into the aggregates."""
+        if self.active.pop(signal.id, None) is None:
+            return
+        self.by_symbol[signal.symbol].pop(signal.id, None)
+        self._compact(signal)
+
+    def discard(self, signal):
+        """Forget an open signal without recording an outcome (another worker resolves it)."""
+        if self.active.pop(signal.id, None) is not None:
+            self.by_symbol[signal.symbol].pop(signal.id, None)
+
+    def _closed_slot(self):
+        if self.closed_count < len(self.closed):
+            self.closed_count += 1
+            return self.closed_count - 1
+        if self.retention:
+            slot = self.closed_start
+            self.closed_start = (slot + 1) % len(self.closed)
+            return slot
+        self.closed = np.concatenate([self.closed, np.zeros(len(self.closed), dtype=CLOSED_DTYPE)])
+        self.closed_count += 1
+        return self.closed_count - 1
+
+    def _compact(self, signal):
+        slot = self._closed_slot()  # may grow self.closed
+        row = self.closed[slot]
+        row["symbol"] = self._symbol_code(signal.symbol)
+        row["side"] = 1 if signal.signal_type == "LONG" else -1
+        row["outcome"] = OUTCOMES.index(signal.outcome) if signal.outcome in OUTCOMES else -1
+        row["confidence"] = signal.confidence
+        row["entry_price"] = signal.entry_price
+        row["target_price"] = signal.target_price if signal.target_price is not None else np.nan
+        row["stop_price"] = signal.stop_price if signal.stop_price is not None else np.nan
+        row["exit_price"] = signal.exit_price if signal.exit_price is not None else np.nan
+        row["entry_ms"] = to_ms(signal.entry_time)
+        row["exit_ms"] = to_ms(signal.exit_time) if signal.exit_time is not None else 0
+        if signal.outcome in OUTCOMES:
+            for key in ((), ("symbol", signal.symbol), ("direction", signal.signal_type),
+                        ("confidence", confidence_bucket(signal.confidence))):
+                stats = self.groups.get(key)
+                if stats is None:
+                    stats = self.groups[key] = SignalStats()
+                stats.add(signal)
+
+    @property
+    def nbytes(self):
+        return self.closed.nbytes
+
+    def stats(self, symbol=None, direction=None, confidence=None):
+        """Aggregates for all signals, or one symbol / direction / confidence (bucketed) group."""
+        if symbol is not None:
+            key = ("symbol", symbol)
+        elif direction is not None:
+            key = ("direction", direction)
+        elif confidence is not None:
+            key = ("confidence", confidence_bucket(confidence))
+        else:
+            key = ()
+        return (self.groups.get(key) or SignalStats()).as_dict()
+
+    def summary(self):
+        """Every aggregate group as a DataFrame row."""
+        rows = []
+        for key, stats in self.groups.items():
+            group, value = key if key else ("all", "")
+            if group == "confidence":
+                value = f"{value / CONFIDENCE_BUCKETS:.1f}-{(value + 1) / CONFIDENCE_BUCKETS:.1f}"
+            rows.append({"group": group, "value": value, **stats.as_dict()})
+        return pd.DataFrame(rows)
+
+    def closed_frame(self):
+        """Closed signals still held, oldest first, as a DataFrame (a copy of the compact columns)."""
+        rows = np.roll(self.closed[:self.closed_count], -self.closed_start)
+        names = list(self.symbols)
+        return pd.DataFrame({
+            "symbol": [names[i] for i in rows["symbol"]],
+            "signal_type": np.where(rows["side"] == 1, "LONG", "SHORT"),
+            "confidence": rows["confidence"],
+            "entry_price": rows["entry_price"],
+            "entry_time": pd.to_datetime(rows["entry_ms"], unit="ms"),
+            "target_price": rows["target_price"],
+            "stop_price": rows["stop_price"],
+            "exit_price": rows["exit_price"],
+            "exit_time": pd.to_datetime(rows["exit_ms"], unit="ms"),
+            "outcome": [OUTCOMES[o] if o >= 0 else None for o in rows["outcome"]],
+        })
+
+def resolve_signals(signals, candles, now):
+    """
+    Check one symbol's open signals against its recent candles (ccxt rows) in one pass.
+
+    A signal resolves at the first candle inside its hold window whose high/low
+    touches the target or stop (a candle touching both counts as a stop), or,
+    once the hold has elapsed, at the close of the last candle inside it.
+    Candles from before entry are ignored. Returns the signals marked.
+    """
+    if not signals or not len(candles):
+        return []
+    rows = np.asarray(candles, dtype=float)
+    opens, high, low, close = rows[:, 0], rows[:, 2], rows[:, 3], rows[:, 4]
+    entry = np.array([to_ms(s.entry_time) for s in signals], dtype=float)
+    end = entry + np.array([s.hold_duration // MS for s in signals], dtype=float)
+    is_long = np.array([s.signal_type == "LONG" for s in signals])
+    target = np.array([s.target_price for s in signals], dtype=float)[:, None]
+    stop = np.array([s.stop_price for s in signals], dtype=float)[:, None]
+
+    inside = (opens >= entry[:, None]) & (opens < end[:, None])
+    hit_target = np.where(is_long[:, None], high >= target, low <= target) & inside
+    hit_stop = np.where(is_long[:, None], low <= stop, high >= stop) & inside
+    n = len(rows)
+    first_target = np.where(hit_target.any(axis=1), hit_target.argmax(axis=1), n)
+    first_stop = np.where(hit_stop.any(axis=1), hit_stop.argmax(axis=1), n)
+    last_inside = np.where(inside.any(axis=1), n - 1 - inside[:, ::-1].argmax(axis=1), n - 1)
+    expired = to_ms(now) >= end
+
+    resolved = []
+    for i, signal in enumerate(signals):
+        if first_stop[i] < n and first_stop[i] <= first_target[i]:
+            signal.mark_exit(signal.stop_price, from_ms(opens[first_stop[i]]))
+        elif first_target[i] < n:
+            signal.mark_exit(signal.target_price, from_ms(opens[first_target[i]]))
+        elif expired[i]:
+            signal.mark_exit(close[last_inside[i]], signal.entry_time + signal.hold_duration)
+        else:
+            continue
+        resolved.append(signal)
+    return resolved
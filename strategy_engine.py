@@ -1,7 +1,6 @@
-import talib
-import pandas_ta as ta
 import numpy as np
 import pandas as pd
+from collections import namedtuple
 
 # -- CONFIGURATION --
 
@@ -36,6 +35,9 @@ THRESHOLDS = {
 # -- INDICATOR CALCULATION -- (as before)
 
 def calc_indicators(df, rsi_period=9):
+    # Imported here: the live path uses indicator_engine, and pandas_ta is slow to import
+    import talib
+    import pandas_ta as ta
     o = df["open"].values
     h = df["high"].values
     l = df["low"].values
@@ -69,6 +71,29 @@ def calc_indicators(df, rsi_period=9):
     df.fillna(value=np.nan, inplace=True)
     return df
 
+def trending_symbols(heatmap):
+    """Lower-case trending coin symbols; uses the index built by HeatmapProvider when present."""
+    if not heatmap:
+        return frozenset()
+    cached = heatmap.get("trending_symbols")
+    if cached is not None:
+        return cached
+    return frozenset(coin["item"]["symbol"].lower() for coin in heatmap.get("coins", []))
+
+def book_imbalance(order_book):
+    """(bid - ask) / (bid + ask) volume; uses the value precomputed by order_book.OrderBook when present."""
+    if not order_book:
+        return 0.0
+    cached = order_book.get("imbalance")
+    if cached is not None:
+        return cached
+    bids = order_book.get("bids") or []
+    asks = order_book.get("asks") or []
+    bid_volume = np.asarray(bids, dtype=float)[:, 1].sum() if len(bids) else 0.0
+    ask_volume = np.asarray(asks, dtype=float)[:, 1].sum() if len(asks) else 0.0
+    total_vol = bid_volume + ask_volume
+    return (bid_volume - ask_volume) / total_vol if total_vol > 0 else 0.0
+
 # -- MULTIFRAME MERGE AS BEFORE --
 
 def align_higher_tf(df_main, df_htf, suffix):
@@ -78,31 +103,177 @@ def align_higher_tf(df_main, df_htf, suffix):
         left_index=True, right_index=True, direction="backward"
     )
 
-# -- ADVANCED STRATEGY CHECKS/EXPLANATIONS --
+# -- RULE TABLE --
+#
+# Every scored check is one row: a CHECK_WEIGHTS key, the conditions that must
+# all hold, and the reason text. A condition compares a column with a number,
+# another column, or a THRESHOLDS entry (optionally times a column), so the
+# table is data and is compiled once into CompiledRules. Evaluation takes
+# {column: array} with bars on the last axis, so the same code scores the last
+# bar of one symbol, a whole history, or a (symbols, bars) universe. Missing
+# columns are NaN and fail their comparison.
+#
+# Besides the indicator columns, rules can read the derived columns in
+# DERIVED_COLUMNS and two per-symbol features passed at evaluation time:
+# book_imbalance and heatmap_trending (1.0 when the coin is trending).
 
-def comprehensive_strategy_checks(df, order_book, heatmap, custom_signals=None):
-    last = df.iloc[-1]
-    score = 0.0
-    max_score = sum(CHECK_WEIGHTS.values())
-    reasons = []
+Rule = namedtuple("Rule", "key conditions reason explanation")
+Ref = namedtuple("Ref", "column threshold scale", defaults=(None, None, 1.0))
+
+TIMEFRAMES = (("", "5m"), ("_1m", "1m"), ("_15m", "15m"), ("_1h", "1h"))
+
+DERIVED_COLUMNS = {
+    "obv_prev": (("obv",), lambda obv: _previous(obv)),
+    "bb_width": (("bb_upper", "bb_lower"), lambda upper, lower: upper - lower),
+}
+
+def _previous(x):
+    prev = np.full(x.shape, np.nan)
+    prev[..., 1:] = x[..., :-1]
+    return prev
+
+def _timeframe_rules(sfx, label):
+    close = f"close{sfx}"
+    rules = [
+        Rule(f"ema21_ema200{sfx}", ((f"ema21{sfx}", ">", Ref(f"ema200{sfx}")),),
+             f"{label}: EMA21 above EMA200", "Short-term trend leads the long-term average."),
+        Rule(f"supertrend{sfx}", ((close, ">", Ref(f"supertrend{sfx}")),),
+             f"{label}: Supertrend bullish", "Momentum models (Supertrend) confirm trend, increases setup reliability."),
+        Rule(f"hma21_ema21{sfx}", ((f"hma21{sfx}", ">", Ref(f"ema21{sfx}")),),
+             f"{label}: HMA21 above EMA21", "Fast Hull average turning ahead of the EMA, early momentum."),
+        Rule(f"ichimoku_cloud{sfx}", ((close, ">", Ref(f"ichimoku_a{sfx}")), (close, ">", Ref(f"ichimoku_b{sfx}"))),
+             f"{label}: Price above Ichimoku cloud", "Cloud acts as support; classic trend-following confirmation."),
+        Rule(f"rsi{sfx}", ((f"rsi{sfx}", ">", Ref(threshold=f"rsi_bullish{sfx}")),),
+             f"{label}: RSI above bullish threshold", "Strong momentum; pro traders often require RSI as confirmation layer."),
+    ]
+    if f"choppiness{sfx}" in CHECK_WEIGHTS:
+        rules.append(Rule(f"choppiness{sfx}", ((f"choppiness{sfx}", "<", Ref(threshold="choppiness_trending")),),
+                          f"{label}: Market is trending (low Choppiness Index)",
+                          "Choppiness below threshold = trending conditions per major quant studies."))
+    return rules
+
+RULES = [rule for sfx, label in TIMEFRAMES for rule in _timeframe_rules(sfx, label)] + [
+    # pandas_ta's StochRSI %K is on a 0-100 scale, the threshold is a fraction
+    Rule("stochrsi_k", (("stochrsi_k", "<", Ref(threshold="stochrsi_k_overbought", scale=100.0)),),
+         "StochRSI not overbought", "Room left for the move before momentum is exhausted."),
+    Rule("macd_positive", (("macd", ">", 0.0),),
+         "MACD positive", "Fast average above slow — standard momentum confirmation."),
+    Rule("cci", (("cci", ">", Ref(threshold="cci_bullish")),),
+         "CCI strong uptrend", "CCI signal-based filters well-cited in momentum funds."),
+    Rule("bb_squeeze", (("bb_width", "<", Ref("atr", "bb_squeeze_atr_mult")),),
+         "Bollinger squeeze", "Bands narrow relative to ATR — volatility expansion tends to follow."),
+    Rule("adx", (("adx", ">", Ref(threshold="adx_strong_trend")),),
+         "Strong trend (ADX)", "ADX filter often used in institutional models: removes signals in choppy/range."),
+    Rule("obv_rising", (("obv", ">", Ref("obv_prev")),),
+         "OBV rising", "Evidence of real money flow (OBV rising) — accumulation phase per market structure research."),
+    Rule("price_above_vwap", (("close", ">", Ref("vwap")),),
+         "Price above VWAP", "Buyers in control of the session's volume-weighted price."),
+    Rule("bullish_engulfing", (("engulfing", "==", 100.0),),
+         "Bullish engulfing candle", "Professional swing traders use this for additional confidence."),
+    Rule("bullish_hammer", (("hammer", "==", 100.0),),
+         "Bullish hammer pattern", "Classic reversal candle found in many institutional traders' playbooks."),
+    Rule("orderbook_buy_pressure", (("book_imbalance", ">", Ref(threshold="orderbook_imbalance")),),
+         "ORDER BOOK DOMINATED BY BUY BIDS", "Spot buy side pressure — this context often filters low-conviction shorts in pro logic."),
+    Rule("heatmap_trending", (("heatmap_trending", "==", 1.0),),
+         "TRENDING ON MARKET HEATMAP", "Confirms broad liquidity/risk-on status (common in crypto desk overlay screens)."),
+]
+# orderbook_sell_pressure is bearish evidence and only adds a reason; it has no
+# place in the bullish score.
+
+OPERATORS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal, "==": np.equal}
+
+
+class CompiledRules:
+    """
+    A rule table bound to weights and thresholds.
+
+    evaluate(columns, **features) returns (passes, confidence): passes is a
+    (rules, ...) bool matrix in table order, confidence has the input shape.
+    Each condition is one vectorised comparison over the whole input.
+    prepare() and rule_passes() are the same evaluation one rule at a time,
+    for callers that reuse rule results across weightings (see sweep.py).
+    """
+
+    def __init__(self, rules=RULES, weights=None, thresholds=None):
+        weights = CHECK_WEIGHTS if weights is None else weights
+        thresholds = THRESHOLDS if thresholds is None else thresholds
+        self.rules = list(rules)
+        self.keys = [rule.key for rule in self.rules]
+        self.weights = np.array([weights.get(key, 1.0) for key in self.keys])
+        self.max_score = float(self.weights.sum())
+        self.conditions = []
+        for rule in self.rules:
+            compiled = []
+            for column, op, ref in rule.conditions:
+                if not isinstance(ref, Ref):
+                    ref = Ref(scale=float(ref))
+                factor = ref.scale * (thresholds[ref.threshold] if ref.threshold else 1.0)
+                compiled.append((column, OPERATORS[op], ref.column, factor))
+            self.conditions.append(tuple(compiled))
+        referenced = {name for conds in self.conditions for column, _, other, _ in conds for name in (column, other) if name}
+        for name in list(referenced):
+            if name in DERIVED_COLUMNS:
+                referenced.update(DERIVED_COLUMNS[name][0])
+        # Input columns the table reads (features and derived columns excluded)
+        self.columns = sorted(referenced - set(DERIVED_COLUMNS) - {"book_imbalance", "heatmap_trending"})
+
+    def prepare(self, columns, **features):
+        """(values, shape): the input arrays plus features and derived columns."""
+        values = {name: np.asarray(columns[name], dtype=float) for name in self.columns if name in columns}
+        shape = np.broadcast_shapes(*(v.shape for v in values.values())) if values else ()
+        for name, value in features.items():
+            value = np.asarray(value, dtype=float)
+            # Per-symbol features broadcast over the bar axis
+            values[name] = value[..., None] if value.ndim and len(shape) > 1 else value
+        for name, (sources, derive) in DERIVED_COLUMNS.items():
+            if all(source in values for source in sources):
+                values[name] = derive(*(values[source] for source in sources))
+        return values, shape
 
-    def passed_check(flag, reason_key, reason_text, explanation=None):
-        nonlocal score
-        if flag:
-            weight = CHECK_WEIGHTS.get(reason_key, 1.0)
-            score += weight
-            # Give both brief and context explanation if available
-            text = reason_text
-            if explanation:
-                text += f" — {explanation}"
-            reasons.append(text)
-            return True
-        return False
+    @staticmethod
+    def rule_passes(conditions, values):
+        """Where one rule's compiled conditions all hold."""
+        missing = np.nan
+        passed = True
+        with np.errstate(invalid="ignore"):
+            for column, op, other, factor in conditions:
+                right = values.get(other, missing) * factor if other else factor
+                passed = passed & op(values.get(column, missing), right)
+        return passed
 
+    def evaluate(self, columns, **features):
+        values, shape = self.prepare(columns, **features)
+        passes = np.empty((len(self.rules),) + shape, dtype=bool)
+        score = np.zeros(shape)
+        for r, conds in enumerate(self.conditions):
+            passes[r] = self.rule_passes(conds, values)
+            score += self.weights[r] * passes[r]
+        confidence = score / self.max_score if self.max_score > 0 else np.zeros(shape)
+        return passes, confidence
+
+    def score(self, columns, **features):
+        return self.evaluate(columns, **features)[1]
+
+    def frame_columns(self, df, tail=None):
+        """{column: array} from an indicator DataFrame, optionally only its last `tail` rows."""
+        rows = df if tail is None else df.iloc[-tail:]
+        return {name: rows[name].to_numpy(dtype=float) for name in self.columns if name in rows.columns}
+
+    def reasons(self, passed):
+        """Reason texts for a 1-D pass vector (one bar)."""
+        return [f"{rule.reason} — {rule.explanation}" if rule.explanation else rule.reason
+                for rule, flag in zip(self.rules, passed) if flag]
+
+
+compiled_rules = CompiledRules()
+
+# -- ADVANCED STRATEGY CHECKS/EXPLANATIONS --
+
+def _trend_reasons(last):
+    reasons = []
     # 1. Multi-TF Trend Consensus (pro playbook logic): Calculate trend for all TFs.
-    tfs = [("", "5m"), ("_1m", "1m"), ("_15m", "15m"), ("_1h", "1h")]
     tf_trends = {}
-    for suf, lab in tfs:
+    for suf, lab in TIMEFRAMES:
         ema21 = last.get(f"ema21{suf}", np.nan)
         ema200 = last.get(f"ema200{suf}", np.nan)
         if not np.isnan(ema21) and not np.isnan(ema200):
@@ -119,14 +290,10 @@ def comprehensive_strategy_checks(df, order_book, heatmap, custom_signals=None):
         reasons.append("MULTI-TF BEARISH ALIGNMENT: Most timeframes show downtrend — stronger signal per pro risk models.")
     elif sum(trend_votes.values()) >= 2:
         reasons.append("WARNING: Mixed or indecisive regime — avoid new positions per institutional guides.")
+    return reasons
 
-    # 2. Traditional signal checks, pro wording
-    passed_check(last.get("supertrend") == 1, "supertrend", "5m: Supertrend bullish", explanation="Momentum models (Supertrend) confirm trend, increases setup reliability.")
-    passed_check(last.get("rsi") > THRESHOLDS["rsi_bullish"], "rsi", "5m: RSI above bullish threshold", explanation="Strong momentum; pro traders often require RSI as confirmation layer.")
-    passed_check(last.get("adx", 0) > THRESHOLDS["adx_strong_trend"], "adx", "Strong trend (ADX)", explanation="ADX filter often used in institutional models: removes signals in choppy/range.")
-    passed_check(last.get("choppiness", 100) < THRESHOLDS["choppiness_trending"], "choppiness", "Market is trending (low Choppiness Index)", explanation="Choppiness below threshold = trending conditions per major quant studies.")
-    passed_check(last.get("cci", 0) > THRESHOLDS["cci_bullish"], "cci", "CCI strong uptrend", explanation="CCI signal-based filters well-cited in momentum funds.")
-
+def _regime_reasons(last, imbalance):
+    reasons = []
     # Volatility regime explainer
     bb_width = last.get("bb_upper", np.nan) - last.get("bb_lower", np.nan)
     atr_val = last.get("atr", np.nan)
@@ -135,40 +302,52 @@ def comprehensive_strategy_checks(df, order_book, heatmap, custom_signals=None):
         if ratio < 1:
             reasons.append("VOLATILITY SQUEEZE: Narrow BB vs ATR — suggests breakout setup imminent (as recommended in 'The Volatility Edge').")
 
-    # Volume, liquidity & structure (as in pro desks)
-    obv_prev = df["obv"].iloc[-2] if len(df) > 1 else np.nan
-    passed_check((not np.isnan(last.get("obv", np.nan)) and not np.isnan(obv_prev) and last["obv"] > obv_prev),
-                 "obv_rising", "OBV rising", explanation="Evidence of real money flow (OBV rising) — accumulation phase per market structure research.")
+    if imbalance < -THRESHOLDS["orderbook_imbalance"]:
+        reasons.append("ORDER BOOK DOMINATED BY SELL BIDS: Spot sell pressure — used to filter long signals per exchange microstructure handbooks.")
+    return reasons
 
-    # Order book imbalance (per leading institutional crypto trading guides)
-    bids = order_book.get("bids", [])
-    asks = order_book.get("asks", [])
-    bid_volume = sum(float(b[1]) for b in bids)
-    ask_volume = sum(float(a[1]) for a in asks)
-    total_vol = bid_volume + ask_volume
-    if total_vol > 0:
-        imbalance = (bid_volume - ask_volume) / total_vol
-        if imbalance > THRESHOLDS["orderbook_imbalance"]:
-            reasons.append("ORDER BOOK DOMINATED BY BUY BIDS: Spot buy side pressure — this context often filters low-conviction shorts in pro logic.")
-        elif imbalance < -THRESHOLDS["orderbook_imbalance"]:
-            reasons.append("ORDER BOOK DOMINATED BY SELL BIDS: Spot sell pressure — used to filter long signals per exchange microstructure handbooks.")
-
-    # Heatmap/trending risk context
-    symbol_base = last.get("symbol", None)
-    if heatmap and "coins" in heatmap and symbol_base:
-        base_symbol_code = symbol_base.split("/")[0].lower()
-        trending_coins = [coin["item"]["symbol"].lower() for coin in heatmap["coins"]]
-        if base_symbol_code in trending_coins:
-            reasons.append("TRENDING ON MARKET HEATMAP: Confirms broad liquidity/risk-on status (common in crypto desk overlay screens).")
+def comprehensive_strategy_checks(df, order_book, heatmap, custom_signals=None):
+    last = df.iloc[-1]
+    reasons = _trend_reasons(last)
 
-    # Candlestick patterns, as per classic teaching
-    passed_check(last.get("engulfing", 0) == 100, "bullish_engulfing", "Bullish engulfing candle", explanation="Professional swing traders use this for additional confidence.")
-    passed_check(last.get("hammer", 0) == 100, "bullish_hammer", "Bullish hammer pattern", explanation="Classic reversal candle found in many institutional traders' playbooks.")
+    # 2. Scored checks: the rule table over the last two bars (OBV compares with the previous one)
+    imbalance = book_imbalance(order_book)
+    symbol_base = last.get("symbol", None)
+    trending = bool(symbol_base) and symbol_base.split("/")[0].lower() in trending_symbols(heatmap)
+    passes, confidence = compiled_rules.evaluate(
+        compiled_rules.frame_columns(df, tail=2), book_imbalance=imbalance, heatmap_trending=float(trending))
+    reasons.extend(compiled_rules.reasons(passes[:, -1]))
+    score = float(confidence[-1]) * compiled_rules.max_score
+    reasons.extend(_regime_reasons(last, imbalance))
 
     # Allows custom signals/AI overlays
     if custom_signals:
         for cs_reason in custom_signals:
             score += 1.0
             reasons.append(cs_reason)
+    max_score = compiled_rules.max_score
     confidence = score / max_score if max_score > 0 else 0.0
     return confidence, reasons
+
+def strategy_checks_batch(columns, imbalance, trending):
+    """
+    comprehensive_strategy_checks for many frames at once. `columns` maps each
+    frame column to an array whose last axis holds a frame's last two rows;
+    `imbalance` and `trending` (booleans) have the leading shape. Returns
+    (confidence, reasons) with the leading shape, reasons as nested lists.
+    """
+    imbalance = np.asarray(imbalance, dtype=float)
+    passes, confidence = compiled_rules.evaluate(
+        columns, book_imbalance=imbalance, heatmap_trending=np.asarray(trending, dtype=float))
+    confidence = confidence[..., -1]
+    last = {name: np.asarray(values, dtype=float)[..., -1] for name, values in columns.items()}
+
+    def frame_reasons(index):
+        row = {name: values[index] for name, values in last.items()}
+        return (_trend_reasons(row) + compiled_rules.reasons(passes[(slice(None),) + index + (-1,)])
+                + _regime_reasons(row, imbalance[index]))
+
+    reasons = np.empty(confidence.shape, dtype=object)
+    for index in np.ndindex(confidence.shape):
+        reasons[index] = frame_reasons(index)
+    return confidence, reasons.tolist()
@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from data_feed import fetch_ohlcv, fetch_order_book
+from request_scheduler import PRIORITY_BACKGROUND
+from order_book import OrderBook
+
+# Push-based market data: Binance combined kline + depth-diff streams.
+# Point BINANCE_STREAM_URL at replay_server.py to run against a recording offline.
+# Consumers are woken by kline updates (Binance pushes one every ~2s per
+# timeframe), not by the ~10/s depth diffs, which only keep the book current.
+
+log = logging.getLogger(__name__)
+
+BINANCE_STREAM_URL = os.getenv("BINANCE_STREAM_URL", "wss://stream.binance.com:9443/stream")
+DEPTH_STREAM_SPEED = "100ms"
+RECONNECT_DELAY_SECS = 1
+MAX_RECONNECT_DELAY_SECS = 30
+
+
+def stream_symbol(symbol):
+    """'SOL/USDT' -> 'solusdt'"""
+    return symbol.replace("/", "").lower()
+
+
+def stream_names(symbols, timeframes):
+    names = []
+    for sym in symbols:
+        s = stream_symbol(sym)
+        names.extend(f"{s}@kline_{tf}" for tf in timeframes)
+        names.append(f"{s}@depth@{DEPTH_STREAM_SPEED}")
+    return names
+
+
+class StreamFeed:
+    """
+    Subscribes to kline and depth streams for a symbol set and keeps the latest
+    candles / order books in memory. Consumers `await feed.wait(symbol)` and are
+    woken when a candle update for that symbol arrives. A book that hit a
+    sequence gap reads as None until a snapshot repairs it; without seeding
+    nothing can, so that symbol's book stays None.
+    """
+
+    def __init__(self, symbols, timeframes=("1m",), url=None, limit=100,
+                 seed=True, record_path=None):
+        self.symbols = list(symbols)
+        self.timeframes = list(timeframes)
+        self.url = url or BINANCE_STREAM_URL
+        self.limit = limit
+        self.seed = seed
+        self.record_path = record_path
+        self.by_stream_symbol = {stream_symbol(s): s for s in self.symbols}
+        self.candles = {(s, tf): deque(maxlen=limit) for s in self.symbols for tf in self.timeframes}
+        self.books = {s: OrderBook() for s in self.symbols}
+        self.events = {s: asyncio.Event() for s in self.symbols}
+        self.closed_candle = {s: False for s in self.symbols}
+        self.last_message_ts = None
+        self._resyncing = set()
+        self._gapped = set()  # books out of sequence since a depth gap
+        self._record_file = None
+        self._task = None
+
+    # -- Consumer side --
+
+    async def wait(self, symbol):
+        """Block until a candle update arrives for `symbol`; returns True if a candle just closed."""
+        await self.events[symbol].wait()
+        self.events[symbol].clear()
+        closed = self.closed_candle[symbol]
+        self.closed_candle[symbol] = False
+        return closed
+
+    def ohlcv(self, symbol, timeframe):
+        return list(self.candles[(symbol, timeframe)])
+
+    def order_book(self, symbol, limit=100):
+        book = self.books[symbol]
+        if book.last_update_id is None or symbol in self._gapped:
+            return None
+        return book.snapshot(limit)
+
+    def book(self, symbol):
+        """Live OrderBook for per-update microstructure metrics (imbalance, spread, slippage)."""
+        return self.books[symbol]
+
+    # -- Producer side --
+
+    async def start(self):
+        if self.seed:
+            await self._seed()
+        if self.record_path:
+            self._record_file = open(self.record_path, "a", encoding="utf-8")
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._record_file:
+            self._record_file.close()
+            self._record_file = None
+
+    async def _seed(self):
+        for sym in self.symbols:
+            for tf in self.timeframes:
+                data = await fetch_ohlcv(sym, tf, self.limit, PRIORITY_BACKGROUND)
+                self.candles[(sym, tf)].extend(data)
+            await self._resync_book(sym)
+
+    async def _resync_book(self, symbol):
+        if not self.seed or symbol in self._resyncing:
+            return
+        self._resyncing.add(symbol)
+        try:
+            snapshot = await fetch_order_book(symbol, limit=1000, priority=PRIORITY_BACKGROUND)
+            if snapshot is not None:
+                self.books[symbol].load_snapshot(snapshot)
+                self._gapped.discard(symbol)
+        finally:
+            self._resyncing.discard(symbol)
+
+    async def _run(self):
+        import aiohttp  # deferred so importing the agent does not pay for it
+        delay = RECONNECT_DELAY_SECS
+        query = "/".join(stream_names(self.symbols, self.timeframes))
+        while True:
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async with session.ws_connect(f"{self.url}?streams={query}", heartbeat=30) as ws:
+                        log.info("Stream connected to %s (%d symbols)", self.url, len(self.symbols))
+                        delay = RECONNECT_DELAY_SECS
+                        async for msg in ws:
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                self.handle_message(json.loads(msg.data))
+                            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                                break
+                log.warning("Stream connection closed; reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("Stream connection error: %s; retrying in %ss", e, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY_SECS)
+
+    def handle_message(self, message):
+        if self._record_file:
+            self._record_file.write(json.dumps({"ts": int(time.time() * 1000), "msg": message}) + "\n")
+        stream = message.get("stream", "")
+        data = message.get("data", {})
+        symbol = self.by_stream_symbol.get(stream.split("@", 1)[0])
+        if symbol is None:
+            return
+        self.last_message_ts = time.time()
+        if "@kline_" in stream:
+            self._on_kline(symbol, data["k"])
+            self.events[symbol].set()
+        elif "@depth" in stream:
+            self._on_depth(symbol, data)
+
+    def _on_kline(self, symbol, k):
+        buffer = self.candles.get((symbol, k["i"]))
+        if buffer is None:
+            return
+        candle = [k["t"], float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]), float(k["v"])]
+        if buffer and candle[0] == buffer[-1][0]:
+            buffer[-1] = candle
+        elif not buffer or candle[0] > buffer[-1][0]:
+            buffer.append(candle)
+        if k.get("x"):
+            self.closed_candle[symbol] = True
+
+    def _on_depth(self, symbol, event):
+        if symbol in self._gapped and not self.seed:
+            return
+        if self.books[symbol].apply_diff(event) or symbol in self._resyncing:
+            return
+        self._gapped.add(symbol)
+        if self.seed:
+            log.warning("Depth gap; resyncing order book", extra={"symbol": symbol})
+            asyncio.ensure_future(self._resync_book(symbol))
+        else:
+            log.error("Depth gap with seeding off: no snapshot to resync from, the order book stays unavailable",
+                      extra={"symbol": symbol})
+
+
+async def record(symbols, path, seconds, timeframes=("1m",)):
+    """Record raw stream messages to a JSONL file for replay_server.py."""
+    feed = StreamFeed(symbols, timeframes, seed=False, record_path=path)
+    await feed.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        await feed.stop()
+    print(f"[Stream] Recorded {seconds}s of {', '.join(symbols)} to {path}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Record Binance kline/depth streams to JSONL")
+    parser.add_argument("path")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--seconds", type=int, default=600)
+    args = parser.parse_args()
+    asyncio.run(record(args.symbols, args.path, args.seconds))
@@ -0,0 +1,87 @@
+import os
+import json
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+# Leveled, buffered logging for the agent.
+#
+# Modules log through logging.getLogger(__name__) with structured fields in
+# `extra` (symbol, timeframe, endpoint, ...). configure_logging() puts a queue
+# between the caller and the output: the hot path only enqueues the record,
+# and formatting plus the write happen on the listener thread. LOG_FORMAT=json
+# emits one JSON object per line; the default text format appends the fields
+# as key=value.
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_FILE = os.getenv("LOG_FILE")  # stderr when unset
+
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def _fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s [%(name)s] %(message)s", "%H:%M:%S")
+
+    def format(self, record):
+        text = super().format(record)
+        fields = _fields(record)
+        if fields:
+            text += " | " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return text
+
+
+class _DeferredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Leave formatting to the listener thread (QueueHandler formats in the caller)
+        return record
+
+
+_listener = None
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()  # drains the queue
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, path=LOG_FILE):
+    """Route the root logger through a background queue listener. Safe to call more than once."""
+    global _listener
+    _stop_listener()
+    output = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(records))
+    root.setLevel(level)
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
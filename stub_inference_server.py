@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import time
+from aiohttp import web
+
+# Minimal OpenAI-compatible chat completions endpoint for exercising
+# output_module without a real provider:
+#   python stub_inference_server.py --latency 2
+#   HF_BASE_URL=http://127.0.0.1:8081/v1 python agent.py
+
+
+def make_app(latency=0.5, fail_rate=0):
+    app = web.Application()
+    app["calls"] = 0
+
+    async def chat_completions(request):
+        body = await request.json()
+        app["calls"] += 1
+        if fail_rate and app["calls"] % fail_rate == 0:
+            return web.json_response({"error": "stub failure"}, status=500)
+        await asyncio.sleep(latency)
+        prompt = body["messages"][-1]["content"]
+        text = f"[stub] {prompt.splitlines()[0][:80]}"
+        return web.json_response({
+            "id": f"stub-{app['calls']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/chat/completions", chat_completions)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub LLM inference server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per completion")
+    parser.add_argument("--fail-rate", type=int, default=0, help="fail every Nth call (0 = never)")
+    args = parser.parse_args()
+    web.run_app(make_app(args.latency, args.fail_rate), host=args.host, port=args.port)
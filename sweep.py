@@ -0,0 +1,307 @@
+import os
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import itertools
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from strategy_engine import CompiledRules, compiled_rules, CHECK_WEIGHTS, THRESHOLDS
+from eval_scheduler import TIMEFRAME_SECS
+from backtest import align_ohlcv, analysis_columns, directions, signal_outcomes, load_history, add_history_arguments
+from timeframe_builder import BASE_TIMEFRAME, MAIN_TIMEFRAME
+from agent import LONG_CONFIDENCE, SHORT_CONFIDENCE, STICKY_CONFIRMS
+
+# Parameter sweeps over the strategy's hand-tuned constants.
+#
+#   python sweep.py --csv-dir data --symbols SOL/USDT ETH/USDT --method halving --samples 3000
+#
+# A parameter is a CHECK_WEIGHTS key, a THRESHOLDS key, or one of the agent's
+# long_confidence / short_confidence / sticky_confirms. Indicator columns for
+# the whole universe are computed once from 1m candles, on the same
+# multi-timeframe frame as the backtest (backtest.analysis_columns), and saved as
+# .npy files under SWEEP_CACHE_DIR, keyed by a hash of the candles; worker
+# processes memory-map them. A combination only re-runs the rule table, the
+# signal simulation and the outcome resolution from backtest.py: each rule's
+# pass matrix depends on the thresholds alone, so workers cache it and a
+# combination that changes weights or agent settings costs one weighted sum.
+# Combinations are ranked by expectancy (mean R multiple, as SignalEntry
+# reports it) or hit rate over their resolved signals.
+#
+# Successive halving scores many random combinations on a short prefix of the
+# history, keeps the best 1/eta and repeats on eta times more bars until the
+# survivors run on the full history. Indicators are causal, so a prefix scores
+# exactly as the same bars would in a shorter backtest. Confidence is on the
+# live agent's scale, so the confidence cutoffs found here apply to it as they are.
+
+SWEEP_CACHE_DIR = os.getenv("SWEEP_CACHE_DIR", ".sweep_cache")
+PASS_CACHE_SIZE = 64  # rule pass matrices kept per worker
+MIN_SIGNALS = 20  # combinations with fewer resolved signals rank last
+RANK_METRICS = ("expectancy_r", "hit_rate")
+RESULT_FIELDS = ("bars", "signals", "closed", "hit_rate", "stop_rate", "win_rate", "expectancy_r", "avg_return_pct")
+
+AGENT_PARAMS = {
+    "long_confidence": LONG_CONFIDENCE,
+    "short_confidence": SHORT_CONFIDENCE,
+    "sticky_confirms": STICKY_CONFIRMS,
+}
+
+DEFAULT_SPACE = {
+    "long_confidence": [0.55, 0.6, 0.65, 0.7, 0.75, 0.8],
+    "short_confidence": [0.15, 0.2, 0.25, 0.3, 0.35, 0.4],
+    "sticky_confirms": [2, 3, 4],
+    "rsi_bullish": [60, 65, 70, 75, 80],
+    "cci_bullish": [80, 100, 120, 150],
+    "adx_strong_trend": [20, 25, 30],
+    "choppiness_trending": [35, 38.2, 45],
+    "bb_squeeze_atr_mult": [1.5, 1.8, 2.2],
+    "stochrsi_k_overbought": [0.8, 0.85, 0.9],
+    "ema21_ema200": [1.0, 2.0, 3.0],
+    "supertrend": [0.5, 1.5, 2.5],
+    "macd_positive": [0.5, 1.5, 2.5],
+    "obv_rising": [0.0, 1.0, 2.0],
+    "price_above_vwap": [0.0, 1.0, 2.0],
+}
+
+
+def split_params(params):
+    """(weights, thresholds, agent settings) with `params` applied over the defaults."""
+    weights, thresholds, agent = dict(CHECK_WEIGHTS), dict(THRESHOLDS), dict(AGENT_PARAMS)
+    for name, value in params.items():
+        if name in AGENT_PARAMS:
+            agent[name] = value
+        elif name in THRESHOLDS:
+            thresholds[name] = value
+        elif name in CHECK_WEIGHTS:
+            weights[name] = value
+        else:
+            raise KeyError(f"Unknown sweep parameter: {name}")
+    return weights, thresholds, agent
+
+
+# -- Indicator cache --
+
+def _fingerprint(symbols, times, cube, timeframe, rsi_period):
+    digest = hashlib.sha1(json.dumps([symbols, BASE_TIMEFRAME, timeframe, rsi_period, compiled_rules.columns]).encode())
+    digest.update(np.ascontiguousarray(times).tobytes())
+    digest.update(np.ascontiguousarray(cube).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def build_universe(ohlcv_by_symbol, timeframe=MAIN_TIMEFRAME, rsi_period=9, cache_dir=SWEEP_CACHE_DIR):
+    """Align the 1m candles, compute the rule table's columns once and return the cache directory."""
+    symbols, times, cube = align_ohlcv(ohlcv_by_symbol)
+    if not symbols:
+        raise ValueError("No candles to sweep over")
+    path = os.path.join(cache_dir, _fingerprint(symbols, times, cube, timeframe, rsi_period))
+    if os.path.exists(os.path.join(path, "meta.json")):
+        print(f"[Sweep] Reusing indicator cache {path}")
+        return path
+    times, cube, columns = analysis_columns(times, cube, timeframe, rsi_period)
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "cube.npy"), cube)
+    for name in compiled_rules.columns:
+        if name in columns:
+            np.save(os.path.join(path, f"{name}.npy"), np.asarray(columns[name], dtype=float))
+    meta = {"symbols": symbols, "timeframe": timeframe, "rsi_period": rsi_period, "bars": len(times),
+            "columns": [name for name in compiled_rules.columns if name in columns]}
+    # meta.json goes last and marks the cache complete
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    print(f"[Sweep] Indicator cache written to {path}")
+    return path
+
+
+def load_universe(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in meta["columns"]}
+    values, _ = compiled_rules.prepare(columns)
+    return dict(meta, cube=np.load(os.path.join(path, "cube.npy"), mmap_mode="r"), values=values,
+                bar_secs=TIMEFRAME_SECS[meta["timeframe"]])
+
+
+# -- Worker side --
+
+_universe = None
+
+
+def _init_worker(path):
+    global _universe
+    _universe = load_universe(path)
+    _rule_passes.cache_clear()
+
+
+@lru_cache(maxsize=PASS_CACHE_SIZE)
+def _rule_passes(conditions, bars):
+    values = {name: value[..., :bars] for name, value in _universe["values"].items()}
+    return CompiledRules.rule_passes(conditions, values)
+
+
+def evaluate(params, bars=None):
+    """Simulated outcome stats for one combination over the first `bars` bars (all by default)."""
+    weights, thresholds, agent = split_params(params)
+    rules = CompiledRules(weights=weights, thresholds=thresholds)
+    cube = _universe["cube"]
+    bars = cube.shape[1] if bars is None else min(bars, cube.shape[1])
+    score = np.zeros((cube.shape[0], bars))
+    for weight, conditions in zip(rules.weights, rules.conditions):
+        if weight:
+            score += weight * _rule_passes(conditions, bars)
+    confidence = score / rules.max_score if rules.max_score > 0 else score
+    direction = directions(confidence, agent["long_confidence"], agent["short_confidence"])
+
+    signals = closed = targets = stops = wins = 0
+    sum_r = sum_return = 0.0
+    for _, _, sides, _, entry, _, stop, _, exit_price, outcome in signal_outcomes(
+            cube[:, :bars], confidence, direction, _universe["bar_secs"],
+            sticky_confirms=int(agent["sticky_confirms"])):
+        signals += len(sides)
+        resolved = pd.notna(outcome)
+        if not resolved.any():
+            continue
+        side, entry, stop = sides[resolved], entry[resolved], stop[resolved]
+        exit_price, outcome = exit_price[resolved], outcome[resolved]
+        r = side * (exit_price - entry) / np.abs(entry - stop)  # SignalEntry.r_multiple
+        closed += len(r)
+        targets += int((outcome == "TARGET_HIT").sum())
+        stops += int((outcome == "STOP_HIT").sum())
+        wins += int((r > 0).sum())
+        sum_r += float(r.sum())
+        sum_return += float((side * (exit_price - entry) / entry).sum()) * 100
+    n = closed or 1
+    return dict(params, bars=bars, signals=signals, closed=closed, hit_rate=targets / n, stop_rate=stops / n,
+                win_rate=wins / n, expectancy_r=sum_r / n, avg_return_pct=sum_return / n)
+
+
+def _evaluate_job(job):
+    return evaluate(*job)
+
+
+# -- Search --
+
+def rank(results, by="expectancy_r", min_signals=MIN_SIGNALS):
+    """Best first: enough resolved signals, then `by`, then the other rank metric."""
+    other = next(metric for metric in RANK_METRICS if metric != by)
+    return sorted(results, key=lambda r: (r["closed"] >= min_signals, r[by], r[other]), reverse=True)
+
+
+def grid(space):
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def sample(space, count, seed=0):
+    """Up to `count` distinct random combinations."""
+    rng = random.Random(seed)
+    names = list(space)
+    seen = {}
+    for _ in range(count * 10):
+        if len(seen) >= count:
+            break
+        values = tuple(rng.choice(space[name]) for name in names)
+        seen.setdefault(values, dict(zip(names, values)))
+    return list(seen.values())
+
+
+class Sweep:
+    """A worker pool over one cached universe."""
+
+    def __init__(self, path, workers=None):
+        self.universe = load_universe(path)
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(path,))
+
+    def evaluate(self, combos, bars=None):
+        # Combinations with the same thresholds go to the same chunk to share rule passes
+        order = sorted(range(len(combos)), key=lambda i: repr(sorted(
+            (k, v) for k, v in combos[i].items() if k in THRESHOLDS)))
+        chunk = max(1, len(combos) // (self.workers * 4))
+        results = self.pool.map(_evaluate_job, [(combos[i], bars) for i in order], chunksize=chunk)
+        ordered = [None] * len(combos)
+        for i, result in zip(order, results):
+            ordered[i] = result
+        return ordered
+
+    def halving(self, combos, eta=3, min_bars=2000, by="expectancy_r", min_signals=MIN_SIGNALS):
+        """Successive halving; returns the survivors' full-history results, ranked."""
+        total = self.universe["bars"]
+        rungs = min(int(math.log(max(total / min_bars, 1), eta)), math.ceil(math.log(max(len(combos), 1), eta)))
+        for rung in range(rungs, 0, -1):
+            bars = total // eta ** rung
+            # Fewer resolved signals are expected on a prefix
+            ranked = rank(self.evaluate(combos, bars), by, max(1, min_signals * bars // total))
+            names = list(combos[0])
+            combos = [{name: r[name] for name in names} for r in ranked[:max(1, len(ranked) // eta)]]
+            print(f"[Sweep] {bars} bars: kept {len(combos)} of {len(ranked)}")
+        return rank(self.evaluate(combos), by, min_signals)
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def best_params(result):
+    """The winning combination as the dicts it overrides, ready to copy into the config."""
+    weights, thresholds, agent = split_params({k: result[k] for k in result if k not in RESULT_FIELDS})
+    return {
+        "CHECK_WEIGHTS": {k: v for k, v in weights.items() if v != CHECK_WEIGHTS[k]},
+        "THRESHOLDS": {k: v for k, v in thresholds.items() if v != THRESHOLDS[k]},
+        "agent": {k: v for k, v in agent.items() if v != AGENT_PARAMS[k]},
+        "stats": {k: result[k] for k in RESULT_FIELDS},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parameter sweep of the strategy thresholds and weights")
+    add_history_arguments(parser)
+    parser.add_argument("--space", help="JSON file of {parameter: [values]} (default: DEFAULT_SPACE)")
+    parser.add_argument("--method", choices=("grid", "random", "halving"), default="halving")
+    parser.add_argument("--samples", type=int, default=2000, help="combinations for random/halving")
+    parser.add_argument("--eta", type=int, default=3, help="halving keeps 1/eta per rung")
+    parser.add_argument("--min-bars", type=int, default=2000, help="bars in the first halving rung")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rank", choices=RANK_METRICS, default="expectancy_r")
+    parser.add_argument("--min-signals", type=int, default=MIN_SIGNALS)
+    parser.add_argument("--cache-dir", default=SWEEP_CACHE_DIR)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--out", default="sweep_results.csv")
+    parser.add_argument("--best", default="sweep_best.json")
+    args = parser.parse_args()
+
+    space = DEFAULT_SPACE
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    split_params({name: values[0] for name, values in space.items()})  # fail fast on unknown names
+
+    started = time.perf_counter()
+    data = load_history(args.symbols, BASE_TIMEFRAME, args.days, args.csv_dir, args.offline)
+    path = build_universe(data, args.timeframe, cache_dir=args.cache_dir)
+    combos = grid(space) if args.method == "grid" else sample(space, args.samples, args.seed)
+    print(f"[Sweep] {len(combos)} combinations ({args.method}) over {path}")
+    with Sweep(path, args.workers) as sweep:
+        if args.method == "halving":
+            ranked = sweep.halving(combos, args.eta, args.min_bars, args.rank, args.min_signals)
+        else:
+            ranked = rank(sweep.evaluate(combos), args.rank, args.min_signals)
+    print(f"[Sweep] Done in {time.perf_counter() - started:.1f}s")
+
+    results = pd.DataFrame(ranked)
+    print(results.head(args.top).to_string())
+    results.to_csv(args.out, index=False)
+    print(f"[Sweep] Results saved to {args.out}")
+    if ranked:
+        with open(args.best, "w") as f:
+            json.dump(best_params(ranked[0]), f, indent=2)
+        print(f"[Sweep] Best combination saved to {args.best}")
@@ -0,0 +1,19 @@
+import time
+import asyncio
+import ccxt
+import pytest
+import data_feed
+from request_scheduler import WeightScheduler, DEFAULT_BACKOFF_SECS
+
+
+def test_rate_limit_while_loading_markets_backs_off(monkeypatch):
+    # A 429 on exchangeInfo surfaces from _ready_exchange, before there is an exchange to read headers from
+    async def rate_limited():
+        raise ccxt.RateLimitExceeded("binance 429 Too Many Requests")
+
+    scheduler = WeightScheduler(weight_per_minute=10 ** 6)
+    monkeypatch.setattr(data_feed, "scheduler", scheduler)
+    monkeypatch.setattr(data_feed, "_ready_exchange", rate_limited)
+    with pytest.raises(ccxt.RateLimitExceeded):
+        asyncio.run(data_feed._scheduled("klines", 100, data_feed.PRIORITY_ANALYSIS, "fetch_ohlcv", "SOL/USDT"))
+    assert scheduler.paused_until > time.monotonic() + DEFAULT_BACKOFF_SECS - 5
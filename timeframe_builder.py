@@ -0,0 +1,244 @@
+import numpy as np
+import pandas as pd
+from indicator_engine import indicator_engine, FRAME_COLUMNS, RingBuffer
+from eval_scheduler import TIMEFRAME_SECS
+
+# Multi-timeframe candles from one base stream.
+#
+# Each symbol is fed its 1m candles only. They are rolled up in place into
+# 5m, 15m and 1h candles (open of the first minute, high/low extremes, close of
+# the last, summed volume), and every timeframe goes through its own
+# IncrementalIndicators stream. The analysis frame is the 5m frame with the
+# other timeframes' columns suffixed (_1m, _15m, _1h). A 5m row carries the
+# other timeframes as they stood when that row was last updated, so closed
+# rows are kept as they were and nothing is re-merged. Those rows and the frame
+# itself sit in per-symbol buffers allocated once and reused by every update.
+#
+# History comes from a one-off seed of ready-made 5m/15m/1h candles: those
+# older than the current hour are ingested as they are, the rest is rebuilt
+# from the 1m candles, which therefore have to cover the current hour. A seed
+# can also hand back the frame's last two rows as they stood after each of the
+# last few 1m candles (the agent's warm start); the replay then starts at the
+# hour holding the first of them.
+
+BASE_TIMEFRAME = "1m"
+MAIN_TIMEFRAME = "5m"
+ROLLUP_TIMEFRAMES = ("5m", "15m", "1h")
+ALIGNED_TIMEFRAMES = ("1m", "15m", "1h")
+ALIGNED_COLUMNS = [f"{col}_{tf}" for tf in ALIGNED_TIMEFRAMES for col in FRAME_COLUMNS]
+ANALYSIS_COLUMNS = FRAME_COLUMNS + ALIGNED_COLUMNS
+
+nan = float("nan")
+
+
+def rollup(candles, timeframe):
+    """Aggregate ccxt-style candles into `timeframe` candles as an (N, 6) array (the last may be partial)."""
+    rows = np.asarray(candles, dtype=float).reshape(-1, 6)
+    if not len(rows):
+        return rows
+    tf_ms = TIMEFRAME_SECS[timeframe] * 1000
+    buckets = rows[:, 0] - rows[:, 0] % tf_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(rows)] - 1
+    return np.column_stack([
+        buckets[starts], rows[starts, 1],
+        np.maximum.reduceat(rows[:, 2], starts), np.minimum.reduceat(rows[:, 3], starts),
+        rows[ends, 4], np.add.reduceat(rows[:, 5], starts),
+    ])
+
+
+class _Rollup:
+    """The forming candle of one higher timeframe, built from base candles."""
+
+    def __init__(self, timeframe):
+        self.tf_ms = TIMEFRAME_SECS[timeframe] * 1000
+        self.start = None
+        self.closed = None  # (open, high, low, close, volume) of the bucket's closed base candles
+        self.forming = None
+
+    def push(self, candle):
+        ts = candle[0]
+        forming = self.forming
+        if forming is not None and ts > forming[0] and forming[0] - forming[0] % self.tf_ms == self.start:
+            c = self.closed
+            self.closed = forming[1:] if c is None else (
+                c[0], max(c[1], forming[2]), min(c[2], forming[3]), forming[4], c[4] + forming[5])
+        bucket = ts - ts % self.tf_ms
+        if bucket != self.start:
+            self.start, self.closed = bucket, None
+        self.forming = candle
+        c = self.closed
+        if c is None:
+            return (bucket,) + tuple(candle[1:])
+        return (bucket, c[0], max(c[1], candle[2]), min(c[2], candle[3]), candle[4], c[4] + candle[5])
+
+
+class SymbolTimeframes:
+    def __init__(self, symbol, engine=indicator_engine):
+        self.symbol = symbol
+        self.engine = engine
+        self.seeded = False
+        self.last_base = None
+        self.rollups = {tf: _Rollup(tf) for tf in ROLLUP_TIMEFRAMES}
+        self.main = engine.stream(symbol, MAIN_TIMEFRAME)
+        capacity, dtype = self.main.rows.maxlen, self.main.rows.values.dtype
+        self.aligned = RingBuffer(capacity, len(ALIGNED_COLUMNS), dtype)
+        self.current = np.full(len(ALIGNED_COLUMNS), nan)
+        # Backing store of frame(), one row more than the closed rows
+        self._frame_values = np.empty((capacity + 1, len(ANALYSIS_COLUMNS)), dtype)
+        self._frame_timestamps = np.empty(capacity + 1, dtype=np.int64)
+
+    def _snapshot(self):
+        values = []
+        for tf in ALIGNED_TIMEFRAMES:
+            row = self.engine.stream(self.symbol, tf).forming_row
+            if row is None:
+                values.extend([nan] * len(FRAME_COLUMNS))
+            else:
+                values.extend(row[col] for col in FRAME_COLUMNS)
+        return np.array(values, dtype=float)
+
+    def _push(self, candle):
+        candle = (int(candle[0]),) + tuple(float(x) for x in candle[1:6])
+        before = self.current
+        closed = self.main.bars_closed
+        self.engine.stream(self.symbol, BASE_TIMEFRAME).update(candle)
+        for tf, roll in self.rollups.items():
+            self.engine.stream(self.symbol, tf).update(roll.push(candle))
+        if self.main.bars_closed > closed:
+            self.aligned.append(before)
+        self.current = self._snapshot()
+        self.last_base = candle[0]
+
+    def seed(self, history, base_candles, keep=0):
+        """
+        Ingest {timeframe: candles} older than the current hour, then replay the
+        hour from 1m candles. Returns tail_rows() after each of the last `keep`
+        1m candles as a (keep, 2, columns) array.
+        """
+        history = history or {}
+        base = list(base_candles)
+        rows = []
+        if not base:
+            return np.empty((0, 2, len(ANALYSIS_COLUMNS)))
+        largest = max(TIMEFRAME_SECS[tf] for tf in ROLLUP_TIMEFRAMES) * 1000
+        first_kept = len(base) - keep
+        start = base[max(first_kept, 0)][0] if keep else base[-1][0]
+        start -= start % largest
+        self.engine.reset(self.symbol)
+        self.main = self.engine.stream(self.symbol, MAIN_TIMEFRAME)
+        self.engine.stream(self.symbol, BASE_TIMEFRAME).ingest([c for c in base if c[0] < start])
+        for tf in ROLLUP_TIMEFRAMES:
+            self.engine.stream(self.symbol, tf).ingest([c for c in history.get(tf) or [] if c[0] < start])
+        self.rollups = {tf: _Rollup(tf) for tf in ROLLUP_TIMEFRAMES}
+        self.aligned.clear()
+        for row in self._aligned_history():
+            self.aligned.append(row)
+        self.current = self._snapshot()
+        self.seeded = True
+        for i, candle in enumerate(base):
+            if candle[0] >= start:
+                self._push(candle)
+                if i >= first_kept:
+                    rows.append(self.tail_rows())
+        return np.array(rows, dtype=float).reshape(-1, 2, len(ANALYSIS_COLUMNS))
+
+    def tail_rows(self):
+        """frame().iloc[-2:] as a (2, columns) array, NaN where a row is missing, without building the frame."""
+        rows = np.full((2, len(ANALYSIS_COLUMNS)), nan)
+        width = len(FRAME_COLUMNS)
+        if self.main.rows:
+            rows[0, :width] = self.main.rows[-1]
+            if self.aligned:
+                rows[0, width:] = self.aligned[-1]
+        if self.main.forming_row is not None:
+            rows[1, :width] = [self.main.forming_row[col] for col in FRAME_COLUMNS]
+            rows[1, width:] = self.current
+        return rows
+
+    def _aligned_history(self):
+        # Seeded rows take the bar of each other timeframe that contains them
+        main_ts = self.main.rows.ordered()[0].astype(float)
+        block = np.full((len(main_ts), len(ALIGNED_COLUMNS)), nan)
+        main_ms = TIMEFRAME_SECS[MAIN_TIMEFRAME] * 1000
+        width = len(FRAME_COLUMNS)
+        for i, tf in enumerate(ALIGNED_TIMEFRAMES):
+            stream = self.engine.stream(self.symbol, tf)
+            values = np.empty((len(stream.rows) + 1, width), dtype=stream.rows.values.dtype)
+            ts = np.empty(len(values), dtype=np.int64)
+            n = stream.copy_into(values, ts)
+            if not n or not len(main_ts):
+                continue
+            ts, values = ts[:n].astype(float), values[:n]
+            pos = np.searchsorted(ts, main_ts + main_ms - 1, side="right") - 1
+            found = pos >= 0
+            block[found, i * width:(i + 1) * width] = values[pos[found]]
+        return list(block)
+
+    def update(self, base_candles, history=None):
+        """Apply a batch of 1m candles (seeding first if needed)."""
+        if not self.seeded:
+            self.seed(history, base_candles)
+            return
+        for candle in base_candles:
+            if self.last_base is None or candle[0] >= self.last_base:
+                self._push(candle)
+
+    def frame(self):
+        """
+        The 5m indicator frame with the suffixed 1m/15m/1h columns alongside.
+        It is a view of the symbol's frame buffer, which the next call
+        overwrites: copy it to keep it past the symbol's next update.
+        """
+        values, timestamps = self._frame_values, self._frame_timestamps
+        width = len(FRAME_COLUMNS)
+        n = self.main.copy_into(values[:, :width], timestamps)
+        if n:
+            # Closed rows take the other timeframes as they stood then, the last row the current ones
+            k = min(len(self.aligned), n - 1)
+            values[:n - 1 - k, width:] = nan
+            self.aligned.copy_into(values[n - 1 - k:n - 1, width:], last=k)
+            values[n - 1, width:] = self.current
+        index = pd.to_datetime(timestamps[:n], unit="ms")
+        index.name = "timestamp"
+        return pd.DataFrame(values[:n], index=index, columns=ANALYSIS_COLUMNS, copy=False)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the symbol's buffers (indicator rows of every timeframe, aligned rows, frame)."""
+        streams = sum(self.engine.stream(self.symbol, tf).nbytes for tf in (BASE_TIMEFRAME,) + ROLLUP_TIMEFRAMES)
+        return streams + self.aligned.nbytes + self._frame_values.nbytes + self._frame_timestamps.nbytes
+
+
+class TimeframeBuilder:
+    """Keeps one SymbolTimeframes per symbol."""
+
+    def __init__(self, engine=indicator_engine):
+        self.engine = engine
+        self.symbols = {}
+
+    def get(self, symbol):
+        if symbol not in self.symbols:
+            self.symbols[symbol] = SymbolTimeframes(symbol, self.engine)
+        return self.symbols[symbol]
+
+    def seeded(self, symbol):
+        return symbol in self.symbols and self.symbols[symbol].seeded
+
+    def nbytes(self, symbol):
+        return self.symbols[symbol].nbytes if symbol in self.symbols else 0
+
+    def ingest(self, symbol, base_candles, history=None):
+        """Update a symbol from its 1m candles and return the aligned multi-timeframe frame."""
+        frames = self.get(symbol)
+        frames.update(base_candles, history)
+        return frames.frame()
+
+    def reset(self, symbol=None):
+        for key in list(self.symbols):
+            if symbol is None or key == symbol:
+                del self.symbols[key]
+                self.engine.reset(key)
+
+
+timeframe_builder = TimeframeBuilder()
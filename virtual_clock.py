@@ -0,0 +1,69 @@
+import time
+import asyncio
+import selectors
+from datetime import datetime, timedelta
+
+# Clocks for the agent's time-dependent logic (warmup, hold, cooldown, signal
+# entry and exit times, the evaluation schedule).
+#
+# WallClock is real time. VirtualClockLoop is an event loop on virtual time:
+# whenever every task is waiting on a timer, the loop jumps straight to the
+# earliest deadline instead of blocking, so asyncio.sleep() costs nothing and
+# a session runs as fast as its callbacks. Its VirtualClock reads the same
+# time as epoch seconds, so agent code sees the time its sleeps are measured
+# in. (The loop's own time() counts from 0: at epoch magnitudes a float cannot
+# resolve the loop's 1 ns clock resolution.) The loop must only wait on timers:
+# a thread or socket still pending while a timer is due would be overtaken by
+# virtual time.
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class WallClock:
+    @staticmethod
+    def time():
+        return time.time()
+
+    @staticmethod
+    def now():
+        return datetime.utcnow()
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    def __init__(self, loop):
+        super().__init__()
+        self.loop = loop
+
+    def select(self, timeout=None):
+        if timeout is not None and timeout > 0:
+            # Nothing is ready before the next timer: skip ahead to it
+            self.loop.advance(timeout)
+            timeout = 0
+        return super().select(timeout)
+
+
+class VirtualClock:
+    def __init__(self, loop, start):
+        self.loop = loop
+        self.start = float(start)
+
+    def time(self):
+        return self.start + self.loop.time()
+
+    def now(self):
+        return EPOCH + timedelta(seconds=self.time())
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Event loop on virtual time; `clock` reads it as epoch seconds starting at `start`."""
+
+    def __init__(self, start):
+        self._elapsed = 0.0
+        super().__init__(_VirtualSelector(self))
+        self.clock = VirtualClock(self, start)
+
+    def time(self):
+        return self._elapsed
+
+    def advance(self, seconds):
+        self._elapsed += seconds